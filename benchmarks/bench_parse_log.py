@@ -0,0 +1,80 @@
+"""Benchmark raw log parsing on a multi-million-line log.
+
+Compares the previous ``split``-based parser with the streaming
+``_iter_log`` parser, for full parsing, level-filtered parsing and time to
+the first row.  With ``--memory`` each case is run a second time under
+``tracemalloc`` to report peak memory (much slower).
+
+Usage::
+
+    python benchmarks/bench_parse_log.py [lines] [--memory]
+"""
+
+import sys
+import time
+import tracemalloc
+
+from urbackup_api import LogDataRow, LogLevel, urbackup_server_typed
+
+
+def split_parse(d):
+    rows = []
+    for msg in d.split("\n"):
+        if not msg:
+            continue
+        level = int(msg[0]) if msg[0].isdigit() else 0
+        idx = msg.find("-", 2)
+        if idx != -1:
+            time_str = msg[2:idx]
+            time_val = int(time_str) if time_str.isdigit() else 0
+            message = msg[idx + 1:]
+        else:
+            time_val = 0
+            message = msg[2:]
+        rows.append(LogDataRow(level=level, message=message, time=time_val))
+    return rows
+
+
+def make_log(lines):
+    parts = []
+    for i in range(lines):
+        level = 2 if i % 1000 == 0 else (1 if i % 100 == 0 else 0)
+        parts.append(f"{level}-{1700000000 + i}-Loading file \"C:\\data\\file{i}.bin\"")
+    return "\n".join(parts)
+
+
+def measure(name, fn, memory):
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    line = f"{name:<26} {elapsed:8.3f} s"
+    if memory:
+        tracemalloc.start()
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        line += f"  peak {peak / 1024**2:8.1f} MiB"
+    print(f"{line}  -> {result}")
+
+
+def main():
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    memory = "--memory" in sys.argv
+    lines = int(args[0]) if args else 2_000_000
+    log = make_log(lines)
+    print(f"{lines} lines, {len(log) / 1024**2:.1f} MiB")
+    parse = urbackup_server_typed._iter_log
+
+    measure("split, all rows", lambda: len(split_parse(log)), memory)
+    measure("streaming, all rows", lambda: len(list(parse(log))), memory)
+    measure("split, errors only",
+            lambda: len([r for r in split_parse(log) if r.level >= LogLevel.ERROR]),
+            memory)
+    measure("streaming, errors only",
+            lambda: sum(1 for _ in parse(log, LogLevel.ERROR)), memory)
+    measure("split, first row", lambda: split_parse(log)[0].time, memory)
+    measure("streaming, first row", lambda: next(parse(log)).time, memory)
+
+
+if __name__ == "__main__":
+    main()
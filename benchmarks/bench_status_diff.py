@@ -0,0 +1,73 @@
+"""Benchmark diffing two large status snapshots.
+
+Compares ``StatusDiffer.diff`` with a field-by-field comparison of every
+client, on two snapshots where about 1% of the clients changed.  Each
+case reports the best of several runs with the garbage collector off.
+
+Usage::
+
+    python benchmarks/bench_status_diff.py [clients]
+"""
+
+import dataclasses
+import gc
+import random
+import sys
+import time
+
+from urbackup_api import StatusClientItem, StatusDiffer, StatusResult
+
+
+def make_status(clients, seed, changed=0.01):
+    r = random.Random(seed)
+    return StatusResult(status=[
+        StatusClientItem(
+            id=i, name=f"client{i}", online=not (seed and r.random() < changed),
+            file_ok=True, lastseen=r.randint(0, 10**9),
+        )
+        for i in range(clients)
+    ])
+
+
+def naive_diff(old, new):
+    previous = {c.id: c for c in old.status}
+    fields = [f.name for f in dataclasses.fields(StatusClientItem)
+              if f.name != "lastseen"]
+    changes = 0
+    for c in new.status:
+        o = previous[c.id]
+        for name in fields:
+            if getattr(o, name) != getattr(c, name):
+                changes += 1
+    return changes
+
+
+def best(fn, repeat=5):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+
+def main():
+    clients = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    old, new = make_status(clients, 0), make_status(clients, 1)
+    gc.disable()
+
+    elapsed, changes = best(lambda: naive_diff(old, new))
+    print(f"{'field by field':<16} {elapsed:8.4f} s  -> {changes}")
+
+    differ = StatusDiffer()
+
+    def run():
+        differ.prime(old)
+        return len(differ.diff(new))
+
+    elapsed, changes = best(run)
+    print(f"{'StatusDiffer':<16} {elapsed / 2:8.4f} s  -> {changes}  (per diff)")
+
+
+if __name__ == "__main__":
+    main()
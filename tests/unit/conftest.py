@@ -0,0 +1,71 @@
+"""Fixtures for offline unit tests.
+
+These tests never talk to a UrBackup server, so the module-scoped
+server restart of the parent conftest is replaced by a no-op.
+"""
+
+import pytest
+
+from urbackup_api import Backup, BackupFile, Backups, FilesResult
+
+
+@pytest.fixture(scope="module", autouse=True)
+def clean_server():
+    """Override the server restart: unit tests need no server."""
+    yield
+
+
+class FakeBackupSource:
+    """Serves ``get_files`` listings from nested dicts instead of a server.
+
+    *backups* maps ``(clientid, backupid)`` to a tree where a directory is a
+    dict and a file is a ``(size, mod, shahash)`` tuple.  File downloads
+    are served from *contents*, keyed by ``(clientid, backupid, path)``.
+    """
+
+    def __init__(self, backups, contents=None):
+        self.backups = backups
+        self.contents = contents or {}
+        self.delete_pending = set()
+        self.calls = []
+
+    def download_backup_file_to(self, clientid, backupid, path, outputf):
+        self.calls.append((clientid, backupid, "download", path))
+        data = self.contents.get((clientid, backupid, path))
+        if data is None:
+            return False
+        outputf.write(data)
+        return True
+
+    def get_backups(self, clientid):
+        self.calls.append((clientid, "backups"))
+        return Backups(clientid=clientid, backups=[
+            Backup(id=bid, clientid=cid, backuptime=bid,
+                   delete_pending=(cid, bid) in self.delete_pending)
+            for cid, bid in sorted(self.backups) if cid == clientid
+        ])
+
+    def get_files(self, clientid, backupid, path="/", mount=False):
+        self.calls.append((clientid, backupid, path))
+        node = self.backups.get((clientid, backupid))
+        if node is None:
+            return None
+        for part in [p for p in path.split("/") if p]:
+            node = node[part]
+        files = []
+        for name, value in sorted(node.items()):
+            if isinstance(value, dict):
+                files.append(BackupFile(name=name, dir=True))
+            else:
+                size, mod, shahash = value
+                files.append(BackupFile(
+                    name=name, size=size, mod=mod, shahash=shahash,
+                ))
+        return FilesResult(backupid=backupid, clientid=clientid,
+                           path=path, files=files)
+
+
+@pytest.fixture()
+def fake_backups():
+    """Return the ``FakeBackupSource`` class for offline traversal tests."""
+    return FakeBackupSource
@@ -0,0 +1,128 @@
+"""Tests for the persistent backup listing cache."""
+
+from urbackup_api import (
+    FilesResult,
+    ListingCache,
+    LogCache,
+    LogDataRow,
+    get_log_many,
+)
+
+
+TREE = {
+    "docs": {"a.txt": (1, 10, "h1")},
+    "readme": (4, 40, "h4"),
+}
+
+
+def _listing_calls(source):
+    return [c for c in source.calls if c[-1] != "backups"]
+
+
+class TestListingCache:
+
+    def test_second_lookup_is_served_locally(self, fake_backups, tmp_path):
+        source = fake_backups({(1, 5): TREE})
+        cache = ListingCache(source, str(tmp_path))
+        first = cache.get_files(1, 5, "/docs")
+        second = cache.get_files(1, 5, "/docs")
+        assert isinstance(second, FilesResult)
+        assert first == second
+        assert _listing_calls(source) == [(1, 5, "/docs")]
+
+    def test_persists_across_instances(self, fake_backups, tmp_path):
+        source = fake_backups({(1, 5): TREE})
+        ListingCache(source, str(tmp_path)).get_files(1, 5, "/")
+        cache = ListingCache(source, str(tmp_path))
+        assert cache.get_files(1, 5, "/").files[0].name == "docs"
+        assert _listing_calls(source) == [(1, 5, "/")]
+
+    def test_delete_pending_invalidates(self, fake_backups, tmp_path):
+        source = fake_backups({(1, 5): TREE})
+        cache = ListingCache(source, str(tmp_path), revalidate_interval=0)
+        cache.get_files(1, 5, "/")
+        source.delete_pending.add((1, 5))
+        cache.get_files(1, 5, "/")
+        assert len(_listing_calls(source)) == 2
+        assert cache.size_bytes == 0
+
+    def test_ignores_foreign_entries(self, fake_backups, tmp_path):
+        (tmp_path / "log-7").write_bytes(b"x")
+        (tmp_path / "notes").write_bytes(b"x")
+        source = fake_backups({(1, 5): TREE})
+        cache = ListingCache(source, str(tmp_path), revalidate_interval=0)
+        cache.get_files(1, 5, "/")
+        assert cache.get_files(1, 5, "/").files[0].name == "docs"
+        assert (tmp_path / "log-7").exists()
+
+    def test_warm_caches_whole_tree(self, fake_backups, tmp_path):
+        source = fake_backups({(1, 5): TREE})
+        cache = ListingCache(source, str(tmp_path))
+        assert cache.warm(1, 5) == 2
+        source.calls.clear()
+        assert cache.get_backup_content(1, 5, "/docs")[0]["name"] == "a.txt"
+        assert _listing_calls(source) == []
+
+    def test_size_limit(self, fake_backups, tmp_path):
+        source = fake_backups({(1, 5): TREE})
+        cache = ListingCache(source, str(tmp_path), max_bytes=150)
+        cache.get_files(1, 5, "/")
+        cache.get_files(1, 5, "/docs")
+        assert cache.size_bytes <= 150
+
+
+class FakeLogServer:
+
+    def __init__(self):
+        self.calls = []
+
+    def get_log(self, logid):
+        self.calls.append(logid)
+        if logid < 0:
+            return None
+        if logid == 0:
+            return []
+        if logid == 99:
+            raise ConnectionResetError("reset")
+        return [LogDataRow(level=logid % 3, message=f"m{logid}-{i}", time=i)
+                for i in range(3)]
+
+
+class TestLogCache:
+
+    def test_logs_are_fetched_once_across_instances(self, tmp_path):
+        server = FakeLogServer()
+        first = LogCache(server, str(tmp_path)).get_log(4)
+        second = LogCache(server, str(tmp_path)).get_log(4)
+        assert second == first
+        assert all(isinstance(r, LogDataRow) for r in second)
+        assert server.calls == [4]
+
+    def test_get_log_many(self, tmp_path):
+        server = FakeLogServer()
+        cache = LogCache(server, str(tmp_path))
+        cache.get_log(1)
+        logs = cache.get_log_many([3, 1, 2, 3, -1], max_workers=4)
+        assert list(logs) == [3, 1, 2, -1]
+        assert logs[2][0].message == "m2-0"
+        assert logs[-1] is None
+        assert sorted(server.calls) == [-1, 1, 2, 3]
+
+    def test_without_cache(self):
+        server = FakeLogServer()
+        logs = get_log_many(server, [5, 6])
+        assert [rows[1].message for rows in logs.values()] == ["m5-1", "m6-1"]
+
+    def test_failed_fetch_maps_to_none(self):
+        server = FakeLogServer()
+        logs = get_log_many(server, [5, 99, 6])
+        assert logs[99] is None
+        assert logs[5][0].message == "m5-0"
+        assert logs[6][0].message == "m6-0"
+
+    def test_empty_log_is_not_cached(self, tmp_path):
+        server = FakeLogServer()
+        cache = LogCache(server, str(tmp_path))
+        assert cache.get_log(0) == []
+        assert cache.get_log(0) == []
+        assert server.calls == [0, 0]
@@ -0,0 +1,80 @@
+"""Tests for the local backup file catalog."""
+
+from urbackup_api import BackupCatalog, CatalogEntry
+from urbackup_api._catalog import _pattern_ext
+
+
+BACKUP_1 = {
+    "finance": {"q1.xlsx": (100, 1000, "h1"), "notes.txt": (5, 1000, "h2")},
+    "home": {"finance": {"old.xlsx": (50, 500, "h3")}},
+}
+BACKUP_2 = {
+    "finance": {"q1.xlsx": (100, 1000, "h1"), "q2.xlsx": (200, 2000, "h4")},
+}
+
+
+class TestBackupCatalog:
+
+    def _catalog(self, fake_backups, tmp_path):
+        source = fake_backups({(1, 1): BACKUP_1, (1, 2): BACKUP_2})
+        catalog = BackupCatalog(source, str(tmp_path / "catalog.db"))
+        return source, catalog
+
+    def test_update_indexes_only_new_backups(self, fake_backups, tmp_path):
+        source, catalog = self._catalog(fake_backups, tmp_path)
+        assert catalog.update([1]) == 2
+        assert catalog.indexed_backups() == [(1, 1), (1, 2)]
+        source.calls.clear()
+        assert catalog.update([1]) == 0
+        assert source.calls == [(1, "backups")]
+
+    def test_glob(self, fake_backups, tmp_path):
+        _, catalog = self._catalog(fake_backups, tmp_path)
+        catalog.update([1])
+        paths = [(e.backupid, e.path) for e in catalog.find("*/finance/*.xlsx")]
+        assert paths == [
+            (1, "/finance/q1.xlsx"),
+            (1, "/home/finance/old.xlsx"),
+            (2, "/finance/q1.xlsx"),
+            (2, "/finance/q2.xlsx"),
+        ]
+        assert catalog.find_backups("*/q2.xlsx") == [(1, 2)]
+
+    def test_leading_star_glob_uses_extension_index(self, fake_backups, tmp_path):
+        _, catalog = self._catalog(fake_backups, tmp_path)
+        plan = " ".join(str(r) for r in catalog._db.execute(
+            "EXPLAIN QUERY PLAN SELECT path FROM files WHERE ext = ? AND path GLOB ?",
+            ("xlsx", "*/finance/*.xlsx"),
+        ))
+        assert "files_ext" in plan
+        assert _pattern_ext("*/finance/*.xlsx") == "xlsx"
+        assert _pattern_ext("*.tar.gz") == "gz"
+        assert _pattern_ext("*/v1.2/*") is None
+        assert _pattern_ext("*.[xX]lsx") is None
+
+    def test_pattern_without_extension(self, fake_backups, tmp_path):
+        _, catalog = self._catalog(fake_backups, tmp_path)
+        catalog.update([1])
+        assert [e.path for e in catalog.find("/home/*")] == ["/home/finance/old.xlsx"]
+        assert len(catalog.find("*.xls?")) == 4
+
+    def test_size_and_time_ranges(self, fake_backups, tmp_path):
+        _, catalog = self._catalog(fake_backups, tmp_path)
+        catalog.update([1])
+        entries = catalog.find(min_size=60, mod_before=1500)
+        assert {e.path for e in entries} == {"/finance/q1.xlsx"}
+
+    def test_hash_lookup(self, fake_backups, tmp_path):
+        _, catalog = self._catalog(fake_backups, tmp_path)
+        catalog.update([1])
+        entries = catalog.find(shahash="h1")
+        assert all(isinstance(e, CatalogEntry) for e in entries)
+        assert [e.backupid for e in entries] == [1, 2]
+
+    def test_deleted_backups_are_forgotten(self, fake_backups, tmp_path):
+        source, catalog = self._catalog(fake_backups, tmp_path)
+        catalog.update([1])
+        source.delete_pending.add((1, 1))
+        catalog.update([1])
+        assert catalog.indexed_backups() == [(1, 2)]
+        assert catalog.find(name="old.xlsx") == []
@@ -0,0 +1,40 @@
+"""Tests for the backup completion feed."""
+
+import pytest
+
+from urbackup_api import ActivityItem, CompletionFeed, ProgressResult
+
+
+def _snap(*acts):
+    return ProgressResult(lastacts=[
+        ActivityItem(id=i, backuptime=t, is_delete=d) for i, t, d in acts
+    ])
+
+
+class TestCompletionFeed:
+
+    def test_each_activity_once_across_restarts(self, tmp_path):
+        state = str(tmp_path / "acts.json")
+        feed = CompletionFeed(state)
+        assert [a.id for a in feed.feed(_snap((2, 20, False), (1, 10, False)))] == [1, 2]
+        assert feed.feed(_snap((2, 20, False), (1, 10, False))) == []
+        feed = CompletionFeed(state)
+        assert [a.id for a in feed.feed(_snap((3, 30, False), (2, 20, False)))] == [3]
+
+    def test_deletes_are_skipped_but_advance_the_watermark(self, tmp_path):
+        feed = CompletionFeed(str(tmp_path / "acts.json"))
+        assert feed.feed(_snap((1, 10, True))) == []
+        assert feed.watermark["id"] == 1
+        feed = CompletionFeed(str(tmp_path / "other.json"), include_deletes=True)
+        assert len(feed.feed(_snap((1, 10, True)))) == 1
+
+    def test_uncommitted_and_reset(self, tmp_path):
+        feed = CompletionFeed(str(tmp_path / "acts.json"))
+        acts = feed.feed(_snap((5, 50, False)), commit=False)
+        assert len(feed.feed(_snap((5, 50, False)), commit=False)) == 1
+        feed.commit(acts[-1])
+        assert [a.id for a in feed.feed(_snap((1, 40, False), (2, 60, False)))] == [2]
+
+    def test_requires_last_activities(self, tmp_path):
+        with pytest.raises(ValueError):
+            CompletionFeed(str(tmp_path / "acts.json")).feed(ProgressResult())
@@ -0,0 +1,46 @@
+"""Tests for the concurrent backup crawl."""
+
+from urbackup_api import (
+    Backup,
+    Backups,
+    BackupsAccessDeniedError,
+    BackupTable,
+    crawl_backups,
+)
+
+
+class FakeServer:
+
+    def get_backups(self, clientid):
+        if clientid == 3:
+            raise BackupsAccessDeniedError()
+        return Backups(
+            clientid=clientid,
+            backups=[Backup(id=clientid * 10 + i, size_bytes=i) for i in range(2)],
+            backup_images=[Backup(id=clientid * 100, size_bytes=1000)],
+        )
+
+
+class TestCrawlBackups:
+
+    def test_merges_file_and_image_backups(self):
+        table = crawl_backups(FakeServer(), [1, 2], max_workers=4)
+        assert isinstance(table, BackupTable)
+        assert len(table) == 6
+        rows = table.by_client()
+        assert sorted((img, b.id) for img, b in rows[1]) == [
+            (False, 10), (False, 11), (True, 100),
+        ]
+        assert all(b.clientid == 2 for _, b in rows[2])
+
+    def test_errors_are_isolated(self):
+        table = crawl_backups(FakeServer(), range(1, 40), max_workers=8)
+        assert list(table.errors) == [3]
+        assert isinstance(table.errors[3], BackupsAccessDeniedError)
+        assert len(table.by_client()) == 38
+
+    def test_filtered_rows(self):
+        table = crawl_backups(FakeServer(), [1, 2])
+        images = [b.id for _, b in table.rows(image=True)]
+        assert sorted(images) == [100, 200]
+        assert [b.size_bytes for _, b in table.rows(clientid=2, image=False)] == [0, 1]
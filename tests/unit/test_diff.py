@@ -0,0 +1,78 @@
+"""Tests for streaming backup diffs."""
+
+import pytest
+
+from urbackup_api import BackupsAccessError, ChangeType, diff_backups
+
+
+OLD = {
+    "docs": {
+        "a.txt": (1, 10, "h1"),
+        "b.txt": (2, 20, "h2"),
+        "sub": {"c.txt": (3, 30, "h3")},
+    },
+    "gone": {"x.txt": (9, 90, "h9")},
+    "same.txt": (4, 40, "h4"),
+}
+NEW = {
+    "docs": {
+        "a.txt": (1, 10, "h1"),
+        "b.txt": (2, 21, "h2x"),
+        "sub": {"c.txt": (3, 30, "h3"), "d.txt": (5, 50, "h5")},
+    },
+    "new": {"y.txt": (8, 80, "h8")},
+    "same.txt": (4, 40, "h4"),
+}
+
+
+class TestDiffBackups:
+
+    def test_changes_in_sorted_order(self, fake_backups):
+        source = fake_backups({(1, 1): OLD, (1, 2): NEW})
+        changes = [(c.change, c.path) for c in diff_backups(source, 1, 1, 2)]
+        assert changes == [
+            (ChangeType.MODIFIED, "/docs/b.txt"),
+            (ChangeType.ADDED, "/docs/sub/d.txt"),
+            (ChangeType.REMOVED, "/gone"),
+            (ChangeType.ADDED, "/new"),
+        ]
+
+    def test_modified_carries_both_sides(self, fake_backups):
+        source = fake_backups({(1, 1): OLD, (1, 2): NEW})
+        change = next(diff_backups(source, 1, 1, 2))
+        assert change.old.shahash == "h2"
+        assert change.new.shahash == "h2x"
+
+    def test_identical_backups(self, fake_backups):
+        source = fake_backups({(1, 1): OLD, (2, 7): OLD})
+        assert list(diff_backups(source, 1, 1, 7, new_clientid=2)) == []
+
+    def test_removed_directory_is_not_expanded(self, fake_backups):
+        source = fake_backups({(1, 1): OLD, (1, 2): NEW})
+        list(diff_backups(source, 1, 1, 2))
+        assert (1, 1, "/gone") not in source.calls
+
+    def test_missing_backup_raises(self, fake_backups):
+        source = fake_backups({(1, 1): OLD})
+        with pytest.raises(BackupsAccessError):
+            list(diff_backups(source, 1, 1, 99))
+
+    def test_unlistable_subdirectory_is_reported(self, fake_backups, caplog):
+        source = fake_backups({(1, 1): OLD, (1, 2): NEW})
+        get_files = source.get_files
+
+        def failing(clientid, backupid, path="/", mount=False):
+            if path == "/docs/sub" and backupid == 2:
+                return None
+            return get_files(clientid, backupid, path, mount)
+
+        source.get_files = failing
+        changes = list(diff_backups(source, 1, 1, 2))
+        assert [(c.change, c.path) for c in changes] == [
+            (ChangeType.MODIFIED, "/docs/b.txt"),
+            (ChangeType.UNLISTABLE, "/docs/sub"),
+            (ChangeType.REMOVED, "/gone"),
+            (ChangeType.ADDED, "/new"),
+        ]
+        assert changes[1].old.dir and changes[1].new.dir
+        assert "/docs/sub" in caplog.text
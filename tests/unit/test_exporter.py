@@ -0,0 +1,114 @@
+"""Tests for the Prometheus exporter."""
+
+import threading
+import time
+import urllib.request
+
+from urbackup_api import (
+    MetricsCollector,
+    ProcessItem,
+    ProgressResult,
+    StatusClientItem,
+    StatusResult,
+    UsageClientStat,
+    render_metrics,
+)
+from urbackup_api._exporter import make_metrics_server
+
+
+STATUS = StatusResult(status=[
+    StatusClientItem(id=1, name='pc "1"', groupname="office", online=True,
+                     file_ok=True, lastbackup=900, lastbackup_image="-"),
+    StatusClientItem(id=2, name="srv", online=False),
+])
+PROGRESS = ProgressResult(progress=[
+    ProcessItem(clientid=1, id=5, speed_bpms=2.5),
+    ProcessItem(clientid=1, id=6, speed_bpms=1),
+])
+USAGE = [UsageClientStat(name="srv", used=30, files=10, images=20)]
+
+
+class FakeServer:
+
+    def __init__(self):
+        self.calls = 0
+
+    def get_status_result(self):
+        self.calls += 1
+        return STATUS
+
+    def get_progress(self):
+        return PROGRESS
+
+    def get_usage_stats(self):
+        return USAGE
+
+
+class TestRenderMetrics:
+
+    def test_client_metrics(self):
+        text = render_metrics(STATUS, PROGRESS, USAGE, now=1000)
+        labels = 'client="pc \\"1\\"",clientid="1",group="office"'
+        assert f"urbackup_client_online{{{labels}}} 1" in text
+        assert f"urbackup_client_last_file_backup_age_seconds{{{labels}}} 100" in text
+        assert "urbackup_client_last_image_backup_age_seconds{" not in text
+        assert f"urbackup_client_running_processes{{{labels}}} 2" in text
+        assert f"urbackup_client_transfer_bytes_per_second{{{labels}}} 3500" in text
+        assert 'urbackup_client_used_bytes{client="srv",clientid="2",group=""} 30' in text
+        assert "# TYPE urbackup_client_online gauge" in text
+
+    def test_large_and_fractional_values_are_exact(self):
+        usage = [UsageClientStat(name="srv", used=123456789012, files=1234567)]
+        progress = ProgressResult(progress=[
+            ProcessItem(clientid=2, id=1, speed_bpms=1.2345678),
+        ])
+        text = render_metrics(STATUS, progress, usage, now=1000)
+        labels = 'client="srv",clientid="2",group=""'
+        assert f"urbackup_client_used_bytes{{{labels}}} 123456789012\n" in text
+        assert f"urbackup_client_file_backup_bytes{{{labels}}} 1234567\n" in text
+        speed = float(text.split(f"transfer_bytes_per_second{{{labels}}} ")[1].split()[0])
+        assert speed == 1.2345678 * 1000
+
+
+class TestMetricsCollector:
+
+    def test_scrapes_are_served_from_cache(self):
+        server = FakeServer()
+        collector = MetricsCollector(server, interval=3600)
+        collector.collect()
+        httpd = make_metrics_server(collector, "127.0.0.1", 0)
+        thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+        thread.start()
+        try:
+            url = f"http://127.0.0.1:{httpd.server_address[1]}/metrics"
+            for _ in range(3):
+                with urllib.request.urlopen(url) as response:
+                    body = response.read().decode()
+            assert "urbackup_up 1" in body
+            assert 'clientid="2"' in body
+            assert server.calls == 1
+        finally:
+            httpd.shutdown()
+            httpd.server_close()
+
+    def test_failed_collection_reports_down(self):
+        class Down:
+            def get_status_result(self):
+                raise ConnectionError()
+
+        collector = MetricsCollector(Down())
+        collector.collect()
+        assert b"urbackup_up 0" in collector.render()
+
+    def test_background_collection(self):
+        server = FakeServer()
+        collector = MetricsCollector(server, interval=0.01)
+        collector.start()
+        try:
+            deadline = time.monotonic() + 5
+            while server.calls < 3 and time.monotonic() < deadline:
+                time.sleep(0.01)
+        finally:
+            collector.stop()
+        assert server.calls >= 3
+        assert b"urbackup_up 1" in collector.render()
@@ -0,0 +1,78 @@
+"""Tests for the multi-server fleet."""
+
+import threading
+
+from urbackup_api import (
+    LogInfo,
+    ProcessItem,
+    ProgressResult,
+    StatusClientItem,
+    StatusResult,
+    UrbackupFleet,
+    UsageClientStat,
+)
+
+
+class FakeServer:
+
+    def __init__(self, n, hang=None, fail=False):
+        self.n = n
+        self.hang = hang
+        self.fail = fail
+
+    def _check(self):
+        if self.hang is not None:
+            self.hang.wait(5)
+        if self.fail:
+            raise ConnectionError("refused")
+
+    def get_status_result(self):
+        self._check()
+        return StatusResult(status=[StatusClientItem(id=i) for i in range(self.n)])
+
+    def get_progress(self, with_last_activities=False):
+        self._check()
+        return ProgressResult(progress=[ProcessItem(id=1)])
+
+    def get_usage_stats(self):
+        self._check()
+        return [UsageClientStat(name="x", used=self.n)]
+
+    def get_logs(self, filter_clients=None, log_level=0):
+        self._check()
+        return None if self.n == 0 else [LogInfo(id=self.n)]
+
+
+class TestUrbackupFleet:
+
+    def test_rows_are_tagged_and_merged(self):
+        with UrbackupFleet({"a": FakeServer(2), "b": FakeServer(1)}) as fleet:
+            result = fleet.status()
+            assert [(r.server, r.row.id) for r in result.rows] == [
+                ("a", 0), ("a", 1), ("b", 0),
+            ]
+            assert result.errors == {}
+            usage = fleet.usage().by_server()
+            assert {k: [u.used for u in v] for k, v in usage.items()} == {
+                "a": [2], "b": [1],
+            }
+            assert len(fleet.progress().rows) == 2
+
+    def test_slow_and_failing_servers_do_not_block(self):
+        hang = threading.Event()
+        fleet = UrbackupFleet({
+            "ok": FakeServer(1),
+            "slow": FakeServer(1, hang=hang),
+            "down": FakeServer(1, fail=True),
+            "empty": FakeServer(0),
+        }, timeout=0.2)
+        try:
+            result = fleet.logs()
+            assert [r.server for r in result.rows] == ["ok"]
+            assert set(result.errors) == {"slow", "down", "empty"}
+            assert "TimeoutError" in result.errors["slow"]
+            assert "ConnectionError" in result.errors["down"]
+            assert result.errors["empty"] == "no response"
+        finally:
+            hang.set()
+            fleet.close()
@@ -0,0 +1,322 @@
+"""Tests for hedged read requests."""
+
+import http.server
+import shutil
+import socket
+import ssl
+import subprocess
+import threading
+import time
+
+import pytest
+
+from urbackup_api import HedgeStats, urbackup_server
+from urbackup_api._hedge import _Hedger, _is_hedgeable
+
+
+class FakeResponse:
+
+    def __init__(self, tag, status=200):
+        self.tag = tag
+        self.status = status
+        self.closed = False
+
+    def read(self):
+        return b'{"tag": "%s"}' % self.tag.encode()
+
+    def close(self):
+        self.closed = True
+
+
+class FakeConnection:
+    """Stands in for the connection of one request: answered after *delay*."""
+
+    def __init__(self, delay):
+        self.sock, self._peer = socket.socketpair()
+        self.sock.settimeout(5)
+        self._timer = threading.Timer(delay, self._peer.send, (b"x",))
+        self._timer.start()
+
+    def getresponse(self):
+        if not self.sock.recv(1):
+            raise ConnectionResetError("connection shut down")
+
+    def close(self):
+        self._timer.cancel()
+        self.sock.close()
+        self._peer.close()
+
+
+class FakeServer:
+    """Answers each request after the next scripted delay."""
+
+    _profiler = None
+
+    def __init__(self, delays=()):
+        self.delays = list(delays)
+        self.lock = threading.Lock()
+        self.params = []
+        self.threads = []
+        self.calls = []
+        self.responses = []
+
+    def _get_response(self, action, params, method="POST", call=None,
+                      on_sent=None):
+        with self.lock:
+            n = len(self.params)
+            self.params.append(params)
+            self.threads.append(threading.get_ident())
+            self.calls.append(call)
+            delay = self.delays.pop(0) if self.delays else 0.0
+        params["ses"] = "s"
+        if delay is None:
+            raise ConnectionResetError("reset")
+        h = FakeConnection(delay)
+        try:
+            if on_sent is not None:
+                on_sent(h)
+            h.getresponse()
+        finally:
+            h.close()
+        response = FakeResponse(str(n))
+        self.responses.append(response)
+        return response
+
+
+def _tls_context(tmp_path):
+    if shutil.which("openssl") is None:
+        pytest.skip("openssl is not installed")
+    cert, key = tmp_path / "cert.pem", tmp_path / "key.pem"
+    subprocess.run(
+        ["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes",
+         "-keyout", str(key), "-out", str(cert), "-days", "1",
+         "-subj", "/CN=127.0.0.1"],
+        check=True, capture_output=True,
+    )
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    # TLS 1.3 servers send session tickets after the handshake.
+    context.minimum_version = ssl.TLSVersion.TLSv1_3
+    context.load_cert_chain(str(cert), str(key))
+    return context
+
+
+@pytest.fixture(params=["http", "https"])
+def slow_http(request, tmp_path, monkeypatch):
+    """A local HTTP(S) server answering the n-th request after delays[n]."""
+    context = None
+    if request.param == "https":
+        context = _tls_context(tmp_path)
+        monkeypatch.setattr(ssl, "_create_default_https_context",
+                            ssl._create_unverified_context)
+    delays = []
+    count = [0]
+    lock = threading.Lock()
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers["Content-Length"]))
+            with lock:
+                n = count[0]
+                count[0] += 1
+                delay = delays.pop(0) if delays else 0.0
+            time.sleep(delay)
+            body = b'{"n": %d}' % n
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    httpd = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    httpd.daemon_threads = True
+    if context is not None:
+        httpd.socket = context.wrap_socket(httpd.socket, server_side=True)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    port = httpd.server_address[1]
+    yield delays, "%s://127.0.0.1:%d/x" % (request.param, port)
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def warm(hedger, server, n=20):
+    for _ in range(n):
+        hedger.get_response(server, "status", {}).close()
+
+
+class TestIsHedgeable:
+
+    @pytest.mark.parametrize("action,params,expected", [
+        ("status", {}, True),
+        ("status", {"ses": "x"}, True),
+        ("status", {"remove_client": "1"}, False),
+        ("progress", {"with_lastacts": "1"}, True),
+        ("progress", {"stop_clientid": "1", "stop_id": "2"}, False),
+        ("backups", {"sa": "backups", "clientid": "1"}, True),
+        ("backups", {"sa": "files", "clientid": "1"}, False),
+        ("backups", {"sa": "backups", "delete_now": "1"}, False),
+        ("logs", {"logid": "5"}, True),
+        ("logs", {"report_mail": "a@b"}, False),
+        ("usage", {}, True),
+        ("start_backup", {}, False),
+    ])
+    def test_classification(self, action, params, expected):
+        assert _is_hedgeable(action, params) is expected
+
+
+class TestHedger:
+
+    def test_no_hedge_before_min_samples(self):
+        hedger = _Hedger(min_samples=5)
+        server = FakeServer([0.0] * 4)
+        warm(hedger, server, 4)
+        assert hedger.delay(("status", "")) is None
+        assert len(server.params) == 4
+        hedger.close()
+
+    def test_writes_are_sent_once(self):
+        hedger = _Hedger(min_samples=0)
+        server = FakeServer([0.1])
+        hedger.get_response(server, "status", {"remove_client": "1"})
+        assert len(server.params) == 1
+        assert hedger.stats() == HedgeStats()
+        hedger.close()
+
+    def test_slow_attempt_is_hedged(self):
+        hedger = _Hedger(min_delay=0.01)
+        server = FakeServer([0.0] * 20 + [1.0, 0.0])
+        warm(hedger, server)
+        start = time.perf_counter()
+        response = hedger.get_response(server, "status", {})
+        assert time.perf_counter() - start < 0.5
+        assert response.tag == "21"
+        assert hedger.stats() == HedgeStats(requests=21, hedged=1, wins=1)
+        # Each attempt got its own copy of the parameters.
+        assert server.params[20] is not server.params[21]
+        hedger.close()
+
+    def test_first_attempt_runs_on_calling_thread(self):
+        hedger = _Hedger(min_delay=0.01)
+        server = FakeServer([0.0] * 20 + [1.0, 0.0])
+        warm(hedger, server)
+        hedger.get_response(server, "status", {})
+        caller = threading.get_ident()
+        assert server.threads[:21] == [caller] * 21
+        assert server.threads[21] != caller
+        hedger.close()
+
+    def test_fast_first_attempt_is_not_hedged(self):
+        hedger = _Hedger(min_delay=0.2)
+        server = FakeServer([0.0] * 21)
+        warm(hedger, server)
+        assert hedger.get_response(server, "status", {}).tag == "20"
+        assert len(server.params) == 21
+        assert hedger.stats().hedged == 0
+        hedger.close()
+
+    def test_losing_hedge_is_discarded(self):
+        hedger = _Hedger(min_delay=0.01)
+        server = FakeServer([0.0] * 20 + [0.05, 0.2])
+        warm(hedger, server)
+        assert hedger.get_response(server, "status", {}).tag == "20"
+        assert hedger.stats().wins == 0
+        time.sleep(0.4)
+        loser = [r for r in server.responses if r.tag == "21"]
+        assert loser and loser[0].closed
+        hedger.close()
+
+    def test_losing_first_attempt_is_abandoned(self):
+        hedger = _Hedger(min_delay=0.01)
+        server = FakeServer([0.0] * 20 + [0.2, 0.0])
+        warm(hedger, server)
+        assert hedger.get_response(server, "status", {}).tag == "21"
+        time.sleep(0.4)
+        assert not [r for r in server.responses if r.tag == "20"]
+        hedger.close()
+
+    def test_failed_hedge_leaves_first_attempt_waiting(self):
+        hedger = _Hedger(min_delay=0.01)
+        server = FakeServer([0.0] * 20 + [0.3, None])
+        warm(hedger, server)
+        assert hedger.get_response(server, "status", {}).tag == "20"
+        assert hedger.stats().wins == 0
+        hedger.close()
+
+    def test_budget_caps_hedges(self):
+        hedger = _Hedger(budget=0.0, burst=0.0, min_delay=0.01)
+        server = FakeServer([0.0] * 20 + [0.1])
+        warm(hedger, server)
+        response = hedger.get_response(server, "status", {})
+        assert response.tag == "20"
+        assert len(server.params) == 21
+        assert hedger.stats().denied == 1
+        hedger.close()
+
+    def test_budget_refills_per_request(self):
+        hedger = _Hedger(budget=0.5, burst=1.0, min_delay=0.01)
+        hedger._tokens = 0.0
+        server = FakeServer([0.0] * 20 + [0.1, 0.0])
+        warm(hedger, server)
+        hedger.get_response(server, "status", {})
+        assert hedger.stats().hedged == 1
+        assert hedger._tokens < 1.0
+        hedger.close()
+
+    def test_failed_attempt_falls_back_to_other(self):
+        hedger = _Hedger(min_delay=0.01)
+        server = FakeServer([0.0] * 20 + [None, 0.0])
+        warm(hedger, server)
+        # The first attempt fails fast: no hedge, the error is raised.
+        with pytest.raises(ConnectionResetError):
+            hedger.get_response(server, "status", {})
+        server.delays = [0.3, None]
+        # A slow first attempt still wins over a failed hedge.
+        assert hedger.get_response(server, "status", {}).tag == "21"
+        hedger.close()
+
+
+class TestServerHedging:
+
+    def test_enable_and_disable(self):
+        server = urbackup_server("http://127.0.0.1:55414/x", "admin", "secret")
+        assert server.hedge_stats() is None
+        server.enable_hedging(budget=0.1)
+        assert server.hedge_stats() == HedgeStats()
+        server.disable_hedging()
+        assert server.hedge_stats() is None
+
+    def test_get_json_uses_hedger(self, monkeypatch):
+        server = urbackup_server("http://127.0.0.1:55414/x", "admin", "secret")
+        fake = FakeServer([0.0] * 20 + [1.0, 0.0])
+        monkeypatch.setattr(server, "_get_response", fake._get_response)
+        server.enable_hedging(min_delay=0.01)
+        for _ in range(20):
+            server._get_json("status")
+        assert server._get_json("status") == {"tag": "21"}
+        assert server.hedge_stats().wins == 1
+        server.disable_hedging()
+
+    def test_profiled_hedge_keeps_phases(self, slow_http):
+        delays, url = slow_http
+        server = urbackup_server(url, "admin", "secret")
+        server._logged_in = True
+        server.enable_profiling()
+        server.enable_hedging(min_delay=0.01)
+        for _ in range(20):
+            server._get_json("status")
+        delays.extend([1.0, 0.0])
+        start = time.perf_counter()
+        assert server._get_json("status") == {"n": 21}
+        assert time.perf_counter() - start < 0.5
+        assert server.hedge_stats().wins == 1
+        calls = server.profile_calls()
+        assert len(calls) == 21
+        for call in calls:
+            assert {"connect", "send", "wait", "read"} <= set(call.phases)
+        # Both attempts of the hedged call were timed into the same profile.
+        assert calls[-1].phases["wait"] < 0.5
+        server.disable_hedging()
@@ -0,0 +1,98 @@
+"""Tests for the incremental backup inventory mirror."""
+
+import time
+
+from urbackup_api import (
+    Backup,
+    Backups,
+    BackupInventory,
+    BackupsAccessDeniedError,
+    StatusClientItem,
+    StatusResult,
+)
+
+
+class FakeServer:
+
+    def __init__(self):
+        self.clients = {}
+        self.backups = {}
+        self.fetched = []
+
+    def get_status_result(self):
+        return StatusResult(status=[
+            StatusClientItem(id=cid, name=name, lastbackup=last)
+            for cid, (name, last) in sorted(self.clients.items())
+        ])
+
+    def get_backups(self, clientid):
+        self.fetched.append(clientid)
+        backups = self.backups[clientid]
+        if isinstance(backups, Exception):
+            raise backups
+        return Backups(clientid=clientid, backups=list(backups), backup_images=[])
+
+
+class TestBackupInventory:
+
+    def _setup(self, tmp_path):
+        server = FakeServer()
+        server.clients = {1: ("a", 100), 2: ("b", 200)}
+        server.backups = {
+            1: [Backup(id=1, clientid=1, backuptime=50, size_bytes=10),
+                Backup(id=2, clientid=1, backuptime=100, size_bytes=20)],
+            2: [Backup(id=3, clientid=2, backuptime=200, size_bytes=5)],
+        }
+        return server, BackupInventory(server, str(tmp_path / "inv.db"))
+
+    def test_initial_sync_fetches_all(self, tmp_path):
+        server, inv = self._setup(tmp_path)
+        result = inv.sync()
+        assert sorted(result.refetched) == [1, 2]
+        assert inv.total_bytes_per_client() == {1: 30, 2: 5}
+
+    def test_only_changed_clients_refetched(self, tmp_path):
+        server, inv = self._setup(tmp_path)
+        inv.sync()
+        server.fetched.clear()
+        server.clients[2] = ("b", 300)
+        server.backups[2].append(Backup(id=4, clientid=2, backuptime=300, size_bytes=7))
+        result = inv.sync()
+        assert server.fetched == [2]
+        assert [(t.backupid, t.kind) for t in result.transitions] == [(4, "added")]
+
+    def test_tracks_transitions(self, tmp_path):
+        server, inv = self._setup(tmp_path)
+        inv = BackupInventory(server, str(tmp_path / "inv.db"), max_age=0)
+        inv.sync()
+        server.backups[1][0] = Backup(id=1, clientid=1, backuptime=50,
+                                      size_bytes=10, delete_pending=True)
+        server.backups[1][1] = Backup(id=2, clientid=1, backuptime=100,
+                                      size_bytes=20, archived=1)
+        kinds = {(t.backupid, t.kind, t.new) for t in inv.sync().transitions}
+        assert kinds == {(1, "delete_pending", True), (2, "archived", True)}
+        assert inv.total_bytes_per_client()[1] == 20
+
+    def test_default_max_age_picks_up_archiving(self, tmp_path, monkeypatch):
+        server, inv = self._setup(tmp_path)
+        inv.sync()
+        server.backups[1][1] = Backup(id=2, clientid=1, backuptime=100,
+                                      size_bytes=20, archived=1)
+        assert inv.sync().transitions == []
+        later = time.time() + 25 * 60 * 60
+        monkeypatch.setattr(time, "time", lambda: later)
+        kinds = [(t.backupid, t.kind) for t in inv.sync().transitions]
+        assert kinds == [(2, "archived")]
+
+    def test_backups_older_than(self, tmp_path):
+        server, inv = self._setup(tmp_path)
+        inv.sync()
+        assert [b.id for b in inv.backups_older_than(150)] == [1, 2]
+        assert [b.id for b in inv.backups(1)] == [1, 2]
+
+    def test_errors_are_isolated(self, tmp_path):
+        server, inv = self._setup(tmp_path)
+        server.backups[1] = BackupsAccessDeniedError()
+        result = inv.sync()
+        assert result.refetched == [2]
+        assert isinstance(result.errors[1], BackupsAccessDeniedError)
@@ -0,0 +1,114 @@
+"""Tests for per-client live log tailing."""
+
+import asyncio
+
+import pytest
+
+from urbackup_api import LiveLogEntry, LiveLogTail, urbackup_server
+from urbackup_api._poll import _AdaptiveInterval, _PollingPublisher
+
+
+class FakeServer:
+
+    def __init__(self):
+        self.logs = {1: [], 2: []}
+        self.calls = []
+
+    def add(self, clientid, msg):
+        n = sum(len(v) for v in self.logs.values()) + 1
+        self.logs[clientid].append(LiveLogEntry(id=n, msg=msg))
+
+    def get_livelog_since(self, clientid, lastid):
+        self.calls.append((clientid, lastid))
+        return [e for e in self.logs[clientid] if e.id > lastid]
+
+
+class TestAdaptiveInterval:
+
+    def test_backs_off_and_resets(self):
+        interval = _AdaptiveInterval(1, 5)
+        assert [interval.update(False) for _ in range(4)] == [2, 4, 5, 5]
+        assert interval.update(True) == 1
+
+
+class TestPollingPublisher:
+
+    def test_poll_is_abstract(self):
+        with pytest.raises(TypeError):
+            _PollingPublisher(1, 2)
+
+    def test_stream_on_closed_loop_is_dropped(self):
+        tail = LiveLogTail(FakeServer(), [1])
+        loop = asyncio.new_event_loop()
+        loop.close()
+        tail._add_sink(
+            lambda item: loop.call_soon_threadsafe(print, item),
+            lambda: loop.call_soon_threadsafe(print),
+        )
+        seen = []
+        tail._add_sink(seen.append, lambda: seen.append("stop"))
+        tail._publish(["a", "b"])
+        assert seen == ["a", "b"]
+        assert len(tail._sinks) == 1
+
+
+class TestLiveLogTail:
+
+    def test_cursors_are_per_client(self):
+        server = FakeServer()
+        tail = LiveLogTail(server, [1, 2])
+        server.add(1, "a")
+        server.add(2, "b")
+        server.add(1, "c")
+        assert [(c, e.msg) for c, e in tail.poll()] == [(1, "a"), (1, "c"), (2, "b")]
+        assert tail.cursors == {1: 3, 2: 2}
+        server.add(2, "d")
+        assert [(c, e.msg) for c, e in tail.poll()] == [(2, "d")]
+        assert server.calls[-2:] == [(1, 3), (2, 2)]
+
+    def test_iterator_and_callback_share_one_poll(self):
+        server = FakeServer()
+        tail = LiveLogTail(server, [1], min_interval=0.01, max_interval=0.02)
+        seen = []
+        tail.subscribe(lambda c, e: seen.append(e.msg))
+        server.add(1, "x")
+        server.add(1, "y")
+        with tail:
+            it = iter(tail)
+            got = [next(it)[1].msg, next(it)[1].msg]
+        assert got == ["x", "y"]
+        assert seen == ["x", "y"]
+        assert list(it) == []
+
+    def test_async_stream(self):
+        server = FakeServer()
+        server.add(2, "z")
+        tail = LiveLogTail(server, [2], min_interval=0.01, max_interval=0.02)
+
+        async def first():
+            async for clientid, entry in tail.stream():
+                return clientid, entry.msg
+
+        try:
+            assert asyncio.run(first()) == (2, "z")
+        finally:
+            tail.stop()
+
+
+class TestLegacyLiveLog:
+
+    def test_empty_logdata_and_per_client_cursor(self):
+        server = urbackup_server("http://127.0.0.1/x", "admin", "pw")
+        server._logged_in = True
+        replies = [{"logdata": [{"id": 7}]}, {"logdata": []}]
+        sent = []
+
+        def fake_get_json(action, params=None):
+            sent.append(params["lastid"])
+            return replies.pop(0)
+
+        server._get_json = fake_get_json
+        assert server.get_livelog(1) == [{"id": 7}]
+        assert server.get_livelog(2) == []
+        assert sent == [0, 0]
+        assert server._lastlogid == 7
@@ -0,0 +1,35 @@
+"""Tests for the raw log parser."""
+
+import types
+
+from urbackup_api import LogDataRow, LogLevel, urbackup_server_typed
+
+
+RAW = "0-100-Starting backup\n1-101-Warning - slow\n\n2-102-Error\nx\n"
+
+
+class TestIterLog:
+
+    def test_is_lazy(self):
+        rows = urbackup_server_typed._iter_log(RAW)
+        assert isinstance(rows, types.GeneratorType)
+        assert next(rows) == LogDataRow(level=0, message="Starting backup", time=100)
+
+    def test_matches_parse_log(self):
+        assert list(urbackup_server_typed._iter_log(RAW)) == [
+            LogDataRow(level=0, message="Starting backup", time=100),
+            LogDataRow(level=1, message="Warning - slow", time=101),
+            LogDataRow(level=2, message="Error", time=102),
+            LogDataRow(level=0, message="", time=0),
+        ]
+        assert urbackup_server_typed._parse_log(RAW) == list(
+            urbackup_server_typed._iter_log(RAW)
+        )
+
+    def test_level_filter(self):
+        rows = urbackup_server_typed._iter_log(RAW, LogLevel.WARNING)
+        assert [r.time for r in rows] == [101, 102]
+
+    def test_no_trailing_newline(self):
+        rows = list(urbackup_server_typed._iter_log("2-5-last"))
+        assert rows == [LogDataRow(level=2, message="last", time=5)]
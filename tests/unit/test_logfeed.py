@@ -0,0 +1,48 @@
+"""Tests for the incremental log summary feed."""
+
+from urbackup_api import LogFeed, LogInfo, LogLevel
+
+
+class FakeServer:
+
+    def __init__(self, logs):
+        self.logs = logs
+        self.calls = []
+
+    def get_logs(self, filter_clients=None, log_level=LogLevel.INFO):
+        self.calls.append((filter_clients, log_level))
+        return [LogInfo(id=i, time=t) for i, t in self.logs]
+
+
+class TestLogFeed:
+
+    def test_only_new_entries_across_runs(self, tmp_path):
+        state = str(tmp_path / "feed.json")
+        server = FakeServer([(2, 20), (1, 10)])
+        assert [e.id for e in LogFeed(server, state).poll()] == [1, 2]
+        server.logs = [(3, 30), (2, 20), (1, 10)]
+        feed = LogFeed(server, state)
+        assert [e.id for e in feed.poll()] == [3]
+        assert feed.poll() == []
+
+    def test_watermarks_are_per_filter(self, tmp_path):
+        server = FakeServer([(1, 10)])
+        feed = LogFeed(server, str(tmp_path / "feed.json"))
+        assert len(feed.poll([2, 1], LogLevel.ERROR)) == 1
+        assert feed.poll([1, 2], LogLevel.ERROR) == []
+        assert len(feed.poll()) == 1
+
+    def test_uncommitted_poll_repeats(self, tmp_path):
+        server = FakeServer([(1, 10)])
+        feed = LogFeed(server, str(tmp_path / "feed.json"))
+        logs = feed.poll(commit=False)
+        assert [e.id for e in feed.poll(commit=False)] == [1]
+        feed.commit(None, LogLevel.INFO, logs[-1])
+        assert feed.poll() == []
+
+    def test_server_reset_falls_back_to_time(self, tmp_path):
+        server = FakeServer([(50, 100)])
+        feed = LogFeed(server, str(tmp_path / "feed.json"))
+        feed.poll()
+        server.logs = [(1, 90), (2, 110)]
+        assert [e.id for e in feed.poll()] == [2]
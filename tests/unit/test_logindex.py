@@ -0,0 +1,108 @@
+"""Tests for the local log index."""
+
+import sqlite3
+
+import pytest
+
+from urbackup_api import LogDataRow, LogIndex, LogInfo, LogLevel, log_template
+from urbackup_api import _logindex
+
+
+def _row(msg, level=LogLevel.INFO, t=0):
+    return LogDataRow(level=int(level), message=msg, time=t)
+
+
+class FakeServer:
+
+    def __init__(self, logs):
+        self.logs = logs
+        self.calls = []
+
+    def get_log(self, logid):
+        self.calls.append(logid)
+        return self.logs.get(logid)
+
+
+class TestLogTemplate:
+
+    def test_masks_numbers_paths_and_hex(self):
+        assert log_template(
+            "Error reading C:\\Users\\a b.txt: code 32 at 0x1f"
+        ) == "Error reading <path> b.txt: code <num> at <hex>"
+        assert log_template("Transferred 1.5 GB in 3:02") == (
+            "Transferred <num> GB in <num>"
+        )
+
+
+class TestLogIndex:
+
+    def _index(self, tmp_path):
+        index = LogIndex(str(tmp_path / "logs.db"))
+        index.add_log(1, [
+            _row("Backup started", t=10),
+            _row("Error reading /home/a/x.txt: Permission denied", LogLevel.ERROR, 11),
+        ], client="alpha", time=10)
+        index.add_log(2, [
+            _row("Error reading /srv/db/y.bin: Permission denied", LogLevel.ERROR, 21),
+            _row("Permission check passed, denied nothing", t=22),
+        ], client="beta", time=20)
+        return index
+
+    def test_token_and_phrase_search(self, tmp_path):
+        index = self._index(tmp_path)
+        hits = index.search("permission denied")
+        assert [h.time for h in hits] == [22, 21, 11]
+        hits = index.search('"permission denied"')
+        assert [h.client for h in hits] == ["beta", "alpha"]
+        assert index.search("nonexistent") == []
+
+    def test_search_filters(self, tmp_path):
+        index = self._index(tmp_path)
+        assert [h.logid for h in index.search("denied", client="alpha")] == [1]
+        errors = index.search("denied", min_level=LogLevel.ERROR)
+        assert [h.time for h in errors] == [21, 11]
+        assert [h.time for h in index.search("denied", since=15, until=22)] == [21]
+
+    def test_top_templates_are_counted_incrementally(self, tmp_path):
+        index = self._index(tmp_path)
+        top = index.top_templates(1, min_level=LogLevel.ERROR)
+        assert top[0].template == "Error reading <path>: Permission denied"
+        assert (top[0].count, top[0].clients, top[0].last_time) == (2, 2, 21)
+        index.add_log(3, [_row("Error reading /z: Permission denied", LogLevel.ERROR, 30)],
+                      client="alpha")
+        top = index.top_templates(1, client="alpha")
+        assert (top[0].count, top[0].last_time) == (2, 30)
+
+    def test_rolled_back_templates_are_not_cached(self, tmp_path):
+        index = LogIndex(str(tmp_path / "logs.db"))
+        bad = LogDataRow(level=object(), message="Disk full", time=2)
+        with pytest.raises(sqlite3.Error):
+            index.add_log(1, [_row("Client 7 connected", t=1), bad])
+        assert index.indexed_logs() == []
+        assert index.add_log(2, [_row("Client 8 connected", t=3)])
+        top = index.top_templates(5)
+        assert [(t.template, t.count) for t in top] == [("Client <num> connected", 1)]
+
+    def test_update_fetches_only_new_logs(self, tmp_path):
+        server = FakeServer({5: [_row("a")], 6: [_row("b")], 7: None})
+        index = LogIndex(str(tmp_path / "logs.db"))
+        infos = [LogInfo(id=5, name="c"), LogInfo(id=6, name="c"), LogInfo(id=7)]
+        assert index.update(server, infos) == 2
+        assert index.update(server, infos) == 0
+        assert sorted(server.calls) == [5, 6, 7, 7]
+        assert index.indexed_logs() == [5, 6]
+
+    def test_update_works_in_batches(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(_logindex, "_BATCH", 2)
+        server = FakeServer({i: [_row(f"m{i}")] for i in range(5)})
+        index = LogIndex(str(tmp_path / "logs.db"))
+        add_log = index.add_log
+        fetched = []
+
+        def recording_add_log(logid, rows, client="", time=0):
+            fetched.append(len(server.calls))
+            return add_log(logid, rows, client, time)
+
+        index.add_log = recording_add_log
+        assert index.update(server, [LogInfo(id=i) for i in range(5)]) == 5
+        assert fetched == [2, 2, 4, 4, 5]
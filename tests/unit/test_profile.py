@@ -0,0 +1,181 @@
+"""Tests for phase-level profiling of API calls."""
+
+import http.client
+import socket
+import time
+
+import pytest
+
+from urbackup_api import CallProfile, format_profile_report, urbackup_server
+
+STATUS = (b'{"status": [{"id": 1, "name": "a"}], "server_identity": "x", '
+          b'"allow_modify_clients": true}')
+
+
+class FakeResponse:
+
+    def __init__(self, status, body):
+        self.status = status
+        self._body = body
+
+    def read(self):
+        return self._body
+
+    def close(self):
+        pass
+
+
+class FakeSocket:
+
+    def setsockopt(self, *args):
+        pass
+
+    def close(self):
+        pass
+
+
+class FakeContext:
+
+    def wrap_socket(self, sock, server_hostname=None):
+        time.sleep(0.002)
+        return sock
+
+
+class FakeConnection:
+    statuses = []
+    connects = 0
+
+    def __init__(self, host, port=None, timeout=None):
+        self.host, self.port, self.timeout = host, port, timeout
+        self.source_address = None
+        self._context = FakeContext()
+        self.sock = None
+
+    def connect(self):
+        self.sock = socket.create_connection((self.host, self.port))
+
+    def request(self, method, url, body, headers):
+        if self.sock is None:
+            self.connect()
+
+    def getresponse(self):
+        return FakeResponse(FakeConnection.statuses.pop(0), STATUS)
+
+
+def fake_create_connection(address, timeout=None, source_address=None):
+    FakeConnection.connects += 1
+    time.sleep(0.002)
+    return FakeSocket()
+
+
+@pytest.fixture
+def server(monkeypatch):
+    monkeypatch.setattr(http.client, "HTTPConnection", FakeConnection)
+    monkeypatch.setattr(http.client, "HTTPSConnection", FakeConnection)
+    monkeypatch.setattr(socket, "create_connection", fake_create_connection)
+    FakeConnection.statuses = []
+    FakeConnection.connects = 0
+    s = urbackup_server("http://127.0.0.1:55414/x", "admin", "secret")
+    s._logged_in = True
+    return s
+
+
+_init = FakeConnection.__init__
+
+
+def _without_context(self, *args, **kwargs):
+    _init(self, *args, **kwargs)
+    del self._context
+
+
+class TestProfiling:
+
+    def test_disabled_by_default(self, server):
+        FakeConnection.statuses = [200]
+        assert server.get_status_result() is not None
+        assert server.profile_calls() == []
+        assert server.profile_report() == {}
+
+    def test_phases_of_typed_call(self, server):
+        server.enable_profiling()
+        FakeConnection.statuses = [200]
+        result = server.get_status_result()
+        assert result.status[0].name == "a"
+        [call] = server.profile_calls()
+        assert (call.action, call.attempts, call.error) == ("status", 1, "")
+        assert call.bytes_in == len(STATUS)
+        assert set(call.phases) == {
+            "connect", "send", "wait", "read", "decode", "parse", "build",
+        }
+        assert FakeConnection.connects == 1
+        assert call.elapsed >= sum(call.phases.values()) - 1e-9
+        assert call.elapsed >= 0.002
+
+    def test_tls_phase_on_https(self, server):
+        server._server_url = "https://127.0.0.1:55414/x"
+        server.enable_profiling()
+        FakeConnection.statuses = [200]
+        server._get_json("status")
+        [call] = server.profile_calls()
+        assert call.phases["tls"] >= 0.002
+        assert "build" not in call.phases
+
+    def test_https_without_context_times_one_connect_phase(self, server,
+                                                           monkeypatch):
+        monkeypatch.setattr(FakeConnection, "__init__", _without_context)
+        server._server_url = "https://127.0.0.1:55414/x"
+        server.enable_profiling()
+        FakeConnection.statuses = [200]
+        server._get_json("status")
+        [call] = server.profile_calls()
+        assert "tls" not in call.phases
+        assert call.phases["connect"] >= 0.002
+        assert FakeConnection.connects == 1
+
+    def test_retries_are_summed(self, server):
+        server.enable_profiling()
+        FakeConnection.statuses = [503, 200]
+        server._get_json("progress")
+        [call] = server.profile_calls()
+        assert call.attempts == 2
+        assert FakeConnection.connects == 2
+
+    def test_report_aggregates(self, server):
+        server.enable_profiling(keep=2)
+        FakeConnection.statuses = [200, 200, 200]
+        for _ in range(3):
+            server.get_status_result()
+        assert len(server.profile_calls()) == 2
+        phases = server.profile_report()["status", ""]
+        assert phases["elapsed"].count == 3
+        assert phases["build"].count == 3
+        assert phases["elapsed"].total >= phases["build"].total
+        text = format_profile_report(server.profile_report())
+        assert text.splitlines()[1].split()[:2] == ["status", "3"]
+
+    def test_report_rows_add_up(self, server):
+        server.enable_profiling()
+        FakeConnection.statuses = [200, 200]
+        server.get_status_result()
+        server._get_json("status")
+        phases = server.profile_report()["status", ""]
+        assert phases["build"].count == 1
+        parts = sum(s.total for name, s in phases.items() if name != "elapsed")
+        assert parts == pytest.approx(phases["elapsed"].total)
+        row = format_profile_report(server.profile_report()).splitlines()[1]
+        cells = [float(c) for c in row.split()[2:] if c != "-"]
+        assert sum(cells[:-1]) == pytest.approx(cells[-1], abs=0.05)
+
+    def test_build_attached_once(self, server):
+        server.enable_profiling()
+        FakeConnection.statuses = [200]
+        server._get_json("status")
+        server._build(lambda d: d, {})
+        server._build(lambda d: d, {})
+        [call] = server.profile_calls()
+        assert call.phases["build"] >= 0
+        assert server.profile_report()["status", ""]["build"].count == 1
+
+    def test_other(self):
+        call = CallProfile("status", phases={"read": 0.5}, elapsed=2.0)
+        assert call.other == 1.5
@@ -0,0 +1,106 @@
+"""Tests for the progress event watcher."""
+
+from urbackup_api import (
+    ActivityItem,
+    ClientProcessActionTypes,
+    ProcessItem,
+    ProgressEventKind,
+    ProgressResult,
+    ProgressWatcher,
+)
+
+
+FULL_FILE = ClientProcessActionTypes.FULL_FILE
+INCR_IMAGE = ClientProcessActionTypes.INCR_IMAGE
+
+
+def _snap(*procs, acts=None):
+    return ProgressResult(progress=list(procs), lastacts=acts)
+
+
+def _kinds(events):
+    return [(e.kind.value, e.key) for e in events]
+
+
+class TestProgressWatcher:
+
+    def test_started_progress_paused_finished(self):
+        w = ProgressWatcher(progress_interval=10)
+        assert w.feed(_snap(acts=[ActivityItem(id=5)]), now=0) == []
+
+        p = ProcessItem(clientid=1, id=7, action=FULL_FILE, done_bytes=0)
+        assert _kinds(w.feed(_snap(p, acts=[]), now=1)) == [("started", (1, 7))]
+
+        p2 = ProcessItem(clientid=1, id=7, action=FULL_FILE, done_bytes=10)
+        assert w.feed(_snap(p2, acts=[]), now=5) == []  # rate limited
+        p3 = ProcessItem(clientid=1, id=7, action=FULL_FILE, done_bytes=20)
+        assert _kinds(w.feed(_snap(p3, acts=[]), now=12)) == [("progress", (1, 7))]
+
+        p4 = ProcessItem(clientid=1, id=7, action=FULL_FILE, done_bytes=20,
+                         paused=True)
+        assert _kinds(w.feed(_snap(p4, acts=[]), now=13)) == [("paused", (1, 7))]
+
+        act = ActivityItem(id=6, clientid=1)
+        events = w.feed(_snap(acts=[act, ActivityItem(id=5)]), now=14)
+        assert _kinds(events) == [("finished", (1, 7))]
+        assert events[0].activity is act
+        assert w.running == {}
+
+    def test_vanished_without_activity_is_stopped(self):
+        w = ProgressWatcher()
+        w.feed(_snap(ProcessItem(clientid=2, id=1, action=FULL_FILE), acts=[]), now=0)
+        events = w.feed(_snap(acts=[]), now=1)
+        assert events[0].kind is ProgressEventKind.STOPPED
+
+    def test_activities_are_matched_by_kind(self):
+        w = ProgressWatcher()
+        w.feed(_snap(acts=[ActivityItem(id=1)]))
+        procs = [ProcessItem(clientid=1, id=1, action=FULL_FILE),
+                 ProcessItem(clientid=1, id=2, action=INCR_IMAGE)]
+        w.feed(_snap(*procs, acts=[]))
+        image = ActivityItem(id=2, clientid=1, image=1, incremental=1)
+        files = ActivityItem(id=3, clientid=1)
+        events = sorted(w.feed(_snap(acts=[image, files])), key=lambda e: e.key)
+        assert [(e.kind.value, e.activity) for e in events] == [
+            ("finished", files), ("finished", image),
+        ]
+
+    def test_first_activity_after_empty_history_finishes(self):
+        w = ProgressWatcher()
+        assert w.feed(_snap(acts=[])) == []
+        p = ProcessItem(clientid=1, id=1, action=FULL_FILE)
+        assert _kinds(w.feed(_snap(p, acts=[]))) == [("started", (1, 1))]
+        act = ActivityItem(id=1, clientid=1)
+        [event] = w.feed(_snap(acts=[act]))
+        assert event.kind is ProgressEventKind.FINISHED
+        assert event.activity is act
+
+    def test_deletions_do_not_finish_backups(self):
+        w = ProgressWatcher()
+        w.feed(_snap(acts=[ActivityItem(id=1)]))
+        w.feed(_snap(ProcessItem(clientid=1, id=1, action=FULL_FILE), acts=[]))
+        deletion = ActivityItem(id=2, clientid=1, is_delete=True)
+        [event] = w.feed(_snap(acts=[deletion]))
+        assert event.kind is ProgressEventKind.STOPPED
+        assert event.activity is None
+
+    def test_without_last_activities_uses_pcdone(self):
+        w = ProgressWatcher()
+        w.feed(_snap(ProcessItem(clientid=1, id=1), ProcessItem(clientid=1, id=2)))
+        w.feed(_snap(ProcessItem(clientid=1, id=1, pcdone=100),
+                     ProcessItem(clientid=1, id=2, pcdone=40)))
+        events = sorted(w.feed(_snap()), key=lambda e: e.key)
+        assert [e.kind.value for e in events] == ["finished", "stopped"]
+
+    def test_iterator_polls_server(self):
+        snaps = [_snap(ProcessItem(clientid=3, id=1)), _snap()]
+
+        class FakeServer:
+            def get_progress(self, with_last_activities=False):
+                return snaps.pop(0) if snaps else _snap()
+
+        w = ProgressWatcher(FakeServer(), min_interval=0.01, max_interval=0.02,
+                            with_last_activities=False)
+        with w:
+            it = iter(w)
+            assert [next(it).kind.value, next(it).kind.value] == ["started", "stopped"]
@@ -0,0 +1,69 @@
+"""Tests for verified subtree restores."""
+
+import hashlib
+import os
+
+from urbackup_api import RestoreResult, download_tree
+
+
+def _sha512(data):
+    return hashlib.sha512(data).hexdigest()
+
+
+CONTENTS = {
+    (1, 1, "/docs/a.txt"): b"alpha",
+    (1, 1, "/docs/sub/b.txt"): b"bravo" * 1000,
+    (1, 1, "/docs/nohash.txt"): b"charlie",
+}
+TREE = {
+    "docs": {
+        "a.txt": (5, 1000, _sha512(b"alpha")),
+        "sub": {"b.txt": (5000, 2000, _sha512(b"bravo" * 1000))},
+        "nohash.txt": (7, 3000, None),
+    },
+}
+
+
+def _downloads(source):
+    return sorted(c[3] for c in source.calls if c[2] == "download")
+
+
+class TestDownloadTree:
+
+    def test_restores_and_verifies(self, fake_backups, tmp_path):
+        source = fake_backups({(1, 1): TREE}, dict(CONTENTS))
+        result = download_tree(source, 1, 1, "/docs", str(tmp_path))
+        assert isinstance(result, RestoreResult)
+        assert result.ok
+        assert sorted(result.downloaded) == ["/docs/a.txt", "/docs/sub/b.txt"]
+        assert result.unverified == ["/docs/nohash.txt"]
+        assert (tmp_path / "sub" / "b.txt").read_bytes() == b"bravo" * 1000
+        assert os.path.getmtime(tmp_path / "a.txt") == 1000
+
+    def test_hash_mismatch_fails(self, fake_backups, tmp_path):
+        contents = dict(CONTENTS)
+        contents[(1, 1, "/docs/a.txt")] = b"tampered"
+        source = fake_backups({(1, 1): TREE}, contents)
+        result = download_tree(source, 1, 1, "/docs", str(tmp_path))
+        assert result.failed == ["/docs/a.txt"]
+        assert not (tmp_path / "a.txt").exists()
+        assert not (tmp_path / "a.txt.part").exists()
+
+    def test_resume_skips_matching_files(self, fake_backups, tmp_path):
+        source = fake_backups({(1, 1): TREE}, dict(CONTENTS))
+        download_tree(source, 1, 1, "/docs", str(tmp_path))
+        source.calls.clear()
+        result = download_tree(source, 1, 1, "/docs", str(tmp_path))
+        assert sorted(result.skipped) == [
+            "/docs/a.txt", "/docs/nohash.txt", "/docs/sub/b.txt",
+        ]
+        assert _downloads(source) == []
+
+    def test_unsafe_path_fails_without_aborting(self, fake_backups, tmp_path):
+        tree = {"docs": dict(TREE["docs"], **{"..": (3, 10, None)})}
+        source = fake_backups({(1, 1): tree}, dict(CONTENTS))
+        dest = tmp_path / "out"
+        result = download_tree(source, 1, 1, "/docs", str(dest))
+        assert result.failed == ["/docs/.."]
+        assert sorted(result.downloaded) == ["/docs/a.txt", "/docs/sub/b.txt"]
+        assert sorted(os.listdir(tmp_path)) == ["out"]
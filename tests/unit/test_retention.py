@@ -0,0 +1,123 @@
+"""Tests for the retention policy engine."""
+
+import time
+
+import pytest
+
+from urbackup_api import (
+    Backup,
+    Backups,
+    BackupTable,
+    RetentionPolicy,
+    apply_retention,
+    plan_retention,
+)
+
+def _ts(year, month, day, hour=12):
+    return int(time.mktime((year, month, day, hour, 0, 0, 0, 0, -1)))
+
+
+def _table(times, clientid=1, extra=None):
+    table = BackupTable()
+    for i, t in enumerate(times, start=1):
+        table.append(clientid, False, Backup(
+            id=i, clientid=clientid, backuptime=t, size_bytes=100 * i,
+            **(extra or {}).get(i, {}),
+        ))
+    return table
+
+
+class FakeServer:
+
+    def __init__(self):
+        self.pending = set()
+        self.archived = set()
+
+    def _backups(self, clientid):
+        return Backups(clientid=clientid, backups=[
+            Backup(id=b, delete_pending=b in self.pending, archived=int(b in self.archived))
+            for b in self.pending | self.archived
+        ])
+
+    def delete_backup(self, clientid, backupid):
+        self.pending.add(backupid)
+        return self._backups(clientid)
+
+    def archive_backup(self, clientid, backupid):
+        self.archived.add(backupid)
+        return self._backups(clientid)
+
+
+class TestPlanRetention:
+
+    def test_keep_daily(self):
+        # Two backups per day on three days.
+        times = [_ts(2024, 1, d, h) for d in (1, 2, 3) for h in (8, 20)]
+        plan = plan_retention(RetentionPolicy(keep_daily=2), _table(times))
+        assert sorted(a.backupid for a in plan.actions) == [1, 2, 3, 5]
+        assert plan.bytes_freed == 100 * (1 + 2 + 3 + 5)
+
+    def test_keep_monthly_and_last(self):
+        times = [_ts(2024, m, d) for m in (1, 2, 3) for d in (1, 15)]
+        plan = plan_retention(
+            RetentionPolicy(keep_last=1, keep_monthly=2), _table(times),
+        )
+        # Newest of March (6, also keep_last) and of February (4) are kept.
+        assert sorted(a.backupid for a in plan.actions) == [1, 2, 3, 5]
+
+    def test_archived_and_protected_backups_are_kept(self):
+        times = [_ts(2024, 1, d) for d in (1, 2, 3)]
+        table = _table(times, extra={1: {"archived": 1}, 2: {"disable_delete": True}})
+        plan = plan_retention(RetentionPolicy(keep_last=1), table)
+        assert plan.actions == []
+
+    def test_archive_monthly(self):
+        times = [_ts(2024, 1, 10), _ts(2024, 2, 10)]
+        plan = plan_retention(
+            RetentionPolicy(keep_monthly=2, archive_monthly=True), _table(times),
+        )
+        assert sorted((a.backupid, a.action) for a in plan.actions) == [
+            (1, "archive"), (2, "archive"),
+        ]
+
+    def test_images_ignored_by_default(self):
+        table = BackupTable()
+        table.append(1, True, Backup(id=8, clientid=1, backuptime=_ts(2024, 1, 1)))
+        table.append(1, True, Backup(id=9, clientid=1, backuptime=_ts(2024, 1, 2)))
+        assert plan_retention(RetentionPolicy(keep_last=1), table).actions == []
+
+    def test_policy_without_keep_rule_is_rejected(self):
+        times = [_ts(2024, 1, d) for d in (1, 2, 3)]
+        with pytest.raises(ValueError):
+            plan_retention(RetentionPolicy(), _table(times))
+
+    def test_newest_backup_is_always_kept(self):
+        times = [_ts(2024, 1, d) for d in (1, 2, 3)]
+        table = _table(times)
+        table.append(2, False, Backup(id=7, clientid=2, backuptime=_ts(2020, 1, 1)))
+        plan = plan_retention(RetentionPolicy(keep_daily=1), table)
+        assert sorted(a.backupid for a in plan.actions) == [1, 2]
+
+
+class TestApplyRetention:
+
+    def test_apply_confirms_results(self):
+        times = [_ts(2024, 1, d) for d in (1, 2, 3)]
+        plan = plan_retention(RetentionPolicy(keep_last=1), _table(times))
+        server = FakeServer()
+        outcomes = apply_retention(server, plan, max_workers=2)
+        assert sorted(o.action.backupid for o in outcomes) == [1, 2]
+        assert all(o.ok for o in outcomes)
+        assert server.pending == {1, 2}
+
+    def test_missing_list_is_not_confirmed(self):
+        times = [_ts(2024, 1, d) for d in (1, 2)]
+        plan = plan_retention(RetentionPolicy(keep_last=1), _table(times))
+
+        class EmptyServer:
+            def delete_backup(self, clientid, backupid):
+                return Backups(clientid=clientid)
+
+        [outcome] = apply_retention(EmptyServer(), plan)
+        assert not outcome.ok
+        assert outcome.error == "not confirmed"
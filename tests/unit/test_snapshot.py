@@ -0,0 +1,109 @@
+"""Tests for binary snapshots of typed results."""
+
+from dataclasses import make_dataclass
+
+import pytest
+
+from urbackup_api import (
+    BackupFile,
+    ClientProcessItem,
+    FilesResult,
+    ImageBackupInfo,
+    LogDataRow,
+    ProgressResult,
+    SnapshotFormatError,
+    StatusClientItem,
+    StatusResult,
+    from_bytes,
+    load_snapshot,
+    save_snapshot,
+    snapshot_columns,
+    to_bytes,
+)
+
+
+def _status():
+    return StatusResult(
+        admin=True,
+        server_identity="#Iabc",
+        status=[
+            StatusClientItem(
+                id=i, name=f"client{i}",
+                lastbackup=1700000000 + i if i % 2 else "-",
+                processes=[ClientProcessItem(action=1, pcdone=12.5)],
+            )
+            for i in range(50)
+        ],
+        extra_clients=[{"id": 1, "hostname": "10.0.0.1"}],
+    )
+
+
+def _files():
+    return FilesResult(
+        backupid=7,
+        image_backup_info=ImageBackupInfo(id=3, letter="C:"),
+        files=[
+            BackupFile(
+                name=f"file{i}", dir=i % 3 == 0, mod=i,
+                size=None if i % 3 == 0 else i * 10,
+                shahash=None if i % 3 == 0 else "abc",
+            )
+            for i in range(30)
+        ],
+    )
+
+
+class TestRoundTrip:
+
+    def test_status_result(self):
+        status = _status()
+        assert from_bytes(to_bytes(status), StatusResult) == status
+
+    def test_files_result(self):
+        files = _files()
+        assert from_bytes(to_bytes(files), FilesResult) == files
+
+    def test_progress_result(self):
+        progress = ProgressResult(lastacts=None)
+        assert from_bytes(to_bytes(progress)) == progress
+
+    def test_list_of_rows(self):
+        rows = [LogDataRow(level=2, message="Error ÄÖ", time=5)]
+        assert from_bytes(to_bytes(rows), LogDataRow) == rows
+
+    def test_empty_list(self):
+        assert from_bytes(to_bytes([])) == []
+
+    def test_file_roundtrip(self, tmp_path):
+        path = str(tmp_path / "files.snap")
+        save_snapshot(_files(), path)
+        assert load_snapshot(path, FilesResult) == _files()
+
+
+class TestFormat:
+
+    def test_wrong_type_rejected(self):
+        with pytest.raises(SnapshotFormatError):
+            from_bytes(to_bytes(_files()), StatusResult)
+
+    def test_bad_magic_rejected(self):
+        with pytest.raises(SnapshotFormatError):
+            from_bytes(b"JSON" + to_bytes(_files())[4:])
+
+    def test_truncated_rejected(self):
+        with pytest.raises(SnapshotFormatError):
+            from_bytes(to_bytes(_files())[:40])
+
+    def test_columns(self):
+        columns = snapshot_columns(to_bytes(_files()), "files")
+        assert list(columns["mod"]) == list(range(30))
+        assert columns["size"][:4] == [None, 10, 20, None]
+        assert columns["name"][1] == "file1"
+
+    def test_unknown_fields_dropped(self):
+        # Simulate a snapshot written by a newer version with an extra field.
+        newer = make_dataclass(
+            "BackupFile", [("name", str), ("future_field", int)],
+        )
+        decoded = from_bytes(to_bytes([newer("a", 1), newer("b", 2)]))
+        assert decoded == [BackupFile(name="a"), BackupFile(name="b")]
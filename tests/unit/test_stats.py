@@ -0,0 +1,175 @@
+"""Tests for per-action request statistics."""
+
+import http.client
+
+import pytest
+
+from urbackup_api import LatencyHistogram, _stats, urbackup_server
+
+
+class FakeResponse:
+
+    def __init__(self, status, body=b'{"ok": true}'):
+        self.status = status
+        self._body = body
+
+    def read(self):
+        return self._body
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    statuses = []
+    requests = []
+
+    def __init__(self, host, port=None, timeout=None):
+        pass
+
+    def request(self, method, url, body, headers):
+        FakeConnection.requests.append(body)
+        if not FakeConnection.statuses:
+            raise ConnectionRefusedError("down")
+
+    def getresponse(self):
+        return FakeResponse(FakeConnection.statuses.pop(0))
+
+
+@pytest.fixture
+def server(monkeypatch):
+    monkeypatch.setattr(http.client, "HTTPConnection", FakeConnection)
+    FakeConnection.statuses = []
+    FakeConnection.requests = []
+    return urbackup_server("http://127.0.0.1:55414/x", "admin", "secret")
+
+
+class TestLatencyHistogram:
+
+    def test_empty(self):
+        assert LatencyHistogram().quantile(0.5) is None
+
+    def test_quantile_interpolates_within_bucket(self):
+        h = LatencyHistogram((1.0, 2.0))
+        for v in (1.5, 1.5, 1.5, 1.5):
+            h.observe(v)
+        assert h.count == 4
+        assert h.quantile(0.5) == pytest.approx(1.5)
+        assert h.quantile(1.0) == pytest.approx(2.0)
+
+    def test_overflow_bucket(self):
+        h = LatencyHistogram((1.0,))
+        h.observe(5.0)
+        assert h.quantile(0.99) == 1.0
+
+    def test_copy_is_independent(self):
+        h = LatencyHistogram()
+        h.observe(0.1)
+        c = h.copy()
+        h.observe(0.2)
+        assert c.count == 1 and h.count == 2
+
+
+class TestInstrumentation:
+
+    def test_disabled_by_default(self, server):
+        FakeConnection.statuses = [200]
+        assert server._get_json("status") == {"ok": True}
+        assert server.stats() == {}
+
+    def test_counts_calls_requests_and_retries(self, server):
+        server.enable_instrumentation()
+        FakeConnection.statuses = [500, 200, 200]
+        server._get_json("progress")
+        server._get_json("backups", {"sa": "backups", "clientid": 1})
+        stats = server.stats()
+        progress = stats["progress", ""]
+        assert progress.calls == 1
+        assert progress.requests == 2
+        assert progress.retries == 1
+        assert progress.errors == 0
+        assert progress.status_codes == {500: 1, 200: 1}
+        assert progress.bytes_in == len(b'{"ok": true}')
+        assert progress.latency.count == 1
+        backups = stats["backups", "backups"]
+        assert backups.calls == 1
+        assert backups.bytes_out == len(FakeConnection.requests[-1]) + len("a=backups")
+
+    def test_connection_error_is_counted_and_raised(self, server):
+        server.enable_instrumentation()
+        with pytest.raises(ConnectionRefusedError):
+            server._get_json("status")
+        s = server.stats()["status", ""]
+        assert s.calls == 1 and s.requests == 1 and s.errors == 1
+        assert s.status_codes == {}
+
+    def test_hooks_receive_records(self, server):
+        records = []
+        server.add_request_hook(records.append)
+        server.add_request_hook(lambda r: 1 / 0)
+        FakeConnection.statuses = [200]
+        server._get_json("usage")
+        assert len(records) == 1
+        r = records[0]
+        assert (r.action, r.attempts, r.status, r.error) == ("usage", 1, 200, "")
+        assert r.latency >= 0
+
+    def test_snapshot_is_a_copy(self, server):
+        server.enable_instrumentation()
+        FakeConnection.statuses = [200, 200]
+        server._get_json("status")
+        before = server.stats()
+        server._get_json("status")
+        assert before["status", ""].calls == 1
+        assert server.stats()["status", ""].calls == 2
+
+    def test_disable_drops_stats(self, server):
+        server.enable_instrumentation()
+        FakeConnection.statuses = [200]
+        server._get_json("status")
+        server.disable_instrumentation()
+        assert server.stats() == {}
+
+    def test_opentelemetry_requires_package(self, server):
+        try:
+            import opentelemetry  # noqa: F401
+        except ImportError:
+            with pytest.raises(RuntimeError):
+                server.enable_instrumentation(opentelemetry=True)
+        else:
+            server.enable_instrumentation(opentelemetry=True)
+
+    def test_enabling_tracing_keeps_stats_and_hooks(self, server, monkeypatch):
+        spans = []
+
+        class Span:
+            def __init__(self, name, attributes):
+                self.name, self.attributes = name, dict(attributes)
+                spans.append(self)
+
+            def set_attribute(self, key, value):
+                self.attributes[key] = value
+
+            def end(self):
+                self.ended = True
+
+        class Tracer:
+            def start_span(self, name, attributes):
+                return Span(name, attributes)
+
+        class Trace:
+            def get_tracer(self, name):
+                return Tracer()
+
+        monkeypatch.setattr(_stats, "_otel_trace", Trace())
+        records = []
+        server.add_request_hook(records.append)
+        FakeConnection.statuses = [200, 200]
+        server._get_json("status")
+        server.enable_instrumentation(opentelemetry=True)
+        server._get_json("status")
+        assert len(records) == 2
+        assert server.stats()["status", ""].calls == 2
+        [span] = spans
+        assert span.name == "urbackup status"
+        assert span.attributes["http.status_code"] == 200 and span.ended
@@ -0,0 +1,68 @@
+"""Tests for the status change stream."""
+
+import pytest
+
+from urbackup_api import (
+    ChangeType,
+    ClientProcessItem,
+    StatusClientItem,
+    StatusDiffer,
+    StatusResult,
+)
+
+
+def _status(*clients):
+    return StatusResult(status=list(clients))
+
+
+class TestStatusDiffer:
+
+    def test_field_level_changes(self):
+        differ = StatusDiffer()
+        differ.prime(_status(
+            StatusClientItem(id=1, name="a", online=True, file_ok=True),
+            StatusClientItem(id=2, name="b", online=True),
+        ))
+        changes = differ.diff(_status(
+            StatusClientItem(id=1, name="a", online=False, file_ok=False, lastseen=9),
+            StatusClientItem(id=2, name="b", online=True, lastseen=9),
+            StatusClientItem(id=3, name="c"),
+        ))
+        assert [(c.change, c.clientid, c.field, c.old, c.new) for c in changes[:2]] == [
+            (ChangeType.MODIFIED, 1, "file_ok", True, False),
+            (ChangeType.MODIFIED, 1, "online", True, False),
+        ]
+        assert changes[2].change is ChangeType.ADDED
+        assert changes[2].new.name == "c"
+        assert len(changes) == 3
+
+    def test_values_with_equal_hashes(self):
+        assert hash(-1) == hash(-2)
+        differ = StatusDiffer(fields=["id", "status"])
+        differ.prime(_status(StatusClientItem(id=1, status=-1)))
+        changes = differ.diff(_status(StatusClientItem(id=1, status=-2)))
+        assert [(c.field, c.old, c.new) for c in changes] == [("status", -1, -2)]
+
+    def test_removed_and_delete_pending(self):
+        differ = StatusDiffer()
+        differ.prime(_status(StatusClientItem(id=1, name="a"),
+                             StatusClientItem(id=2, name="b")))
+        changes = differ.diff(_status(StatusClientItem(id=1, name="a",
+                                                       delete_pending="1")))
+        assert [(c.change, c.field, c.new) for c in changes] == [
+            (ChangeType.MODIFIED, "delete_pending", "1"),
+            (ChangeType.REMOVED, None, None),
+        ]
+        assert changes[1].old.name == "b"
+
+    def test_selected_fields_and_processes(self):
+        differ = StatusDiffer(fields=["id", "processes"])
+        differ.prime(_status(StatusClientItem(id=1, online=True)))
+        changes = differ.diff(_status(StatusClientItem(
+            id=1, online=False, processes=[ClientProcessItem(action=1, pcdone=5)],
+        )))
+        assert [(c.field, c.new) for c in changes] == [
+            ("processes", [ClientProcessItem(action=1, pcdone=5)]),
+        ]
+        with pytest.raises(ValueError):
+            StatusDiffer(fields=["online"])
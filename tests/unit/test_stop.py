@@ -0,0 +1,113 @@
+"""Tests for stopping processes in bulk."""
+
+import pytest
+
+from urbackup_api import (
+    ClientProcessActionTypes,
+    ProcessItem,
+    ProgressResult,
+    StatusClientItem,
+    StatusResult,
+    stop_processes,
+)
+
+
+class FakeResponse:
+
+    def __init__(self, status):
+        self.status = status
+        self.read_called = False
+        self.closed = False
+
+    def read(self):
+        self.read_called = True
+        return b"{}"
+
+    def close(self):
+        self.closed = True
+
+
+class FakeServer:
+
+    def __init__(self, procs, fail=()):
+        self.running = {(c, i): a for c, i, a in procs}
+        self.fail = set(fail)
+        self.stops = []
+        self.responses = []
+        self.progress_calls = 0
+        self.status_calls = 0
+
+    def login(self):
+        return True
+
+    def get_progress(self, with_last_activities=False):
+        self.progress_calls += 1
+        return ProgressResult(progress=[
+            ProcessItem(clientid=c, id=i, action=a)
+            for (c, i), a in sorted(self.running.items())
+        ])
+
+    def get_status_result(self):
+        self.status_calls += 1
+        return StatusResult(status=[
+            StatusClientItem(id=1, groupname="servers"),
+            StatusClientItem(id=2, groupname="laptops"),
+        ])
+
+    def _get_response(self, action, params):
+        key = (int(params["stop_clientid"]), int(params["stop_id"]))
+        self.stops.append(key)
+        response = FakeResponse(500 if key in self.fail else 200)
+        self.responses.append(response)
+        if key not in self.fail and key[0] != 2:
+            self.running.pop(key, None)
+        return response
+
+
+IMAGE = (ClientProcessActionTypes.INCR_IMAGE, ClientProcessActionTypes.FULL_IMAGE)
+
+
+class TestStopProcesses:
+
+    def test_stops_selected_actions_concurrently(self):
+        server = FakeServer([
+            (1, 1, ClientProcessActionTypes.FULL_IMAGE),
+            (1, 2, ClientProcessActionTypes.INCR_FILE),
+            (2, 3, ClientProcessActionTypes.INCR_IMAGE),
+        ], fail=[(2, 3)])
+        result = stop_processes(server, actions=IMAGE, max_workers=4)
+        assert sorted(server.stops) == [(1, 1), (2, 3)]
+        assert [p.id for p in result.stopped] == [1]
+        assert [(p.id, err) for p, err in result.failed] == [(3, "HTTP 500")]
+        assert not result.ok
+        assert server.progress_calls == 1
+        assert all(r.read_called and r.closed for r in server.responses)
+
+    def test_group_predicate_and_confirm(self):
+        server = FakeServer([
+            (1, 1, ClientProcessActionTypes.INCR_FILE),
+            (2, 2, ClientProcessActionTypes.INCR_FILE),
+            (2, 3, ClientProcessActionTypes.FULL_FILE),
+        ])
+        result = stop_processes(server, groups=["laptops"],
+                                predicate=lambda p: p.id == 2, confirm=True)
+        assert server.stops == [(2, 2)]
+        assert server.status_calls == 1
+        # Client 2 ignores stops in the fake, so confirmation catches it.
+        assert [p.id for p in result.still_running] == [2]
+
+    def test_nothing_to_stop(self):
+        server = FakeServer([(1, 1, ClientProcessActionTypes.INCR_FILE)])
+        result = stop_processes(server, clientids=[9])
+        assert result.ok and result.stopped == []
+        assert server.stops == []
+
+    def test_requires_filter_or_all(self):
+        server = FakeServer([(1, 1, ClientProcessActionTypes.INCR_FILE),
+                             (3, 2, ClientProcessActionTypes.FULL_FILE)])
+        with pytest.raises(ValueError):
+            stop_processes(server)
+        assert server.progress_calls == 0
+        result = stop_processes(server, all=True)
+        assert sorted(server.stops) == [(1, 1), (3, 2)]
+        assert result.ok
@@ -0,0 +1,49 @@
+"""Tests for progress throughput analytics."""
+
+import pytest
+
+from urbackup_api import ProcessItem, ProgressAnalytics, ProgressResult
+
+
+def _snap(*procs):
+    return ProgressResult(progress=[
+        ProcessItem(clientid=c, id=i, done_bytes=d, total_bytes=t, speed_bpms=s)
+        for c, i, d, t, s in procs
+    ])
+
+
+class TestProgressAnalytics:
+
+    def test_throughput_and_eta(self):
+        a = ProgressAnalytics(window=30)
+        a.record(_snap((1, 1, 0, 1000, 2)), now=0)
+        # Single sample: falls back to speed_bpms (bytes per millisecond).
+        assert a.throughput((1, 1)) == 2000
+        a.record(_snap((1, 1, 100, 1000, 2)), now=10)
+        a.record(_snap((1, 1, 300, 1000, 2)), now=20)
+        assert a.throughput((1, 1)) == pytest.approx(15)
+        assert a.eta((1, 1)) == pytest.approx(700 / 15)
+        a.record(_snap((1, 1, 600, 1000, 2)), now=40)
+        # Only samples from the last 30 seconds count.
+        assert a.throughput((1, 1)) == pytest.approx(500 / 30)
+
+    def test_ring_buffer_wraps(self):
+        a = ProgressAnalytics(window=1000, capacity=4)
+        for t in range(10):
+            a.record(_snap((1, 1, t * t, 0, 0)), now=t)
+        assert a.throughput((1, 1)) == pytest.approx((81 - 36) / 3)
+        assert a.eta((1, 1)) is None
+
+    def test_fleet_percentiles_and_stalls(self):
+        a = ProgressAnalytics(stall_after=15)
+        a.record(_snap((1, 1, 0, 100, 0), (2, 1, 0, 1000, 0), (3, 1, 0, 10, 0)), now=0)
+        a.record(_snap((1, 1, 10, 100, 0), (2, 1, 10, 1000, 0), (3, 1, 0, 10, 0)), now=10)
+        assert a.fleet_bandwidth() == pytest.approx(2)
+        assert a.eta_percentiles([0, 50, 100]) == pytest.approx({0: 90, 50: 540, 100: 990})
+        assert a.stalled() == []
+        a.record(_snap((1, 1, 20, 100, 0), (2, 1, 10, 1000, 0), (3, 1, 0, 10, 0)), now=20)
+        assert sorted(a.stalled()) == [(3, 1)]
+        a.record(_snap((1, 1, 30, 100, 0), (2, 1, 10, 1000, 0)), now=30)
+        stats = {(s.clientid, s.id): s for s in a.summary()}
+        assert list(stats) == [(1, 1), (2, 1)]
+        assert stats[2, 1].stalled and not stats[1, 1].stalled
@@ -0,0 +1,115 @@
+"""Tests for sampled backup verification."""
+
+import hashlib
+import json
+import os
+import tempfile
+import time
+
+import pytest
+
+from urbackup_api import VerificationJob, VerificationRecord
+from urbackup_api._verify import _Throttle
+
+
+def _tree_and_contents(n):
+    tree, contents = {"data": {}}, {}
+    for i in range(n):
+        data = f"file {i}".encode() * (i + 1)
+        tree["data"][f"f{i}"] = (len(data), 1000 + i, hashlib.sha512(data).hexdigest())
+        contents[(1, 1, f"/data/f{i}")] = data
+    return tree, contents
+
+
+class TestVerificationJob:
+
+    def test_samples_requested_number(self, fake_backups, tmp_path):
+        tree, contents = _tree_and_contents(20)
+        source = fake_backups({(1, 1): tree}, contents)
+        job = VerificationJob(source, str(tmp_path / "ledger.json"),
+                              samples_per_backup=5, seed=1)
+        assert len(job.sample(1, 1)) == 5
+
+    def test_verifies_and_records_ledger(self, fake_backups, tmp_path):
+        tree, contents = _tree_and_contents(6)
+        contents[(1, 1, "/data/f0")] = b"corrupt"
+        source = fake_backups({(1, 1): tree}, contents)
+        ledger = tmp_path / "ledger.json"
+        job = VerificationJob(source, str(ledger), samples_per_backup=6,
+                              weight=None, processes=1)
+        records = job.run([1])
+        assert all(isinstance(r, VerificationRecord) for r in records)
+        assert [r.path for r in records if not r.ok] == ["/data/f0"]
+
+        saved = json.loads(ledger.read_text())
+        assert saved["1"]["1"]["verified"] == 5
+        assert saved["1"]["1"]["failed"] == 1
+        assert saved["1"]["1"]["failures"] == [["/data/f0", "hash mismatch"]]
+
+    def test_ledger_accumulates_across_runs(self, fake_backups, tmp_path):
+        tree, contents = _tree_and_contents(3)
+        source = fake_backups({(1, 1): tree}, contents)
+        ledger = str(tmp_path / "ledger.json")
+        VerificationJob(source, ledger, samples_per_backup=3, processes=1).run([1])
+        job = VerificationJob(source, ledger, samples_per_backup=3, processes=1)
+        job.run([1])
+        assert job.ledger["1"]["1"]["verified"] == 6
+
+    def test_size_weighting_prefers_large_files(self, fake_backups, tmp_path):
+        tree = {"data": {"big": (10 ** 9, 1000, ""), **{
+            f"small{i}": (1, 1000, "") for i in range(50)
+        }}}
+        source = fake_backups({(1, 1): tree})
+        picks = 0
+        for seed in range(20):
+            job = VerificationJob(source, str(tmp_path / "ledger.json"),
+                                  samples_per_backup=1, seed=seed)
+            picks += [p for p, _ in job.sample(1, 1)] == ["/data/big"]
+        assert picks == 20
+
+    def test_failed_download_removes_temp_file(self, fake_backups, tmp_path,
+                                               monkeypatch):
+        tree, contents = _tree_and_contents(1)
+        source = fake_backups({(1, 1): tree}, contents)
+        created = []
+        mkstemp = tempfile.mkstemp
+
+        def recording_mkstemp(*args, **kwargs):
+            fd, path = mkstemp(*args, **kwargs)
+            created.append(path)
+            return fd, path
+
+        def failing_download(*args):
+            raise ConnectionResetError("reset")
+
+        monkeypatch.setattr(tempfile, "mkstemp", recording_mkstemp)
+        monkeypatch.setattr(source, "download_backup_file_to", failing_download)
+        job = VerificationJob(source, str(tmp_path / "ledger.json"))
+        with pytest.raises(ConnectionResetError):
+            job._download(1, 1, "/data/f0")
+        assert created and not os.path.exists(created[0])
+
+
+class TestThrottle:
+
+    def test_caps_rate(self):
+        throttle = _Throttle(10000, burst=0.0)
+        start = time.monotonic()
+        for _ in range(10):
+            throttle.consume(200)
+        assert time.monotonic() - start >= 0.18
+
+    def test_idle_time_earns_only_burst(self):
+        throttle = _Throttle(10000, burst=0.05)
+        time.sleep(0.3)
+        start = time.monotonic()
+        for _ in range(10):
+            throttle.consume(300)
+        # 3000 bytes take 0.3 s, of which at most 0.05 s were saved up.
+        assert time.monotonic() - start >= 0.2
+
+    def test_unlimited(self):
+        throttle = _Throttle(None)
+        start = time.monotonic()
+        throttle.consume(10 ** 9)
+        assert time.monotonic() - start < 0.05
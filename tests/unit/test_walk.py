@@ -0,0 +1,60 @@
+"""Tests for the concurrent backup tree walker."""
+
+from urbackup_api import walk_backup
+
+
+TREE = {
+    "docs": {
+        "a.txt": (1, 10, "h1"),
+        "old": {"b.txt": (2, 20, "h2")},
+    },
+    "media": {"c.jpg": (3, 30, "h3")},
+    "readme": (4, 40, "h4"),
+}
+
+
+class TestWalkBackup:
+
+    def test_lists_every_entry(self, fake_backups):
+        source = fake_backups({(1, 1): TREE})
+        paths = {p for p, _ in walk_backup(source, 1, 1)}
+        assert paths == {
+            "/docs", "/docs/a.txt", "/docs/old", "/docs/old/b.txt",
+            "/media", "/media/c.jpg", "/readme",
+        }
+
+    def test_ordered_is_deterministic(self, fake_backups):
+        source = fake_backups({(1, 1): TREE})
+        first = list(walk_backup(source, 1, 1, max_workers=3))
+        second = list(walk_backup(source, 1, 1, max_workers=3))
+        assert first == second
+
+    def test_arrival_order_yields_same_entries(self, fake_backups):
+        source = fake_backups({(1, 1): TREE})
+        ordered = sorted(p for p, _ in walk_backup(source, 1, 1))
+        arrival = sorted(p for p, _ in walk_backup(source, 1, 1, ordered=False))
+        assert ordered == arrival
+
+    def test_max_depth(self, fake_backups):
+        source = fake_backups({(1, 1): TREE})
+        paths = [p for p, _ in walk_backup(source, 1, 1, max_depth=0)]
+        assert paths == ["/docs", "/media", "/readme"]
+        assert source.calls == [(1, 1, "/")]
+
+    def test_prune(self, fake_backups):
+        source = fake_backups({(1, 1): TREE})
+        paths = {p for p, _ in walk_backup(
+            source, 1, 1, prune=lambda path, entry: entry.name == "docs",
+        )}
+        assert "/docs" in paths
+        assert "/docs/a.txt" not in paths
+        assert "/media/c.jpg" in paths
+
+    def test_subtree_root(self, fake_backups):
+        source = fake_backups({(1, 1): TREE})
+        paths = [p for p, _ in walk_backup(source, 1, 1, root="/docs/")]
+        assert sorted(paths) == ["/docs/a.txt", "/docs/old", "/docs/old/b.txt"]
+
+    def test_unlistable_backup_yields_nothing(self, fake_backups):
+        source = fake_backups({})
+        assert list(walk_backup(source, 1, 1)) == []
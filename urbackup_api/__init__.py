@@ -29,6 +29,7 @@ from ._common import (  # noqa: F401  – re-exports
     ImageBackupInfo,
     InstallerOS,
     LogClient,
+    LiveLogEntry,
     LogDataRow,
     LogInfo,
     LogLevel,
@@ -56,6 +57,67 @@ from ._common import (  # noqa: F401  – re-exports
     installer_os,
 )
 
+from ._cache import ListingCache, LogCache, get_log_many  # noqa: F401
+from ._catalog import BackupCatalog, CatalogEntry  # noqa: F401
+from ._completions import CompletionFeed  # noqa: F401
+from ._crawl import BackupTable, crawl_backups  # noqa: F401
+from ._diff import BackupDiffEntry, ChangeType, diff_backups  # noqa: F401
+from ._exporter import MetricsCollector, render_metrics  # noqa: F401
+from ._fleet import FleetResult, FleetRow, UrbackupFleet  # noqa: F401
+from ._hedge import HedgeStats  # noqa: F401
+from ._inventory import (  # noqa: F401
+    BackupInventory,
+    BackupTransition,
+    InventorySyncResult,
+)
+from ._livelog import LiveLogTail  # noqa: F401
+from ._logfeed import LogFeed  # noqa: F401
+from ._logindex import (  # noqa: F401
+    LogHit,
+    LogIndex,
+    LogTemplateCount,
+    log_template,
+)
+from ._profile import (  # noqa: F401
+    PHASES,
+    CallProfile,
+    PhaseSummary,
+    format_profile_report,
+)
+from ._progress import (  # noqa: F401
+    ProgressEvent,
+    ProgressEventKind,
+    ProgressWatcher,
+)
+from ._restore import RestoreResult, download_tree  # noqa: F401
+from ._retention import (  # noqa: F401
+    RetentionAction,
+    RetentionOutcome,
+    RetentionPlan,
+    RetentionPolicy,
+    apply_retention,
+    plan_retention,
+)
+from ._snapshot import (  # noqa: F401
+    SnapshotFormatError,
+    from_bytes,
+    load_snapshot,
+    save_snapshot,
+    snapshot_columns,
+    to_bytes,
+)
+from ._stats import (  # noqa: F401
+    LATENCY_BUCKETS,
+    ActionStats,
+    LatencyHistogram,
+    RequestRecord,
+)
+from ._statusdiff import StatusChange, StatusDiffer  # noqa: F401
+from ._stop import StopProcessesResult, stop_processes  # noqa: F401
+from ._throughput import ProcessStats, ProgressAnalytics  # noqa: F401
+from ._verify import VerificationJob, VerificationRecord  # noqa: F401
+from ._walk import iter_backup_listings, walk_backup  # noqa: F401
+
 # Re-export the individual classes.
 from ._legacy import urbackup_server_legacy  # noqa: F401
 from ._typed import urbackup_server_typed  # noqa: F401
@@ -8,12 +8,29 @@ import http.client as http
 import json
 import logging
 import shutil
+import time
 from base64 import b64encode
-from typing import Any, Dict, Optional
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Tuple,
+    TypeVar,
+)
 from urllib.parse import urlencode, urlparse
 
+if TYPE_CHECKING:
+    from ._hedge import HedgeStats, _Hedger
+    from ._profile import CallProfile, ProfileReport, _Profiler
+    from ._stats import ActionStats, RequestHook, _CallTrace, _Instrumentation
+
 logger = logging.getLogger('urbackup-server-python-api-wrapper')
 
+T = TypeVar("T")
+
 
 class _UrbackupServerBase:
     """Low-level connection, session management, and login logic."""
@@ -27,6 +44,7 @@ class _UrbackupServerBase:
         self._server_url = server_url
         self._server_username = server_username
         self._server_password = server_password
+        self._lastlogids: Dict[int, int] = {}
 
     # If you have basic authentication via .htpasswd
     server_basic_username: str = ''
@@ -35,6 +53,9 @@ class _UrbackupServerBase:
     _session: str = ""
     _logged_in: bool = False
     _lastlogid: int = 0
+    _instrumentation: Optional[_Instrumentation] = None
+    _profiler: Optional[_Profiler] = None
+    _hedger: Optional[_Hedger] = None
 
     # -------------------------------------------------------------------
     # Internal helpers
@@ -45,7 +66,15 @@ class _UrbackupServerBase:
         action: str,
         params: Dict[str, Any],
         method: str = "POST",
+        call: Optional[CallProfile] = None,
+        on_sent: Optional[Callable[[http.HTTPConnection], None]] = None,
     ) -> http.HTTPResponse:
+        """Send one request and return the response once its headers arrived.
+
+        When profiling, phases are added to *call* (default: the call the
+        current thread is in).  *on_sent* is called with the connection
+        after the request was sent, before waiting for the response.
+        """
 
         headers: Dict[str, str] = {
             'Accept': 'application/json',
@@ -84,14 +113,40 @@ class _UrbackupServerBase:
             logger.error('Unknown scheme: ' + target.scheme)
             raise Exception("Unknown scheme: " + target.scheme)
 
-        h.request(
-            method,
-            target.path + "?" + target.query,
-            body,
-            headers,
-        )
-
-        return h.getresponse()
+        inst = self._instrumentation
+        if call is None and self._profiler is not None:
+            call = self._profiler.current()
+        status = None
+        try:
+            sent = 0.0
+            if call is None:
+                h.request(
+                    method,
+                    target.path + "?" + target.query,
+                    body,
+                    headers,
+                )
+            else:
+                from ._profile import _profiled_send
+                sent = _profiled_send(
+                    call,
+                    h,
+                    target.scheme == 'https',
+                    method,
+                    target.path + "?" + target.query,
+                    body,
+                    headers,
+                )
+            if on_sent is not None:
+                on_sent(h)
+            response = h.getresponse()
+            if call is not None:
+                call.lap("wait", sent)
+            status = response.status
+            return response
+        finally:
+            if inst is not None:
+                inst.attempt(action, params, status, len(body) + len(target.query))
 
     def _get_json(
         self,
@@ -101,11 +156,48 @@ class _UrbackupServerBase:
         if params is None:
             params = {}
 
+        inst = self._instrumentation
+        prof = self._profiler
+        if inst is None and prof is None:
+            return self._get_json_attempts(action, params)
+
+        trace = inst.begin(action, params) if inst is not None else None
+        call = prof.begin(action, params) if prof is not None else None
+        try:
+            return self._get_json_attempts(action, params, trace, call)
+        except Exception as e:
+            if trace is not None:
+                trace.error = repr(e)
+            if call is not None:
+                call.error = repr(e)
+            raise
+        finally:
+            if inst is not None and trace is not None:
+                inst.end(trace)
+            if prof is not None and call is not None:
+                prof.end(call)
+
+    def _get_json_attempts(
+        self,
+        action: str,
+        params: Dict[str, Any],
+        trace: Optional[_CallTrace] = None,
+        call: Optional[CallProfile] = None,
+    ) -> Optional[Dict[str, Any]]:
         tries = 50
 
+        hedger = self._hedger
         response = None
         while tries > 0:
-            response = self._get_response(action, params)
+            if hedger is None:
+                response = self._get_response(action, params)
+            else:
+                response = hedger.get_response(self, action, params)
+            if trace is not None:
+                trace.attempts += 1
+                trace.status = response.status
+            if call is not None:
+                call.attempts += 1
 
             if response.status == 200:
                 break
@@ -119,11 +211,39 @@ class _UrbackupServerBase:
         if response is None:
             return None
 
-        data = response.read()
+        if call is None:
+            data = response.read()
+            response.close()
+            if trace is not None:
+                trace.bytes_in = len(data)
+            return json.loads(data.decode("utf-8", "ignore"))
 
+        t = time.perf_counter()
+        data = response.read()
         response.close()
-
-        return json.loads(data.decode("utf-8", "ignore"))
+        t = call.lap("read", t)
+        call.bytes_in = len(data)
+        if trace is not None:
+            trace.bytes_in = len(data)
+        text = data.decode("utf-8", "ignore")
+        t = call.lap("decode", t)
+        ret = json.loads(text)
+        call.lap("parse", t)
+        return ret
+
+    def _build(self, build: Callable[[Any], T], data: Any) -> T:
+        """Return ``build(data)``, timed as the *build* phase when profiling."""
+        prof = self._profiler
+        if prof is None:
+            return build(data)
+        start = time.perf_counter()
+        ret = build(data)
+        prof.add_build(time.perf_counter() - start)
+        return ret
+
+    def _build_list(self, cls: Any, rows: List[Dict[str, Any]]) -> List[Any]:
+        """Return ``[cls.from_dict(r) for r in rows]`` through :meth:`_build`."""
+        return self._build(lambda d: [cls.from_dict(r) for r in d], rows)
 
     def _download_file(
         self,
@@ -142,6 +262,111 @@ class _UrbackupServerBase:
 
         return True
 
+    # -------------------------------------------------------------------
+    # Instrumentation
+    # -------------------------------------------------------------------
+
+    def enable_instrumentation(self, opentelemetry: bool = False) -> None:
+        """Start recording per-action request statistics.
+
+        With *opentelemetry* every API call is also wrapped in a span of
+        the ``opentelemetry-api`` tracer (which must be installed).
+        """
+        from ._stats import _Instrumentation
+        if self._instrumentation is None:
+            self._instrumentation = _Instrumentation(opentelemetry)
+        elif opentelemetry:
+            # Keep the collected statistics and registered hooks.
+            self._instrumentation.enable_tracing()
+
+    def disable_instrumentation(self) -> None:
+        """Stop recording and drop all collected statistics."""
+        self._instrumentation = None
+
+    def add_request_hook(self, hook: RequestHook) -> None:
+        """Call *hook* with a ``RequestRecord`` after every API call.
+
+        Enables instrumentation if it is off.
+        """
+        self.enable_instrumentation()
+        assert self._instrumentation is not None
+        self._instrumentation.hooks.append(hook)
+
+    def stats(self) -> Dict[Tuple[str, str], ActionStats]:
+        """Return request statistics keyed by ``(action, sa)``.
+
+        Empty unless :meth:`enable_instrumentation` was called.
+        """
+        if self._instrumentation is None:
+            return {}
+        return self._instrumentation.snapshot()
+
+    # -------------------------------------------------------------------
+    # Profiling
+    # -------------------------------------------------------------------
+
+    def enable_profiling(self, keep: int = 1000) -> None:
+        """Start timing each phase of every API call.
+
+        The last *keep* calls are available from :meth:`profile_calls`,
+        aggregates over all calls from :meth:`profile_report`.
+        """
+        from ._profile import _Profiler
+        self._profiler = _Profiler(keep)
+
+    def disable_profiling(self) -> None:
+        """Stop profiling and drop all collected timings."""
+        self._profiler = None
+
+    def profile_calls(self) -> List[CallProfile]:
+        """Return the most recent profiled calls, oldest first."""
+        if self._profiler is None:
+            return []
+        return self._profiler.recent()
+
+    def profile_report(self) -> ProfileReport:
+        """Return per-phase aggregates keyed by ``(action, sa)``."""
+        if self._profiler is None:
+            return {}
+        return self._profiler.report()
+
+    # -------------------------------------------------------------------
+    # Hedged requests
+    # -------------------------------------------------------------------
+
+    def enable_hedging(
+        self,
+        budget: float = 0.05,
+        min_samples: int = 20,
+        min_delay: float = 0.01,
+        burst: float = 10.0,
+        max_workers: int = 8,
+    ) -> None:
+        """Hedge slow read requests with a second attempt.
+
+        Applies to ``status``, ``progress``, ``usage``, ``backups`` with
+        ``sa=backups`` and ``logs`` calls that carry no write parameters.
+        If an attempt has not answered within the observed p95 latency of
+        its action, a second one is sent and whichever answers first is
+        used.  Hedges are capped at a *budget* fraction of the reads, after
+        an initial allowance of *burst* hedges.
+        """
+        from ._hedge import _Hedger
+        self.disable_hedging()
+        self._hedger = _Hedger(budget, min_samples, min_delay, burst, max_workers)
+
+    def disable_hedging(self) -> None:
+        """Send every request once again."""
+        if self._hedger is not None:
+            self._hedger.close()
+            self._hedger = None
+
+    def hedge_stats(self) -> Optional[HedgeStats]:
+        """Return hedging counters, or ``None`` if hedging is off."""
+        if self._hedger is None:
+            return None
+        return self._hedger.stats()
+
     def _md5(self, s: str) -> str:
         return hashlib.md5(s.encode()).hexdigest()
 
@@ -0,0 +1,317 @@
+"""Disk-backed caches for immutable backup data."""
+
+from __future__ import annotations
+
+import dataclasses
+import hashlib
+import os
+import tempfile
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from ._base import logger
+from ._common import FilesResult, LogDataRow
+from ._snapshot import SnapshotFormatError, from_bytes, to_bytes
+from ._walk import iter_backup_listings
+
+
+class _DiskLRU:
+    """A size-bounded directory of zlib-compressed blobs.
+
+    Entries are evicted least-recently-used first.  Recency is persisted
+    through file modification times, so the order survives restarts.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        max_bytes: int,
+        compress_level: int = 6,
+    ) -> None:
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.compress_level = compress_level
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[str, int] = OrderedDict()
+        self._total = 0
+
+        os.makedirs(directory, exist_ok=True)
+        found = []
+        for e in os.scandir(directory):
+            if e.is_file() and not e.name.startswith("."):
+                st = e.stat()
+                found.append((st.st_mtime, e.name, st.st_size))
+        for _, name, size in sorted(found):
+            self._entries[name] = size
+            self._total += size
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def get(self, name: str) -> Optional[bytes]:
+        with self._lock:
+            if name not in self._entries:
+                return None
+            self._entries.move_to_end(name)
+        try:
+            with open(self._path(name), "rb") as f:
+                data = zlib.decompress(f.read())
+            os.utime(self._path(name))
+        except (OSError, zlib.error):
+            self.delete(name)
+            return None
+        return data
+
+    def put(self, name: str, data: bytes) -> None:
+        blob = zlib.compress(data, self.compress_level)
+        if len(blob) > self.max_bytes:
+            return
+        fd, tmp = tempfile.mkstemp(dir=self.directory, prefix=".tmp-")
+        with os.fdopen(fd, "wb") as f:
+            f.write(blob)
+        os.replace(tmp, self._path(name))
+        with self._lock:
+            self._total += len(blob) - self._entries.pop(name, 0)
+            self._entries[name] = len(blob)
+            while self._total > self.max_bytes and self._entries:
+                old, size = self._entries.popitem(last=False)
+                self._total -= size
+                try:
+                    os.remove(self._path(old))
+                except OSError:
+                    pass
+
+    def delete(self, name: str) -> None:
+        with self._lock:
+            size = self._entries.pop(name, None)
+            if size is None:
+                return
+            self._total -= size
+        try:
+            os.remove(self._path(name))
+        except OSError:
+            pass
+
+    def delete_prefix(self, prefix: str) -> None:
+        with self._lock:
+            names = [n for n in self._entries if n.startswith(prefix)]
+        for name in names:
+            self.delete(name)
+
+    def names(self) -> List[str]:
+        with self._lock:
+            return list(self._entries)
+
+    @property
+    def total_bytes(self) -> int:
+        return self._total
+
+
+class ListingCache:
+    """Serve ``get_files`` listings of completed backups from a local cache.
+
+    Listings are keyed by ``(clientid, backupid, path)`` and stored as
+    compressed snapshots in *directory*, bounded to *max_bytes* on disk.
+    A client's cached listings stay valid while their backup is still
+    returned by ``get_backups`` and is not ``delete_pending``; the backup
+    list is re-checked at most every *revalidate_interval* seconds.
+
+    The cache has the same ``get_files`` signature as the server, so it can
+    be passed anywhere a listing source is expected (e.g. ``walk_backup``).
+    """
+
+    def __init__(
+        self,
+        server: Any,
+        directory: str,
+        max_bytes: int = 256 * 1024 * 1024,
+        compress_level: int = 6,
+        revalidate_interval: float = 300,
+    ) -> None:
+        self._server = server
+        self._store = _DiskLRU(directory, max_bytes, compress_level)
+        self.revalidate_interval = revalidate_interval
+        self._valid: Dict[int, Set[int]] = {}
+        self._checked: Dict[int, float] = {}
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+
+    @staticmethod
+    def _name(clientid: int, backupid: int, path: str) -> str:
+        digest = hashlib.sha1(path.encode("utf-8", "surrogatepass")).hexdigest()
+        return f"{clientid}-{backupid}-{digest}"
+
+    def refresh(self, clientid: int) -> None:
+        """Re-read the backup list of *clientid* and drop stale listings."""
+        backups = self._server.get_backups(clientid)
+        if backups is None:
+            return
+        valid = {b.id for b in backups.backups if not b.delete_pending}
+        with self._lock:
+            self._valid[clientid] = valid
+            self._checked[clientid] = time.monotonic()
+        prefix = f"{clientid}-"
+        for name in self._store.names():
+            if not name.startswith(prefix):
+                continue
+            try:
+                backupid = int(name.split("-", 2)[1])
+            except (IndexError, ValueError):
+                # Not a listing, e.g. a LogCache entry in a shared directory.
+                continue
+            if backupid not in valid:
+                self._store.delete(name)
+
+    def _is_valid(self, clientid: int, backupid: int) -> bool:
+        with self._refresh_lock:
+            checked = self._checked.get(clientid)
+            if checked is None or time.monotonic() - checked > self.revalidate_interval:
+                self.refresh(clientid)
+        return backupid in self._valid.get(clientid, ())
+
+    def invalidate(self, clientid: int, backupid: Optional[int] = None) -> None:
+        """Drop cached listings of one backup, or of all backups of a client."""
+        prefix = f"{clientid}-" if backupid is None else f"{clientid}-{backupid}-"
+        self._store.delete_prefix(prefix)
+
+    def get_files(
+        self,
+        clientid: int,
+        backupid: int,
+        path: str = "/",
+        mount: bool = False,
+    ) -> Optional[FilesResult]:
+        """Like ``urbackup_server_typed.get_files`` but served from cache."""
+        if mount or not self._is_valid(clientid, backupid):
+            return self._server.get_files(clientid, backupid, path, mount)
+
+        name = self._name(clientid, backupid, path)
+        data = self._store.get(name)
+        if data is not None:
+            try:
+                return from_bytes(data, FilesResult)
+            except SnapshotFormatError:
+                logger.warning("Dropping corrupt cached listing %s", name)
+                self._store.delete(name)
+
+        result = self._server.get_files(clientid, backupid, path)
+        if result is not None:
+            self._store.put(name, to_bytes(result))
+        return result
+
+    def get_backup_content(
+        self,
+        clientid: int,
+        backupid: int,
+        path: str = "/",
+    ) -> Optional[List[Dict[str, Any]]]:
+        """Like the legacy ``get_backup_content`` but served from cache."""
+        result = self.get_files(clientid, backupid, path)
+        if result is None:
+            return None
+        return [dataclasses.asdict(f) for f in result.files]
+
+    def warm(
+        self,
+        clientid: int,
+        backupid: int,
+        root: str = "/",
+        max_workers: int = 4,
+    ) -> int:
+        """Walk a backup so that all of its listings are cached.
+
+        Returns the number of directories visited.
+        """
+        count = 0
+        for _ in iter_backup_listings(
+            self, clientid, backupid, root, max_workers=max_workers,
+        ):
+            count += 1
+        return count
+
+    @property
+    def size_bytes(self) -> int:
+        """Compressed size of all cached listings on disk."""
+        return self._store.total_bytes
+
+
+def get_log_many(
+    source: Any,
+    logids: Iterable[int],
+    max_workers: int = 8,
+) -> Dict[int, Optional[List[LogDataRow]]]:
+    """Fetch several logs with ``get_log`` concurrently.
+
+    *source* is a server or a :class:`LogCache`.  Returns a dict keyed by
+    log ID in the order given; logs that could not be fetched map to
+    ``None``.
+    """
+    ids = list(dict.fromkeys(logids))
+
+    def fetch(logid: int) -> Optional[List[LogDataRow]]:
+        try:
+            return source.get_log(logid)
+        except Exception as e:
+            logger.warning("Fetching log %s failed: %r", logid, e)
+            return None
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        return dict(zip(ids, pool.map(fetch, ids)))
+
+
+class LogCache:
+    """Keep parsed ``get_log`` results of finished logs on disk.
+
+    A log never changes once it shows up in ``get_logs``, so its rows are
+    stored as a compressed snapshot keyed by log ID and never revalidated;
+    the directory is bounded to *max_bytes* with least-recently-used
+    eviction.  Like :class:`ListingCache` it has the server's ``get_log``
+    signature and can stand in for the server.
+    """
+
+    def __init__(
+        self,
+        server: Any,
+        directory: str,
+        max_bytes: int = 64 * 1024 * 1024,
+        compress_level: int = 6,
+    ) -> None:
+        self._server = server
+        self._store = _DiskLRU(directory, max_bytes, compress_level)
+
+    def get_log(self, logid: int) -> Optional[List[LogDataRow]]:
+        """Like ``urbackup_server_typed.get_log`` but served from cache."""
+        name = f"log-{logid}"
+        data = self._store.get(name)
+        if data is not None:
+            try:
+                return from_bytes(data)
+            except SnapshotFormatError:
+                logger.warning("Dropping corrupt cached log %s", logid)
+                self._store.delete(name)
+
+        rows = self._server.get_log(logid)
+        # An empty answer may be a log that is still being written.
+        if rows:
+            self._store.put(name, to_bytes(rows))
+        return rows
+
+    def get_log_many(
+        self,
+        logids: Iterable[int],
+        max_workers: int = 8,
+    ) -> Dict[int, Optional[List[LogDataRow]]]:
+        """Fetch several logs, downloading only those not cached yet."""
+        return get_log_many(self, logids, max_workers)
+
+    def invalidate(self, logid: int) -> None:
+        self._store.delete(f"log-{logid}")
+
+    @property
+    def size_bytes(self) -> int:
+        """Compressed size of all cached logs on disk."""
+        return self._store.total_bytes
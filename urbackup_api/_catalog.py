@@ -0,0 +1,260 @@
+"""Local searchable catalog of the files in all backups."""
+
+from __future__ import annotations
+
+import sqlite3
+import time
+from dataclasses import dataclass
+from typing import Any, Iterable, List, Optional, Tuple
+
+from ._base import logger
+from ._walk import walk_backup
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS backups (
+    clientid INTEGER NOT NULL,
+    backupid INTEGER NOT NULL,
+    backuptime INTEGER NOT NULL,
+    indexed_at INTEGER NOT NULL,
+    PRIMARY KEY (clientid, backupid)
+);
+CREATE TABLE IF NOT EXISTS files (
+    clientid INTEGER NOT NULL,
+    backupid INTEGER NOT NULL,
+    path TEXT NOT NULL,
+    name TEXT NOT NULL,
+    dir INTEGER NOT NULL,
+    size INTEGER,
+    mod INTEGER,
+    shahash TEXT,
+    ext TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS files_backup ON files (clientid, backupid);
+CREATE INDEX IF NOT EXISTS files_name ON files (name);
+CREATE INDEX IF NOT EXISTS files_path ON files (path);
+CREATE INDEX IF NOT EXISTS files_size ON files (size);
+CREATE INDEX IF NOT EXISTS files_mod ON files (mod);
+CREATE INDEX IF NOT EXISTS files_shahash ON files (shahash);
+CREATE INDEX IF NOT EXISTS files_ext ON files (ext);
+"""
+
+_GLOB_SPECIAL = "*?[]"
+
+_BATCH = 5000
+
+
+def _ext(name: str) -> str:
+    """Return the extension of *name* (after the last dot), or ``""``."""
+    dot = name.rfind(".")
+    return name[dot + 1:] if dot >= 0 else ""
+
+
+def _pattern_ext(pattern: str) -> Optional[str]:
+    """Return the extension every path matching *pattern* must have.
+
+    That is the case if the pattern ends in a literal run containing a
+    dot, like ``*/finance/*.xlsx``; the extension then lets the query use
+    the ``files_ext`` index even when the pattern starts with ``*``.
+    """
+    start = max(pattern.rfind(c) for c in _GLOB_SPECIAL) + 1
+    tail = pattern[start:]
+    dot = tail.rfind(".")
+    if dot < 0 or "/" in tail[dot + 1:]:
+        return None
+    return tail[dot + 1:]
+
+
+@dataclass
+class CatalogEntry:
+    """A file or directory found in the catalog."""
+    clientid: int = 0
+    backupid: int = 0
+    backuptime: int = 0
+    path: str = ""
+    name: str = ""
+    dir: bool = False
+    size: Optional[int] = None
+    mod: Optional[int] = None
+    shahash: Optional[str] = None
+
+
+class BackupCatalog:
+    """SQLite index of the files contained in every file backup.
+
+    :meth:`update` adds backups that have not been indexed yet and forgets
+    backups that were removed or are pending deletion.  Listings are read
+    from *source* (default: *server*), so a ``ListingCache`` can be used to
+    avoid refetching trees.
+    """
+
+    def __init__(
+        self,
+        server: Any,
+        path: str,
+        source: Any = None,
+    ) -> None:
+        self._server = server
+        self._source = source if source is not None else server
+        self._db = sqlite3.connect(path)
+        self._db.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        self._db.close()
+
+    def indexed_backups(self) -> List[Tuple[int, int]]:
+        """Return ``(clientid, backupid)`` of all indexed backups."""
+        return self._db.execute(
+            "SELECT clientid, backupid FROM backups ORDER BY clientid, backupid"
+        ).fetchall()
+
+    def update(
+        self,
+        client_ids: Optional[Iterable[int]] = None,
+        max_workers: int = 4,
+    ) -> int:
+        """Index all backups not seen before and return how many were added.
+
+        *client_ids* defaults to every client in the server status.
+        """
+        if client_ids is None:
+            status = self._server.get_status_result()
+            if status is None:
+                return 0
+            client_ids = [c.id for c in status.status]
+
+        added = 0
+        for clientid in client_ids:
+            backups = self._server.get_backups(clientid)
+            if backups is None:
+                continue
+            live = {b.id: b for b in backups.backups if not b.delete_pending}
+            known = {
+                r[0] for r in self._db.execute(
+                    "SELECT backupid FROM backups WHERE clientid = ?", (clientid,)
+                )
+            }
+            for backupid in known - set(live):
+                self._forget(clientid, backupid)
+            for backupid in sorted(set(live) - known):
+                self._index(clientid, backupid, live[backupid].backuptime, max_workers)
+                added += 1
+        return added
+
+    def _forget(self, clientid: int, backupid: int) -> None:
+        with self._db:
+            self._db.execute(
+                "DELETE FROM files WHERE clientid = ? AND backupid = ?",
+                (clientid, backupid),
+            )
+            self._db.execute(
+                "DELETE FROM backups WHERE clientid = ? AND backupid = ?",
+                (clientid, backupid),
+            )
+
+    def _index(
+        self,
+        clientid: int,
+        backupid: int,
+        backuptime: int,
+        max_workers: int,
+    ) -> None:
+        logger.debug("Indexing backup %s of client %s", backupid, clientid)
+        insert = "INSERT INTO files VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)"
+        with self._db:
+            # Drop rows of an earlier, interrupted run.
+            self._db.execute(
+                "DELETE FROM files WHERE clientid = ? AND backupid = ?",
+                (clientid, backupid),
+            )
+            batch: List[Tuple[Any, ...]] = []
+            for path, f in walk_backup(
+                self._source, clientid, backupid, max_workers=max_workers,
+            ):
+                batch.append((
+                    clientid, backupid, path, f.name, int(f.dir),
+                    f.size, f.mod, f.shahash, _ext(f.name),
+                ))
+                if len(batch) >= _BATCH:
+                    self._db.executemany(insert, batch)
+                    batch.clear()
+            self._db.executemany(insert, batch)
+            self._db.execute(
+                "INSERT INTO backups VALUES (?, ?, ?, ?)",
+                (clientid, backupid, backuptime, int(time.time())),
+            )
+
+    def find(
+        self,
+        pattern: Optional[str] = None,
+        name: Optional[str] = None,
+        clientid: Optional[int] = None,
+        min_size: Optional[int] = None,
+        max_size: Optional[int] = None,
+        mod_after: Optional[int] = None,
+        mod_before: Optional[int] = None,
+        shahash: Optional[str] = None,
+        include_dirs: bool = False,
+        limit: Optional[int] = None,
+    ) -> List[CatalogEntry]:
+        """Search the catalog.
+
+        *pattern* is a case-sensitive glob matched against the full path
+        (``*`` also matches ``/``, e.g. ``"*/finance/*.xlsx"``) and *name*
+        an exact file name.  Size and modification-time bounds are
+        inclusive.  Patterns ending in a literal extension are answered
+        through the extension index.
+        """
+        where: List[str] = []
+        args: List[Any] = []
+        ext = _pattern_ext(pattern) if pattern is not None else None
+        for clause, value in (
+            ("f.ext = ?", ext),
+            ("f.path GLOB ?", pattern),
+            ("f.name = ?", name),
+            ("f.clientid = ?", clientid),
+            ("f.size >= ?", min_size),
+            ("f.size <= ?", max_size),
+            ("f.mod >= ?", mod_after),
+            ("f.mod <= ?", mod_before),
+            ("f.shahash = ?", shahash),
+        ):
+            if value is not None:
+                where.append(clause)
+                args.append(value)
+        if not include_dirs:
+            where.append("f.dir = 0")
+        sql = (
+            "SELECT f.clientid, f.backupid, b.backuptime, f.path, f.name,"
+            " f.dir, f.size, f.mod, f.shahash"
+            " FROM files f JOIN backups b"
+            " ON b.clientid = f.clientid AND b.backupid = f.backupid"
+        )
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY f.clientid, b.backuptime, f.path"
+        if limit is not None:
+            sql += " LIMIT ?"
+            args.append(limit)
+        return [
+            CatalogEntry(
+                clientid=r[0], backupid=r[1], backuptime=r[2], path=r[3],
+                name=r[4], dir=bool(r[5]), size=r[6], mod=r[7], shahash=r[8],
+            )
+            for r in self._db.execute(sql, args)
+        ]
+
+    def find_backups(self, pattern: str) -> List[Tuple[int, int]]:
+        """Return ``(clientid, backupid)`` of backups with a path matching *pattern*."""
+        ext = _pattern_ext(pattern)
+        if ext is None:
+            return self._db.execute(
+                "SELECT DISTINCT clientid, backupid FROM files WHERE path GLOB ?"
+                " ORDER BY clientid, backupid",
+                (pattern,),
+            ).fetchall()
+        return self._db.execute(
+            "SELECT DISTINCT clientid, backupid FROM files"
+            " WHERE ext = ? AND path GLOB ? ORDER BY clientid, backupid",
+            (ext, pattern),
+        ).fetchall()
+
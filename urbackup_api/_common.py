@@ -2,12 +2,17 @@
 
 from __future__ import annotations
 
+import base64
+import binascii
 import dataclasses
+import json
+import os
 import secrets
 import string
+import tempfile
 from dataclasses import dataclass, field
 from enum import Enum, IntEnum
-from typing import Any, Dict, List, Optional, Union
+from typing import Any, Dict, List, Optional, Tuple, Union
 
 
 # ---------------------------------------------------------------------------
@@ -27,6 +32,56 @@ def _from_dict(cls: type, data: dict) -> Any:
     return cls(**{k: v for k, v in data.items() if k in known})
 
 
+_HASH_BY_DIGEST_SIZE = {64: "sha512", 32: "sha256", 20: "sha1"}
+
+
+def _shahash_candidates(shahash: Optional[str]) -> List[Tuple[str, bytes]]:
+    """Decode a ``BackupFile.shahash`` into possible ``(hashlib name, digest)``.
+
+    The server may send the digest hex or base64 encoded, and the base64
+    alphabet variants (standard, URL-safe, ``-`` for ``/``) cannot always be
+    told apart, so every plausible decoding is returned.  The list is empty
+    if the hash is missing or not a plain digest of a known size.
+    """
+    if not shahash:
+        return []
+    decoded = []
+    try:
+        decoded.append(binascii.unhexlify(shahash))
+    except (binascii.Error, ValueError):
+        pass
+    padded = shahash + "=" * (-len(shahash) % 4)
+    for altchars in (b"+/", b"-_", b"+-"):
+        try:
+            decoded.append(base64.b64decode(padded, altchars, validate=True))
+        except (binascii.Error, ValueError):
+            pass
+    ret: List[Tuple[str, bytes]] = []
+    for digest in decoded:
+        algo = _HASH_BY_DIGEST_SIZE.get(len(digest))
+        if algo is not None and (algo, digest) not in ret:
+            ret.append((algo, digest))
+    return ret
+
+
+def _load_json_state(path: str, default: Any) -> Any:
+    """Load persisted JSON state from *path*, or return *default*."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return default
+
+
+def _save_json_state(path: str, data: Any) -> None:
+    """Atomically replace the JSON state stored at *path*."""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+
 def _random_string(length: int = 50) -> str:
     chars = string.ascii_letters + string.digits
     return "".join(secrets.choice(chars) for _ in range(length))
@@ -496,6 +551,19 @@ class LogInfo:
         return _from_dict(cls, data)
 
 
+@dataclass
+class LiveLogEntry:
+    """A single entry of the server's live log."""
+    id: int = 0
+    msg: str = ""
+    loglevel: int = 0
+    time: int = 0
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> LiveLogEntry:
+        return _from_dict(cls, data)
+
+
 @dataclass
 class UserRight:
     """A user permission entry."""
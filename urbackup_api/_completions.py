@@ -0,0 +1,66 @@
+"""Exactly-once feed of finished backups and restores from ``lastacts``."""
+
+from __future__ import annotations
+
+from typing import Any, Dict, List, Optional
+
+from ._common import ActivityItem, ProgressResult, _load_json_state, _save_json_state
+
+
+class CompletionFeed:
+    """Yield each finished backup or restore from ``lastacts`` once.
+
+    ``get_progress(with_last_activities=True)`` repeats the same recent
+    activities on every call.  The feed remembers the highest
+    ``ActivityItem.id`` (and its ``backuptime``) it has handed out in a
+    JSON file at *state_path* and only returns newer activities, so it
+    works on the progress snapshots the caller already fetches and never
+    sends a request of its own.  If every ID is below the watermark (the
+    server database was reset) activities are compared by ``backuptime``.
+
+    Deletions are skipped unless *include_deletes* is set.
+    """
+
+    def __init__(self, state_path: str, include_deletes: bool = False) -> None:
+        self.state_path = state_path
+        self.include_deletes = include_deletes
+        self.watermark: Dict[str, int] = _load_json_state(state_path, {})
+
+    def feed(
+        self,
+        snapshot: ProgressResult,
+        commit: bool = True,
+    ) -> List[ActivityItem]:
+        """Return the activities of *snapshot* not returned before, oldest first.
+
+        *snapshot* must have been fetched with last activities.  With
+        *commit* the watermark is saved right away; otherwise call
+        :meth:`commit` once the activities are processed.
+        """
+        if snapshot.lastacts is None:
+            raise ValueError("Snapshot has no last activities; "
+                             "use get_progress(with_last_activities=True)")
+        acts = snapshot.lastacts
+        if self.watermark:
+            if acts and max(a.id for a in acts) < self.watermark["id"]:
+                acts = [a for a in acts if a.backuptime > self.watermark["backuptime"]]
+            else:
+                acts = [a for a in acts if a.id > self.watermark["id"]]
+        acts = sorted(acts, key=lambda a: a.id)
+        if commit and acts:
+            self.commit(acts[-1])
+        if not self.include_deletes:
+            acts = [a for a in acts if not a.is_delete]
+        return acts
+
+    def poll(self, server: Any, commit: bool = True) -> Optional[List[ActivityItem]]:
+        """Fetch one progress snapshot from *server* and :meth:`feed` it."""
+        snapshot = server.get_progress(with_last_activities=True)
+        if snapshot is None:
+            return None
+        return self.feed(snapshot, commit)
+
+    def commit(self, last: ActivityItem) -> None:
+        """Record *last* as the newest processed activity."""
+        self.watermark = {"id": last.id, "backuptime": last.backuptime}
+        _save_json_state(self.state_path, self.watermark)
@@ -0,0 +1,170 @@
+"""Concurrent fleet-wide ``get_backups`` crawl."""
+
+from __future__ import annotations
+
+import threading
+import time
+from array import array
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from ._base import logger
+from ._common import (
+    Backup,
+    BackupsAccessDeniedError,
+    BackupsAccessError,
+    ResponseParseError,
+)
+
+
+class BackupTable:
+    """Column-oriented table of the file and image backups of many clients.
+
+    Integer columns are ``array('q')`` and flags are ``bytearray``, so a
+    table of a whole fleet stays small.  ``errors`` maps client IDs that
+    could not be crawled to the exception raised for them.
+    """
+
+    _INT_COLUMNS = ("id", "backuptime", "size_bytes", "incremental", "archived")
+
+    def __init__(self) -> None:
+        self.clientid = array("q")
+        self.id = array("q")
+        self.backuptime = array("q")
+        self.size_bytes = array("q")
+        self.incremental = array("q")
+        self.archived = array("q")
+        self.image = bytearray()
+        self.can_archive = bytearray()
+        self.archive_timeout: List[Optional[int]] = []
+        self.disable_delete: List[Optional[bool]] = []
+        self.delete_pending: List[Optional[bool]] = []
+        self.errors: Dict[int, Exception] = {}
+
+    def __len__(self) -> int:
+        return len(self.id)
+
+    def append(self, clientid: int, image: bool, b: Backup) -> None:
+        self.clientid.append(clientid)
+        for name in self._INT_COLUMNS:
+            getattr(self, name).append(getattr(b, name))
+        self.image.append(bool(image))
+        self.can_archive.append(bool(b.can_archive))
+        self.archive_timeout.append(b.archive_timeout)
+        self.disable_delete.append(b.disable_delete)
+        self.delete_pending.append(b.delete_pending)
+
+    def backup(self, i: int) -> Backup:
+        """Return row *i* as a ``Backup``."""
+        return Backup(
+            id=self.id[i], clientid=self.clientid[i],
+            size_bytes=self.size_bytes[i], incremental=self.incremental[i],
+            archive_timeout=self.archive_timeout[i],
+            can_archive=bool(self.can_archive[i]),
+            backuptime=self.backuptime[i], archived=self.archived[i],
+            disable_delete=self.disable_delete[i],
+            delete_pending=self.delete_pending[i],
+        )
+
+    def rows(
+        self,
+        clientid: Optional[int] = None,
+        image: Optional[bool] = None,
+    ) -> Iterator[Tuple[bool, Backup]]:
+        """Yield ``(image, Backup)`` rows, optionally filtered."""
+        for i in range(len(self)):
+            if clientid is not None and self.clientid[i] != clientid:
+                continue
+            if image is not None and bool(self.image[i]) != image:
+                continue
+            yield bool(self.image[i]), self.backup(i)
+
+    def by_client(self) -> Dict[int, List[Tuple[bool, Backup]]]:
+        """Group all rows as ``{clientid: [(image, Backup), ...]}``."""
+        groups: Dict[int, List[Tuple[bool, Backup]]] = {}
+        for i in range(len(self)):
+            groups.setdefault(self.clientid[i], []).append(
+                (bool(self.image[i]), self.backup(i))
+            )
+        return groups
+
+
+class _AdaptiveLimit:
+    """Additive-increase / multiplicative-decrease concurrency limit.
+
+    The limit grows by one after each fast success and halves after an
+    error or a response much slower than the best one seen so far.
+    """
+
+    def __init__(self, maximum: int, initial: int = 4, slow_factor: float = 3.0) -> None:
+        self.maximum = max(1, maximum)
+        self.limit = min(initial, self.maximum)
+        self.slow_factor = slow_factor
+        self._best: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def record(self, latency: Optional[float]) -> None:
+        with self._lock:
+            if latency is not None and (self._best is None or latency < self._best):
+                self._best = latency
+            if latency is None or (
+                self._best is not None and latency > self._best * self.slow_factor
+            ):
+                self.limit = max(1, self.limit // 2)
+            elif self.limit < self.maximum:
+                self.limit += 1
+
+
+def crawl_backups(
+    server: Any,
+    client_ids: Iterable[int],
+    max_workers: int = 16,
+) -> BackupTable:
+    """Fetch ``get_backups`` for every client in *client_ids* concurrently.
+
+    Concurrency starts low and adapts between 1 and *max_workers* depending
+    on how quickly the server answers.  A client that fails (for example
+    with ``BackupsAccessDeniedError``) is recorded in
+    ``BackupTable.errors`` and does not abort the crawl.
+    """
+    table = BackupTable()
+    limit = _AdaptiveLimit(max_workers)
+    todo = list(client_ids)
+    todo.reverse()
+
+    def fetch(clientid: int) -> Tuple[Any, float]:
+        start = time.monotonic()
+        backups = server.get_backups(clientid)
+        return backups, time.monotonic() - start
+
+    with ThreadPoolExecutor(max_workers=limit.maximum) as pool:
+        inflight: Dict[Future, int] = {}
+        while todo or inflight:
+            while todo and len(inflight) < limit.limit:
+                clientid = todo.pop()
+                inflight[pool.submit(fetch, clientid)] = clientid
+            done, _ = wait(list(inflight), return_when=FIRST_COMPLETED)
+            for fut in done:
+                clientid = inflight.pop(fut)
+                try:
+                    backups, latency = fut.result()
+                    if backups is None:
+                        raise ResponseParseError(
+                            f"No backups response for client {clientid}"
+                        )
+                except (BackupsAccessDeniedError, BackupsAccessError) as e:
+                    # The server answered; this says nothing about its load.
+                    table.errors[clientid] = e
+                    continue
+                except Exception as e:
+                    logger.warning("Crawling backups of client %s failed: %r",
+                                   clientid, e)
+                    table.errors[clientid] = e
+                    limit.record(None)
+                    continue
+                limit.record(latency)
+                for b in backups.backups:
+                    table.append(clientid, False, b)
+                for b in backups.backup_images or []:
+                    table.append(clientid, True, b)
+    return table
@@ -0,0 +1,123 @@
+"""Streaming comparison of two file backups."""
+
+from __future__ import annotations
+
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from enum import Enum
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from ._base import logger
+from ._common import BackupFile, BackupsAccessError
+from ._walk import _join
+
+
+class ChangeType(str, Enum):
+    """Kind of difference between two backups."""
+    ADDED = "added"
+    REMOVED = "removed"
+    MODIFIED = "modified"
+    #: A directory present in both backups that could not be listed in at
+    #: least one of them; changes below it are unknown.
+    UNLISTABLE = "unlistable"
+
+
+@dataclass
+class BackupDiffEntry:
+    """One difference between two backups."""
+    change: ChangeType
+    path: str
+    old: Optional[BackupFile] = None
+    new: Optional[BackupFile] = None
+
+
+def _same_file(a: BackupFile, b: BackupFile) -> bool:
+    return a.size == b.size and a.mod == b.mod and a.shahash == b.shahash
+
+
+def _same_dir(a: BackupFile, b: BackupFile) -> bool:
+    if a.shahash is not None and b.shahash is not None:
+        return a.shahash == b.shahash
+    return a.mod != 0 and _same_file(a, b)
+
+
+def diff_backups(
+    source: Any,
+    clientid: int,
+    old_backupid: int,
+    new_backupid: int,
+    root: str = "/",
+    new_clientid: Optional[int] = None,
+    skip_unchanged_dirs: bool = False,
+) -> Iterator[BackupDiffEntry]:
+    """Yield the differences between two file backups below *root*.
+
+    Both trees are walked together one directory at a time, in sorted path
+    order, so neither tree is held in memory.  Files count as modified when
+    their ``size``, ``mod`` or ``shahash`` differ.  Added or removed
+    directories are reported once, without listing their contents.
+
+    *new_clientid* compares against a backup of a different client.  With
+    *skip_unchanged_dirs* directories whose own metadata is identical in
+    both backups are not descended into.  This makes the cost proportional
+    to the change set, but relies on the directory modification time, which
+    does not change when a file deeper down is rewritten in place.
+
+    Raises ``BackupsAccessError`` if *root* cannot be listed in either
+    backup (e.g. a wrong backup ID), so a failed listing is never mistaken
+    for "no changes".  A subdirectory that cannot be listed is reported as
+    one ``UNLISTABLE`` entry, since changes below it are unknown.
+    """
+    if new_clientid is None:
+        new_clientid = clientid
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+
+        def listing(
+            path: str,
+        ) -> Optional[Tuple[Dict[str, BackupFile], Dict[str, BackupFile]]]:
+            old_fut = pool.submit(source.get_files, clientid, old_backupid, path)
+            new_fut = pool.submit(source.get_files, new_clientid, new_backupid, path)
+            old, new = old_fut.result(), new_fut.result()
+            if old is None or new is None:
+                return None
+            return (
+                {f.name: f for f in old.files},
+                {f.name: f for f in new.files},
+            )
+
+        def walk(
+            path: str,
+            a: Optional[BackupFile] = None,
+            b: Optional[BackupFile] = None,
+        ) -> Iterator[BackupDiffEntry]:
+            sides = listing(path)
+            if sides is None:
+                if path == root:
+                    raise BackupsAccessError(
+                        f"Cannot list {path} of backup {old_backupid} of client "
+                        f"{clientid} or backup {new_backupid} of client "
+                        f"{new_clientid}"
+                    )
+                logger.warning("Cannot list %s in backup %s or %s",
+                               path, old_backupid, new_backupid)
+                yield BackupDiffEntry(ChangeType.UNLISTABLE, path, old=a, new=b)
+                return
+            old, new = sides
+            for name in sorted(old.keys() | new.keys()):
+                child = _join(path, name)
+                a, b = old.get(name), new.get(name)
+                if b is None:
+                    yield BackupDiffEntry(ChangeType.REMOVED, child, old=a)
+                elif a is None:
+                    yield BackupDiffEntry(ChangeType.ADDED, child, new=b)
+                elif a.dir != b.dir:
+                    yield BackupDiffEntry(ChangeType.REMOVED, child, old=a)
+                    yield BackupDiffEntry(ChangeType.ADDED, child, new=b)
+                elif a.dir:
+                    if not (skip_unchanged_dirs and _same_dir(a, b)):
+                        yield from walk(child, a, b)
+                elif not _same_file(a, b):
+                    yield BackupDiffEntry(ChangeType.MODIFIED, child, old=a, new=b)
+
+        yield from walk(root)
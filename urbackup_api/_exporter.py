@@ -0,0 +1,229 @@
+"""Prometheus exporter for UrBackup server health."""
+
+from __future__ import annotations
+
+import argparse
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from ._base import logger
+from ._common import ProgressResult, StatusResult, UsageClientStat
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+_CLIENT_METRICS = [
+    ("urbackup_client_online", "Whether the client is online."),
+    ("urbackup_client_file_ok", "Whether the client's file backups are ok."),
+    ("urbackup_client_image_ok", "Whether the client's image backups are ok."),
+    ("urbackup_client_delete_pending", "Whether the client is pending removal."),
+    ("urbackup_client_last_file_backup_age_seconds",
+     "Seconds since the last file backup."),
+    ("urbackup_client_last_image_backup_age_seconds",
+     "Seconds since the last image backup."),
+    ("urbackup_client_used_bytes", "Storage used by all backups of the client."),
+    ("urbackup_client_file_backup_bytes", "Storage used by file backups."),
+    ("urbackup_client_image_backup_bytes", "Storage used by image backups."),
+    ("urbackup_client_running_processes", "Number of running processes."),
+    ("urbackup_client_transfer_bytes_per_second",
+     "Summed current speed of the client's running processes."),
+]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format(value: float) -> str:
+    """Format a sample value exactly; ``:g`` would round to 6 digits."""
+    if isinstance(value, int):
+        return str(value)
+    if value.is_integer() and abs(value) < 2 ** 53:
+        return str(int(value))
+    return repr(float(value))
+
+
+def _age(timestamp: Any, now: float) -> Optional[float]:
+    try:
+        ts = int(timestamp)
+    except (TypeError, ValueError):
+        return None
+    return max(now - ts, 0) if ts > 0 else None
+
+
+def render_metrics(
+    status: Optional[StatusResult],
+    progress: Optional[ProgressResult],
+    usage: Optional[List[UsageClientStat]],
+    now: Optional[float] = None,
+) -> str:
+    """Render one collection in the Prometheus text exposition format."""
+    if now is None:
+        now = time.time()
+    samples: Dict[str, List[Tuple[str, float]]] = {
+        name: [] for name, _ in _CLIENT_METRICS
+    }
+    used = {u.name: u for u in usage or []}
+    running: Dict[int, Tuple[int, float]] = {}
+    for p in progress.progress if progress is not None else []:
+        count, speed = running.get(p.clientid, (0, 0.0))
+        running[p.clientid] = (count + 1, speed + p.speed_bpms * 1000)
+
+    for c in status.status if status is not None else []:
+        labels = (f'client="{_escape(c.name)}",clientid="{c.id}",'
+                  f'group="{_escape(c.groupname)}"')
+        values: Dict[str, Optional[float]] = {
+            "urbackup_client_online": float(bool(c.online)),
+            "urbackup_client_file_ok": float(bool(c.file_ok)),
+            "urbackup_client_image_ok": float(bool(c.image_ok)),
+            "urbackup_client_delete_pending": float(bool(c.delete_pending)),
+            "urbackup_client_last_file_backup_age_seconds": _age(c.lastbackup, now),
+            "urbackup_client_last_image_backup_age_seconds":
+                _age(c.lastbackup_image, now),
+        }
+        u = used.get(c.name)
+        if u is not None:
+            values["urbackup_client_used_bytes"] = float(u.used)
+            values["urbackup_client_file_backup_bytes"] = float(u.files)
+            values["urbackup_client_image_backup_bytes"] = float(u.images)
+        if progress is not None:
+            count, speed = running.get(c.id, (0, 0.0))
+            values["urbackup_client_running_processes"] = float(count)
+            values["urbackup_client_transfer_bytes_per_second"] = speed
+        for name, value in values.items():
+            if value is not None:
+                samples[name].append((labels, value))
+
+    lines = []
+    for name, help_text in _CLIENT_METRICS:
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} gauge")
+        lines += [f"{name}{{{labels}}} {_format(value)}"
+                  for labels, value in samples[name]]
+    return "\n".join(lines) + "\n"
+
+
+class MetricsCollector:
+    """Collect server metrics in the background and keep them rendered.
+
+    Every *interval* seconds one ``get_status_result``, ``get_progress``
+    and ``get_usage_stats`` call is made and the rendered text replaces
+    the cached one, so any number of scrapes cost the server nothing and
+    are answered from memory by :meth:`render`.
+    """
+
+    def __init__(self, server: Any, interval: float = 60.0) -> None:
+        self._server = server
+        self.interval = interval
+        self._body = b""
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def collect(self) -> None:
+        """Run one collection now and update the cached metrics."""
+        start = time.monotonic()
+        try:
+            status = self._server.get_status_result()
+            progress = self._server.get_progress()
+            usage = self._server.get_usage_stats()
+            text = render_metrics(status, progress, usage)
+            up = int(status is not None)
+        except Exception as e:
+            logger.warning("Collecting metrics failed: %r", e)
+            text, up = "", 0
+        text += (
+            "# HELP urbackup_up Whether the last collection reached the server.\n"
+            "# TYPE urbackup_up gauge\n"
+            f"urbackup_up {up}\n"
+            "# HELP urbackup_collect_duration_seconds Duration of the last collection.\n"
+            "# TYPE urbackup_collect_duration_seconds gauge\n"
+            f"urbackup_collect_duration_seconds {time.monotonic() - start:.6f}\n"
+            "# HELP urbackup_collect_timestamp_seconds Time of the last collection.\n"
+            "# TYPE urbackup_collect_timestamp_seconds gauge\n"
+            f"urbackup_collect_timestamp_seconds {time.time():.3f}\n"
+        )
+        self._body = text.encode("utf-8")
+
+    def render(self) -> bytes:
+        """Return the most recently rendered metrics."""
+        return self._body
+
+    def _run(self) -> None:
+        self.collect()
+        while not self._stopped.wait(self.interval):
+            self.collect()
+
+    def start(self) -> None:
+        if self._thread is None:
+            self._stopped.clear()
+            self._thread = threading.Thread(
+                target=self._run, name="urbackup-exporter", daemon=True,
+            )
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+
+def make_metrics_server(
+    collector: MetricsCollector,
+    host: str = "",
+    port: int = 9554,
+) -> ThreadingHTTPServer:
+    """Create an HTTP server answering ``/metrics`` from *collector*."""
+
+    class Handler(BaseHTTPRequestHandler):
+
+        def do_GET(self) -> None:
+            if self.path.split("?", 1)[0] not in ("/metrics", "/"):
+                self.send_error(404)
+                return
+            body = collector.render()
+            self.send_response(200)
+            self.send_header("Content-Type", CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format: str, *args: Any) -> None:
+            logger.debug("metrics: " + format, *args)
+
+    return ThreadingHTTPServer((host, port), Handler)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    """Entry point of the ``urbackup-exporter`` command."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--url", default=os.environ.get("URBACKUP_URL"),
+                        help="server URL, e.g. http://127.0.0.1:55414/x")
+    parser.add_argument("--username",
+                        default=os.environ.get("URBACKUP_USERNAME", "admin"))
+    parser.add_argument("--password",
+                        default=os.environ.get("URBACKUP_PASSWORD", ""),
+                        help="defaults to $URBACKUP_PASSWORD")
+    parser.add_argument("--listen", default="", help="address to listen on")
+    parser.add_argument("--port", type=int, default=9554)
+    parser.add_argument("--interval", type=float, default=60.0,
+                        help="seconds between collections")
+    args = parser.parse_args(argv)
+    if not args.url:
+        parser.error("--url or $URBACKUP_URL is required")
+
+    from . import urbackup_server
+    collector = MetricsCollector(
+        urbackup_server(args.url, args.username, args.password), args.interval,
+    )
+    collector.start()
+    httpd = make_metrics_server(collector, args.listen, args.port)
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        httpd.server_close()
+        collector.stop()
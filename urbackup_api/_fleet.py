@@ -0,0 +1,162 @@
+"""Concurrent calls across several UrBackup servers."""
+
+from __future__ import annotations
+
+from concurrent.futures import ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Mapping, Optional, Sequence, Tuple
+
+from ._base import logger
+from ._common import LogLevel
+
+
+@dataclass
+class FleetRow:
+    """One result row tagged with the name of the server it came from."""
+    server: str
+    row: Any
+
+
+@dataclass
+class FleetResult:
+    """Merged result of a fleet-wide call.
+
+    *errors* maps servers that failed, returned nothing or did not answer
+    within the timeout to a short description.
+    """
+    rows: List[FleetRow] = field(default_factory=list)
+    errors: Dict[str, str] = field(default_factory=dict)
+
+    def by_server(self) -> Dict[str, List[Any]]:
+        groups: Dict[str, List[Any]] = {}
+        for r in self.rows:
+            groups.setdefault(r.server, []).append(r.row)
+        return groups
+
+
+class UrbackupFleet:
+    """Fan typed calls out to many servers and merge the results.
+
+    *servers* maps a name to a server object (each has its own session).
+    Every server gets its own thread pool of *max_workers_per_server*, so
+    a slow or dead server only ties up its own threads; calls give up on
+    servers that have not answered after *timeout* seconds and report
+    them in ``FleetResult.errors``.
+    """
+
+    def __init__(
+        self,
+        servers: Mapping[str, Any],
+        timeout: float = 30.0,
+        max_workers_per_server: int = 2,
+    ) -> None:
+        self.servers = dict(servers)
+        self.timeout = timeout
+        self._pools = {
+            name: ThreadPoolExecutor(
+                max_workers=max_workers_per_server,
+                thread_name_prefix=f"urbackup-fleet-{name}",
+            )
+            for name in self.servers
+        }
+
+    @classmethod
+    def connect(
+        cls,
+        config: Mapping[str, Tuple[str, str, str]],
+        **kwargs: Any,
+    ) -> UrbackupFleet:
+        """Create a fleet from ``{name: (url, username, password)}``."""
+        from . import urbackup_server
+        return cls(
+            {name: urbackup_server(*args) for name, args in config.items()},
+            **kwargs,
+        )
+
+    def close(self) -> None:
+        for pool in self._pools.values():
+            pool.shutdown(wait=False)
+
+    def __enter__(self) -> UrbackupFleet:
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+    def call(
+        self,
+        fn: Callable[[Any], Any],
+        timeout: Optional[float] = None,
+    ) -> Dict[str, Any]:
+        """Run ``fn(server)`` on every server concurrently.
+
+        Returns ``{name: result}`` for servers that answered in time; the
+        others map to the exception raised, or to ``TimeoutError``.
+        """
+        timeout = self.timeout if timeout is None else timeout
+        futures = {
+            self._pools[name].submit(fn, server): name
+            for name, server in self.servers.items()
+        }
+        done, pending = wait(futures, timeout=timeout)
+        results: Dict[str, Any] = {}
+        for fut in done:
+            name = futures[fut]
+            try:
+                results[name] = fut.result()
+            except Exception as e:
+                logger.warning("Fleet call on %s failed: %r", name, e)
+                results[name] = e
+        for fut in pending:
+            fut.cancel()
+            results[futures[fut]] = TimeoutError(f"No answer within {timeout}s")
+        return results
+
+    def _rows(
+        self,
+        fn: Callable[[Any], Any],
+        rows: Callable[[Any], Sequence[Any]],
+        timeout: Optional[float],
+    ) -> FleetResult:
+        result = FleetResult()
+        values = self.call(fn, timeout)
+        for name in self.servers:
+            value = values[name]
+            if isinstance(value, Exception):
+                result.errors[name] = repr(value)
+            elif value is None:
+                result.errors[name] = "no response"
+            else:
+                result.rows += [FleetRow(name, r) for r in rows(value)]
+        return result
+
+    def status(self, timeout: Optional[float] = None) -> FleetResult:
+        """``StatusClientItem`` rows of every server."""
+        return self._rows(
+            lambda s: s.get_status_result(), lambda r: r.status, timeout,
+        )
+
+    def progress(
+        self,
+        with_last_activities: bool = False,
+        timeout: Optional[float] = None,
+    ) -> FleetResult:
+        """``ProcessItem`` rows of every server."""
+        return self._rows(
+            lambda s: s.get_progress(with_last_activities),
+            lambda r: r.progress, timeout,
+        )
+
+    def usage(self, timeout: Optional[float] = None) -> FleetResult:
+        """``UsageClientStat`` rows of every server."""
+        return self._rows(lambda s: s.get_usage_stats(), lambda r: r, timeout)
+
+    def logs(
+        self,
+        log_level: LogLevel = LogLevel.INFO,
+        timeout: Optional[float] = None,
+    ) -> FleetResult:
+        """``LogInfo`` rows of every server."""
+        return self._rows(
+            lambda s: s.get_logs(None, log_level), lambda r: r, timeout,
+        )
@@ -0,0 +1,254 @@
+"""Hedged requests for idempotent read actions."""
+
+from __future__ import annotations
+
+import socket
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Dict, FrozenSet, Optional, Tuple
+
+from ._stats import LatencyHistogram
+
+#: Read actions that may be hedged, with the parameters they may carry.
+#: Any other parameter (``remove_client``, ``stop_id``, ``report_mail``,
+#: ...) makes the request a write, which is never sent twice.
+_HEDGEABLE: Dict[str, FrozenSet[str]] = {
+    "status": frozenset(),
+    "progress": frozenset({"with_lastacts"}),
+    "usage": frozenset(),
+    "backups": frozenset({"sa", "clientid"}),
+    "logs": frozenset({"filter", "ll", "logid"}),
+}
+
+
+def _is_hedgeable(action: str, params: Dict[str, Any]) -> bool:
+    allowed = _HEDGEABLE.get(action)
+    if allowed is None:
+        return False
+    if action == "backups" and params.get("sa") != "backups":
+        return False
+    return all(k in allowed or k == "ses" for k in params)
+
+
+@dataclass
+class HedgeStats:
+    """Counters of the hedging layer.
+
+    *hedged* second attempts were sent, *wins* of them answered first;
+    *denied* hedges were skipped because the budget was used up.
+    """
+    requests: int = 0
+    hedged: int = 0
+    wins: int = 0
+    denied: int = 0
+
+
+def _discard(response: Any) -> None:
+    try:
+        response.read()
+    finally:
+        response.close()
+
+
+class _Race:
+    """State shared by the first attempt of a hedged request and its hedge.
+
+    *winner* is set, under *lock*, by whichever attempt got its response
+    headers first: ``"first"`` or ``"hedge"``.
+    """
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.winner: Optional[str] = None
+        self.conn: Any = None
+        self.timer: Optional[threading.Timer] = None
+        self.hedge: Optional[Future] = None
+
+    def abandon_first(self) -> None:
+        """Interrupt the first attempt, which is blocked reading its response."""
+        sock = getattr(self.conn, "sock", None)
+        if sock is None:
+            return
+        try:
+            # The plain socket's shutdown: leaves a TLS layer's state alone
+            # while the first attempt's thread is reading through it.
+            socket.socket.shutdown(sock, socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+
+class _Hedger:
+    """Send a second attempt of slow reads and use whichever answers first.
+
+    The first attempt always runs on the calling thread, which blocks for
+    its response headers as usual.  If they have not arrived after the
+    observed p95 time to headers of the ``(action, sa)`` pair (at least
+    *min_delay*), a hedge is sent from a pool of *max_workers* threads.
+    Whichever attempt gets its headers first is used; when that is the
+    hedge, the first attempt's connection is shut down.  A failed hedge
+    leaves the first attempt waiting under its normal timeout.  Pairs
+    with fewer than *min_samples* observations are not hedged.
+    A token bucket earns *budget* tokens per hedgeable request (capped at
+    *burst*) and a hedge spends one, so hedges never exceed that fraction
+    of the reads.  When every pool thread is busy, no hedge is sent
+    either.
+    """
+
+    def __init__(
+        self,
+        budget: float = 0.05,
+        min_samples: int = 20,
+        min_delay: float = 0.01,
+        burst: float = 10.0,
+        max_workers: int = 8,
+    ) -> None:
+        self.budget = budget
+        self.min_samples = min_samples
+        self.min_delay = min_delay
+        self.burst = burst
+        self.max_workers = max(1, max_workers)
+        self._tokens = burst
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self._latency: Dict[Tuple[str, str], LatencyHistogram] = {}
+        self._stats = HedgeStats()
+        self._pool = ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix="urbackup-hedge",
+        )
+
+    def close(self) -> None:
+        self._pool.shutdown(wait=False)
+
+    def stats(self) -> HedgeStats:
+        with self._lock:
+            s = self._stats
+            return HedgeStats(s.requests, s.hedged, s.wins, s.denied)
+
+    def delay(self, key: Tuple[str, str]) -> Optional[float]:
+        """Return the hedge delay of *key*, or ``None`` while unknown."""
+        with self._lock:
+            h = self._latency.get(key)
+            if h is None or h.count < self.min_samples:
+                return None
+            p95 = h.quantile(0.95)
+        return max(p95 or 0.0, self.min_delay)
+
+    def _observe(self, key: Tuple[str, str], seconds: float) -> None:
+        with self._lock:
+            h = self._latency.get(key)
+            if h is None:
+                h = self._latency[key] = LatencyHistogram()
+            h.observe(seconds)
+
+    def _take_token(self) -> bool:
+        with self._lock:
+            allowed = self._tokens >= 1.0 and self._in_flight < self.max_workers
+            if allowed:
+                self._tokens -= 1.0
+                self._in_flight += 1
+                self._stats.hedged += 1
+            else:
+                self._stats.denied += 1
+            return allowed
+
+    def _won(self, key: Tuple[str, str], start: float) -> None:
+        with self._lock:
+            self._stats.wins += 1
+        self._observe(key, time.perf_counter() - start)
+
+    def _send_hedge(
+        self,
+        race: _Race,
+        server: Any,
+        action: str,
+        params: Dict[str, Any],
+        key: Tuple[str, str],
+        call: Any,
+    ) -> None:
+        with race.lock:
+            if race.winner is not None or not self._take_token():
+                return
+            start = time.perf_counter()
+
+            def attempt() -> Any:
+                try:
+                    response = server._get_response(action, params, call=call)
+                finally:
+                    with self._lock:
+                        self._in_flight -= 1
+                self._observe(key, time.perf_counter() - start)
+                with race.lock:
+                    if race.winner is None:
+                        race.winner = "hedge"
+                        race.abandon_first()
+                        return response
+                _discard(response)
+                return response
+
+            race.hedge = self._pool.submit(attempt)
+
+    def get_response(self, server: Any, action: str, params: Dict[str, Any]) -> Any:
+        if not _is_hedgeable(action, params):
+            return server._get_response(action, params)
+        key = (action, str(params.get("sa", "")))
+        with self._lock:
+            self._stats.requests += 1
+            self._tokens = min(self._tokens + self.budget, self.burst)
+        delay = self.delay(key)
+        start = time.perf_counter()
+        if delay is None:
+            response = server._get_response(action, params)
+            self._observe(key, time.perf_counter() - start)
+            return response
+
+        profiler = server._profiler
+        call = profiler.current() if profiler is not None else None
+        # _get_response adds the session to params: the hedge gets a copy.
+        hedge_params = dict(params)
+        race = _Race()
+
+        def on_sent(h: Any) -> None:
+            race.conn = h
+            race.timer = threading.Timer(
+                max(delay - (time.perf_counter() - start), 0.0),
+                self._send_hedge,
+                (race, server, action, hedge_params, key, call),
+            )
+            race.timer.daemon = True
+            race.timer.start()
+
+        try:
+            response = server._get_response(action, params, on_sent=on_sent)
+        except Exception:
+            with race.lock:
+                hedge = race.hedge
+                if race.winner is None and hedge is None:
+                    race.winner = "first"
+            if race.timer is not None:
+                race.timer.cancel()
+            if hedge is None:
+                raise
+            # Either the hedge won and closed this connection, or this
+            # attempt failed on its own: the hedge decides.
+            try:
+                response = hedge.result()
+            except Exception:
+                pass
+            else:
+                self._won(key, start)
+                return response
+            raise
+        with race.lock:
+            hedge_won = race.winner == "hedge"
+            if not hedge_won:
+                race.winner = "first"
+        if race.timer is not None:
+            race.timer.cancel()
+        if hedge_won:
+            response.close()
+            self._won(key, start)
+            return race.hedge.result()
+        self._observe(key, time.perf_counter() - start)
+        return response
@@ -0,0 +1,252 @@
+"""Incrementally synchronised local mirror of the backup inventory."""
+
+from __future__ import annotations
+
+import sqlite3
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from ._common import Backup, StatusResult
+from ._crawl import crawl_backups
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS clients (
+    clientid INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    lastbackup TEXT NOT NULL,
+    lastbackup_image TEXT NOT NULL,
+    synced_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS backups (
+    clientid INTEGER NOT NULL,
+    image INTEGER NOT NULL,
+    id INTEGER NOT NULL,
+    backuptime INTEGER NOT NULL,
+    size_bytes INTEGER NOT NULL,
+    incremental INTEGER NOT NULL,
+    archived INTEGER NOT NULL,
+    archive_timeout INTEGER,
+    can_archive INTEGER NOT NULL,
+    disable_delete INTEGER,
+    delete_pending INTEGER,
+    PRIMARY KEY (clientid, image, id)
+);
+CREATE INDEX IF NOT EXISTS backups_time ON backups (backuptime);
+"""
+
+_COLUMNS = (
+    "id, clientid, size_bytes, incremental, archive_timeout, can_archive,"
+    " backuptime, archived, disable_delete, delete_pending"
+)
+
+
+def _opt_bool(v: Optional[int]) -> Optional[bool]:
+    return None if v is None else bool(v)
+
+
+def _row_to_backup(r: Tuple[Any, ...]) -> Backup:
+    return Backup(
+        id=r[0], clientid=r[1], size_bytes=r[2], incremental=r[3],
+        archive_timeout=r[4], can_archive=bool(r[5]), backuptime=r[6],
+        archived=r[7], disable_delete=_opt_bool(r[8]),
+        delete_pending=_opt_bool(r[9]),
+    )
+
+
+@dataclass
+class BackupTransition:
+    """A change to one backup noticed during a sync.
+
+    *kind* is ``"added"``, ``"removed"``, ``"delete_pending"`` or
+    ``"archived"``; the latter two carry the old and new value.
+    """
+    clientid: int
+    backupid: int
+    image: bool
+    kind: str
+    old: Any = None
+    new: Any = None
+
+
+@dataclass
+class InventorySyncResult:
+    """What an :meth:`BackupInventory.sync` call did."""
+    refetched: List[int] = field(default_factory=list)
+    removed_clients: List[int] = field(default_factory=list)
+    transitions: List[BackupTransition] = field(default_factory=list)
+    errors: Dict[int, Exception] = field(default_factory=dict)
+
+
+class BackupInventory:
+    """Local SQLite mirror of the ``Backup`` rows of every client.
+
+    :meth:`sync` reads the server status once and refetches ``get_backups``
+    only for clients whose ``lastbackup``/``lastbackup_image`` changed, or
+    whose data is older than *max_age* seconds (default: a day), to pick
+    up deletions and archiving, which don't move those timestamps.  With
+    ``max_age=None`` such changes are only seen when a client's last
+    backup time changes.  Refetches run
+    concurrently through :func:`crawl_backups` with up to *max_workers*
+    requests in flight.
+    """
+
+    def __init__(
+        self,
+        server: Any,
+        path: str,
+        max_age: Optional[float] = 24 * 60 * 60,
+        max_workers: int = 16,
+    ) -> None:
+        self._server = server
+        self.max_age = max_age
+        self.max_workers = max_workers
+        self._db = sqlite3.connect(path)
+        self._db.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        self._db.close()
+
+    def _stale_clients(self, status: StatusResult) -> List[int]:
+        known = {
+            r[0]: r[1:]
+            for r in self._db.execute(
+                "SELECT clientid, lastbackup, lastbackup_image, synced_at FROM clients"
+            )
+        }
+        now = time.time()
+        stale = []
+        for c in status.status:
+            prev = known.get(c.id)
+            if (prev is None
+                    or prev[0] != str(c.lastbackup)
+                    or prev[1] != str(c.lastbackup_image)
+                    or (self.max_age is not None and now - prev[2] > self.max_age)):
+                stale.append(c.id)
+        return stale
+
+    def sync(self, status: Optional[StatusResult] = None) -> InventorySyncResult:
+        """Bring the mirror up to date.
+
+        *status* may be passed to reuse a status snapshot the caller
+        already has.
+        """
+        result = InventorySyncResult()
+        if status is None:
+            status = self._server.get_status_result()
+            if status is None:
+                return result
+
+        current = {c.id: c for c in status.status}
+        for (clientid,) in self._db.execute("SELECT clientid FROM clients").fetchall():
+            if clientid not in current:
+                self._drop_client(clientid)
+                result.removed_clients.append(clientid)
+
+        stale = self._stale_clients(status)
+        table = crawl_backups(self._server, stale, self.max_workers)
+        result.errors.update(table.errors)
+        fetched = table.by_client()
+        for clientid in stale:
+            if clientid in table.errors:
+                continue
+            c = current[clientid]
+            result.transitions += self._store(clientid, fetched.get(clientid, []))
+            with self._db:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO clients VALUES (?, ?, ?, ?, ?)",
+                    (clientid, c.name, str(c.lastbackup),
+                     str(c.lastbackup_image), time.time()),
+                )
+            result.refetched.append(clientid)
+        return result
+
+    def _drop_client(self, clientid: int) -> None:
+        with self._db:
+            self._db.execute("DELETE FROM backups WHERE clientid = ?", (clientid,))
+            self._db.execute("DELETE FROM clients WHERE clientid = ?", (clientid,))
+
+    def _store(
+        self,
+        clientid: int,
+        rows: List[Tuple[bool, Backup]],
+    ) -> List[BackupTransition]:
+        old = {
+            (bool(r[0]), r[1]): (r[2], r[3])
+            for r in self._db.execute(
+                "SELECT image, id, archived, delete_pending FROM backups"
+                " WHERE clientid = ?", (clientid,),
+            )
+        }
+        transitions: List[BackupTransition] = []
+        seen = set()
+        for image, b in rows:
+            key = (image, b.id)
+            seen.add(key)
+            prev = old.get(key)
+            if prev is None:
+                transitions.append(BackupTransition(clientid, b.id, image, "added"))
+                continue
+            if bool(prev[0]) != bool(b.archived):
+                transitions.append(BackupTransition(
+                    clientid, b.id, image, "archived", bool(prev[0]), bool(b.archived),
+                ))
+            if bool(prev[1]) != bool(b.delete_pending):
+                transitions.append(BackupTransition(
+                    clientid, b.id, image, "delete_pending",
+                    bool(prev[1]), bool(b.delete_pending),
+                ))
+        for image, backupid in old.keys() - seen:
+            transitions.append(BackupTransition(clientid, backupid, image, "removed"))
+
+        with self._db:
+            self._db.execute("DELETE FROM backups WHERE clientid = ?", (clientid,))
+            self._db.executemany(
+                "INSERT INTO backups (image, " + _COLUMNS + ")"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (int(image), b.id, clientid, b.size_bytes, b.incremental,
+                     b.archive_timeout, int(b.can_archive), b.backuptime,
+                     b.archived, b.disable_delete, b.delete_pending)
+                    for image, b in rows
+                ],
+            )
+        return transitions
+
+    # --- Queries -------------------------------------------------------
+
+    def backups(self, clientid: int, image: bool = False) -> List[Backup]:
+        """Return the mirrored file (or image) backups of one client."""
+        return [
+            _row_to_backup(r)
+            for r in self._db.execute(
+                "SELECT " + _COLUMNS + " FROM backups WHERE clientid = ?"
+                " AND image = ? ORDER BY backuptime",
+                (clientid, int(image)),
+            )
+        ]
+
+    def total_bytes_per_client(
+        self,
+        include_delete_pending: bool = False,
+    ) -> Dict[int, int]:
+        """Return the summed ``size_bytes`` of all backups per client ID."""
+        sql = "SELECT clientid, SUM(size_bytes) FROM backups"
+        if not include_delete_pending:
+            sql += " WHERE NOT COALESCE(delete_pending, 0)"
+        sql += " GROUP BY clientid"
+        return dict(self._db.execute(sql).fetchall())
+
+    def backups_older_than(
+        self,
+        timestamp: float,
+        image: Optional[bool] = None,
+    ) -> List[Backup]:
+        """Return backups made before *timestamp*, oldest first."""
+        sql = "SELECT " + _COLUMNS + " FROM backups WHERE backuptime < ?"
+        args: List[Any] = [timestamp]
+        if image is not None:
+            sql += " AND image = ?"
+            args.append(int(image))
+        sql += " ORDER BY backuptime"
+        return [_row_to_backup(r) for r in self._db.execute(sql, args)]
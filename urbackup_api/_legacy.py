@@ -295,7 +295,7 @@ class urbackup_server_legacy(_UrbackupServerBase):
 
         log = self._get_json("livelog", {
             "clientid": clientid,
-            "lastid": self._lastlogid,
+            "lastid": self._lastlogids.get(clientid, 0),
         })
 
         if not log:
@@ -304,7 +304,9 @@ class urbackup_server_legacy(_UrbackupServerBase):
         if "logdata" not in log:
             return None
 
-        self._lastlogid = log["logdata"][-1]['id']
+        if log["logdata"]:
+            self._lastlogid = log["logdata"][-1]['id']
+            self._lastlogids[clientid] = self._lastlogid
 
         return log["logdata"]
 
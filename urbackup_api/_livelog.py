@@ -0,0 +1,51 @@
+"""Tailing the live log of several clients at once."""
+
+from __future__ import annotations
+
+from typing import Any, Callable, Dict, Iterable, List, Tuple
+
+from ._common import LiveLogEntry
+from ._poll import _PollingPublisher
+
+LiveLogCallback = Callable[[int, LiveLogEntry], None]
+
+
+class LiveLogTail(_PollingPublisher):
+    """Poll ``livelog`` for several clients, each with its own cursor.
+
+    One background thread polls every client in *clientids* (``0`` is the
+    server's own log) and hands each new entry, as ``(clientid, entry)``,
+    to every subscriber.  Polling runs every *min_interval* seconds while
+    entries arrive and backs off to *max_interval* when the log is idle.
+
+    Subscribe with a callback (:meth:`subscribe`), iterate the tail, or
+    ``async for`` over :meth:`stream`.  Iterating starts the poller if it
+    is not running yet; :meth:`stop` ends all iterators.
+    """
+
+    _thread_name = "urbackup-livelog"
+
+    def __init__(
+        self,
+        server: Any,
+        clientids: Iterable[int] = (0,),
+        min_interval: float = 0.5,
+        max_interval: float = 10.0,
+    ) -> None:
+        super().__init__(min_interval, max_interval)
+        self._server = server
+        self.cursors: Dict[int, int] = {c: 0 for c in clientids}
+
+    def poll(self) -> List[Tuple[int, LiveLogEntry]]:
+        """Fetch new entries of every client once and advance the cursors."""
+        entries: List[Tuple[int, LiveLogEntry]] = []
+        for clientid, lastid in list(self.cursors.items()):
+            rows = self._server.get_livelog_since(clientid, lastid)
+            if not rows:
+                continue
+            self.cursors[clientid] = max(r.id for r in rows)
+            entries += [(clientid, r) for r in rows]
+        return entries
+
+    def _deliver(self, callback: LiveLogCallback, item: Tuple[int, LiveLogEntry]) -> None:
+        callback(*item)
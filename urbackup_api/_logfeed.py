@@ -0,0 +1,65 @@
+"""Incremental feed of new ``get_logs`` summaries."""
+
+from __future__ import annotations
+
+from typing import Any, Dict, List, Optional, Sequence
+
+from ._common import LogInfo, LogLevel, _load_json_state, _save_json_state
+
+
+def _filter_key(filter_clients: Optional[Sequence[int]], log_level: int) -> str:
+    clients = ",".join(str(c) for c in sorted(set(filter_clients or ())))
+    return f"{clients}|{int(log_level)}"
+
+
+class LogFeed:
+    """Return only the log summaries not seen by an earlier poll.
+
+    For every ``(filter_clients, log_level)`` combination the highest
+    ``LogInfo.id`` and ``time`` seen so far are kept in a JSON file at
+    *state_path*, so a cron job only handles the delta since its last run.
+    If every ID on the server is below the stored watermark (the server
+    database was reset) entries are compared by ``time`` instead.
+    """
+
+    def __init__(self, server: Any, state_path: str) -> None:
+        self._server = server
+        self.state_path = state_path
+        self.watermarks: Dict[str, Dict[str, int]] = _load_json_state(state_path, {})
+
+    def poll(
+        self,
+        filter_clients: Optional[Sequence[int]] = None,
+        log_level: LogLevel = LogLevel.INFO,
+        commit: bool = True,
+    ) -> Optional[List[LogInfo]]:
+        """Return new summaries, oldest first, or ``None`` if the call failed.
+
+        With *commit* the watermark is advanced and saved right away;
+        otherwise call :meth:`commit` once the entries are processed.
+        """
+        logs = self._server.get_logs(filter_clients, log_level)
+        if logs is None:
+            return None
+        mark = self.watermarks.get(_filter_key(filter_clients, log_level))
+        if mark is not None:
+            if logs and max(e.id for e in logs) < mark["id"]:
+                logs = [e for e in logs if e.time > mark["time"]]
+            else:
+                logs = [e for e in logs if e.id > mark["id"]]
+        logs.sort(key=lambda e: e.id)
+        if commit and logs:
+            self.commit(filter_clients, log_level, logs[-1])
+        return logs
+
+    def commit(
+        self,
+        filter_clients: Optional[Sequence[int]],
+        log_level: LogLevel,
+        last: LogInfo,
+    ) -> None:
+        """Record *last* as the newest processed summary of this filter."""
+        self.watermarks[_filter_key(filter_clients, log_level)] = {
+            "id": last.id, "time": last.time,
+        }
+        _save_json_state(self.state_path, self.watermarks)
@@ -0,0 +1,285 @@
+"""Local full-text index and error rollup over backup log rows."""
+
+from __future__ import annotations
+
+import re
+import sqlite3
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from ._cache import get_log_many
+from ._common import LogDataRow, LogInfo
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS logs (
+    logid INTEGER PRIMARY KEY,
+    client TEXT NOT NULL,
+    time INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS rows (
+    id INTEGER PRIMARY KEY,
+    logid INTEGER NOT NULL,
+    client TEXT NOT NULL,
+    level INTEGER NOT NULL,
+    time INTEGER NOT NULL,
+    message TEXT NOT NULL,
+    template INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS rows_time ON rows (time);
+CREATE TABLE IF NOT EXISTS postings (
+    token TEXT NOT NULL,
+    row INTEGER NOT NULL,
+    PRIMARY KEY (token, row)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS templates (
+    id INTEGER PRIMARY KEY,
+    text TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS template_counts (
+    template INTEGER NOT NULL,
+    client TEXT NOT NULL,
+    level INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    last_time INTEGER NOT NULL,
+    PRIMARY KEY (template, client, level)
+) WITHOUT ROWID;
+"""
+
+#: Number of logs fetched and indexed at a time by ``LogIndex.update``.
+_BATCH = 64
+
+_TOKEN = re.compile(r"\w+")
+_QUERY = re.compile(r'"([^"]*)"|(\S+)')
+_MASKS = [
+    (re.compile(r"(?:[A-Za-z]:)?[\\/][^\s\"',;:]+"), "<path>"),
+    (re.compile(r"\b0x[0-9a-fA-F]+\b|\b[0-9a-fA-F]{16,}\b"), "<hex>"),
+    (re.compile(r"\d+(?:[.,:]\d+)*"), "<num>"),
+]
+
+
+def _tokens(text: str) -> List[str]:
+    return _TOKEN.findall(text.lower())
+
+
+def log_template(message: str) -> str:
+    """Normalise *message* by masking paths, hex strings and numbers."""
+    for pattern, mask in _MASKS:
+        message = pattern.sub(mask, message)
+    return message
+
+
+@dataclass
+class LogHit:
+    """A log row matching a :meth:`LogIndex.search` query."""
+    logid: int = 0
+    client: str = ""
+    level: int = 0
+    time: int = 0
+    message: str = ""
+
+
+@dataclass
+class LogTemplateCount:
+    """How often one normalised message occurred."""
+    template: str = ""
+    count: int = 0
+    clients: int = 0
+    last_time: int = 0
+
+
+class LogIndex:
+    """SQLite inverted index over ``LogDataRow.message``.
+
+    Rows are added per log with :meth:`add_log` (or :meth:`update` from a
+    list of ``LogInfo``).  Every row is tokenised into a postings table for
+    :meth:`search`, and its normalised template is counted per client and
+    level as it is added, so :meth:`top_templates` never has to re-read the
+    logs.
+    """
+
+    def __init__(self, path: str) -> None:
+        self._db = sqlite3.connect(path)
+        self._db.executescript(_SCHEMA)
+        self._template_ids: Dict[str, int] = {}
+
+    def close(self) -> None:
+        self._db.close()
+
+    def indexed_logs(self) -> List[int]:
+        return [r[0] for r in self._db.execute("SELECT logid FROM logs ORDER BY logid")]
+
+    def _template_id(self, text: str, pending: Dict[str, int]) -> int:
+        """Return the id of template *text*, creating it if needed.
+
+        Ids created in the open transaction go to *pending*, which is
+        merged into the cache only after commit.
+        """
+        tid = self._template_ids.get(text)
+        if tid is None:
+            tid = pending.get(text)
+        if tid is None:
+            self._db.execute("INSERT OR IGNORE INTO templates (text) VALUES (?)", (text,))
+            tid = self._db.execute(
+                "SELECT id FROM templates WHERE text = ?", (text,),
+            ).fetchone()[0]
+            pending[text] = tid
+        return tid
+
+    def add_log(
+        self,
+        logid: int,
+        rows: Sequence[LogDataRow],
+        client: str = "",
+        time: int = 0,
+    ) -> bool:
+        """Index the rows of one log; returns ``False`` if it was indexed before."""
+        if self._db.execute("SELECT 1 FROM logs WHERE logid = ?", (logid,)).fetchone():
+            return False
+        counts: Dict[Tuple[int, int], List[int]] = {}
+        new_templates: Dict[str, int] = {}
+        with self._db:
+            self._db.execute("INSERT INTO logs VALUES (?, ?, ?)", (logid, client, time))
+            for r in rows:
+                tid = self._template_id(log_template(r.message), new_templates)
+                cur = self._db.execute(
+                    "INSERT INTO rows (logid, client, level, time, message, template)"
+                    " VALUES (?, ?, ?, ?, ?, ?)",
+                    (logid, client, r.level, r.time, r.message, tid),
+                )
+                rowid = cur.lastrowid
+                self._db.executemany(
+                    "INSERT OR IGNORE INTO postings VALUES (?, ?)",
+                    [(t, rowid) for t in set(_tokens(r.message))],
+                )
+                c = counts.setdefault((tid, r.level), [0, 0])
+                c[0] += 1
+                c[1] = max(c[1], r.time)
+            self._db.executemany(
+                "INSERT INTO template_counts VALUES (?, ?, ?, ?, ?)"
+                " ON CONFLICT (template, client, level) DO UPDATE SET"
+                " count = count + excluded.count,"
+                " last_time = MAX(last_time, excluded.last_time)",
+                [(tid, client, level, n, last)
+                 for (tid, level), (n, last) in counts.items()],
+            )
+        self._template_ids.update(new_templates)
+        return True
+
+    def update(
+        self,
+        source: Any,
+        logs: Iterable[LogInfo],
+        max_workers: int = 8,
+    ) -> int:
+        """Fetch and index every log in *logs* not indexed yet.
+
+        *source* is a server or a ``LogCache``.  Logs are fetched and
+        indexed :data:`_BATCH` at a time, so only one batch is held in
+        memory.  Returns the number of logs added.
+        """
+        known = set(self.indexed_logs())
+        todo = {info.id: info for info in logs if info.id not in known}
+        ids = list(todo)
+        added = 0
+        for start in range(0, len(ids), _BATCH):
+            batch = get_log_many(source, ids[start:start + _BATCH], max_workers)
+            for logid, rows in batch.items():
+                if rows is not None:
+                    info = todo[logid]
+                    added += self.add_log(logid, rows, info.name, info.time)
+        return added
+
+    @staticmethod
+    def _filters(
+        client: Optional[str],
+        min_level: Optional[int],
+        since: Optional[int],
+        until: Optional[int],
+    ) -> Tuple[str, List[Any]]:
+        sql = ""
+        args: List[Any] = []
+        if client is not None:
+            sql += " AND r.client = ?"
+            args.append(client)
+        if min_level is not None:
+            sql += " AND r.level >= ?"
+            args.append(int(min_level))
+        if since is not None:
+            sql += " AND r.time >= ?"
+            args.append(since)
+        if until is not None:
+            sql += " AND r.time < ?"
+            args.append(until)
+        return sql, args
+
+    def search(
+        self,
+        query: str,
+        client: Optional[str] = None,
+        min_level: Optional[int] = None,
+        since: Optional[int] = None,
+        until: Optional[int] = None,
+        limit: Optional[int] = 100,
+    ) -> List[LogHit]:
+        """Find rows containing every token of *query*, newest first.
+
+        Double-quoted parts of the query must appear as a phrase.  Results
+        can be restricted to a *client* name, a minimum level and a
+        ``[since, until)`` time range.
+        """
+        tokens: List[str] = []
+        phrases: List[str] = []
+        for phrase, word in _QUERY.findall(query):
+            if phrase:
+                phrases.append(phrase.lower())
+                tokens += _tokens(phrase)
+            else:
+                tokens += _tokens(word)
+        if not tokens:
+            return []
+
+        sql = (
+            "SELECT r.logid, r.client, r.level, r.time, r.message FROM rows r"
+            " WHERE r.id IN ("
+            + " INTERSECT ".join(
+                ["SELECT row FROM postings WHERE token = ?"] * len(set(tokens))
+            )
+            + ")"
+        )
+        args: List[Any] = sorted(set(tokens))
+        for phrase in phrases:
+            sql += " AND instr(lower(r.message), ?) > 0"
+            args.append(phrase)
+        where, extra = self._filters(client, min_level, since, until)
+        sql += where + " ORDER BY r.time DESC, r.id DESC"
+        args += extra
+        if limit is not None:
+            sql += " LIMIT ?"
+            args.append(limit)
+        return [LogHit(*r) for r in self._db.execute(sql, args)]
+
+    def top_templates(
+        self,
+        n: int = 10,
+        client: Optional[str] = None,
+        min_level: Optional[int] = None,
+    ) -> List[LogTemplateCount]:
+        """Return the *n* most frequent message templates.
+
+        Computed from counters maintained while indexing.
+        """
+        sql = (
+            "SELECT t.text, SUM(c.count), COUNT(DISTINCT c.client), MAX(c.last_time)"
+            " FROM template_counts c JOIN templates t ON t.id = c.template"
+            " WHERE 1"
+        )
+        args: List[Any] = []
+        if client is not None:
+            sql += " AND c.client = ?"
+            args.append(client)
+        if min_level is not None:
+            sql += " AND c.level >= ?"
+            args.append(int(min_level))
+        sql += " GROUP BY c.template ORDER BY SUM(c.count) DESC, t.text LIMIT ?"
+        args.append(n)
+        return [LogTemplateCount(*r) for r in self._db.execute(sql, args)]
@@ -0,0 +1,196 @@
+"""Shared helpers for components that poll the server."""
+
+from __future__ import annotations
+
+import abc
+import asyncio
+import queue
+import threading
+from typing import Any, AsyncIterator, Callable, Iterator, List, Optional, Tuple
+
+from ._base import logger
+
+_STOP = object()
+
+
+class _AdaptiveInterval:
+    """Polling interval that shrinks while data flows and grows while idle.
+
+    After a poll that returned something the interval drops back to
+    *minimum*; after each idle poll it is multiplied by *factor*, up to
+    *maximum*.
+    """
+
+    def __init__(self, minimum: float, maximum: float, factor: float = 2.0) -> None:
+        if minimum <= 0 or maximum < minimum:
+            raise ValueError("Need 0 < minimum <= maximum")
+        self.minimum = minimum
+        self.maximum = maximum
+        self.factor = factor
+        self.current = minimum
+
+    def update(self, active: bool) -> float:
+        """Record the outcome of a poll and return the delay until the next."""
+        if active:
+            self.current = self.minimum
+        else:
+            self.current = min(self.current * self.factor, self.maximum)
+        return self.current
+
+
+class _PollingPublisher(abc.ABC):
+    """Background poller that fans its items out to many subscribers.
+
+    Subclasses implement :meth:`poll`.  Items reach callbacks registered
+    with :meth:`subscribe`, every running iterator and every running
+    :meth:`stream`; iterating starts the poller if it is not running yet
+    and :meth:`stop` ends all iterators.  A stream whose event loop was
+    closed is dropped.
+    """
+
+    _thread_name = "urbackup-poll"
+
+    def __init__(self, min_interval: float, max_interval: float) -> None:
+        self._interval = _AdaptiveInterval(min_interval, max_interval)
+        self._subscribers: List[Callable[..., None]] = []
+        self._sinks: List[Tuple[Callable[[Any], None], Callable[[], None]]] = []
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @abc.abstractmethod
+    def poll(self) -> List[Any]:
+        """Fetch one snapshot from the server and return the new items."""
+
+    def _is_active(self, items: List[Any]) -> bool:
+        return bool(items)
+
+    def _deliver(self, callback: Callable[..., None], item: Any) -> None:
+        callback(item)
+
+    def __enter__(self) -> Any:
+        self.start()
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.stop()
+
+    def subscribe(self, callback: Callable[..., None]) -> Callable[[], None]:
+        """Call *callback* for every new item; returns an unsubscribe function."""
+        with self._lock:
+            self._subscribers.append(callback)
+
+        def unsubscribe() -> None:
+            with self._lock:
+                if callback in self._subscribers:
+                    self._subscribers.remove(callback)
+
+        return unsubscribe
+
+    def _add_sink(
+        self,
+        put: Callable[[Any], None],
+        stop: Callable[[], None],
+    ) -> Callable[[], None]:
+        sink = (put, stop)
+        with self._lock:
+            self._sinks.append(sink)
+
+        def remove() -> None:
+            with self._lock:
+                if sink in self._sinks:
+                    self._sinks.remove(sink)
+
+        return remove
+
+    def _call_sink(
+        self,
+        sink: Tuple[Callable[[Any], None], Callable[[], None]],
+        call: Callable[[], None],
+    ) -> None:
+        try:
+            call()
+        except RuntimeError as e:
+            # call_soon_threadsafe on an event loop that was closed.
+            logger.warning("Dropping a stream of %s: %r", type(self).__name__, e)
+            with self._lock:
+                if sink in self._sinks:
+                    self._sinks.remove(sink)
+
+    def _publish(self, items: List[Any]) -> None:
+        with self._lock:
+            subscribers = list(self._subscribers)
+            sinks = list(self._sinks)
+        for item in items:
+            for callback in subscribers:
+                try:
+                    self._deliver(callback, item)
+                except Exception:
+                    logger.exception("Subscriber of %s failed", type(self).__name__)
+            for sink in sinks:
+                self._call_sink(sink, lambda: sink[0](item))
+
+    def _run(self) -> None:
+        delay = self._interval.minimum
+        while not self._stopped.wait(delay):
+            try:
+                items = self.poll()
+            except Exception as e:
+                logger.warning("Polling in %s failed: %r", type(self).__name__, e)
+                items = []
+            self._publish(items)
+            delay = self._interval.update(self._is_active(items))
+        with self._lock:
+            sinks = list(self._sinks)
+        for sink in sinks:
+            self._call_sink(sink, sink[1])
+
+    def start(self) -> None:
+        """Start the background poller (no-op if it is already running)."""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._stopped.clear()
+            self._thread = threading.Thread(
+                target=self._run, name=self._thread_name, daemon=True,
+            )
+            self._thread.start()
+
+    def stop(self) -> None:
+        """Stop polling and end all running iterators and streams."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        self._stopped.set()
+        if thread is not None and thread is not threading.current_thread():
+            thread.join()
+
+    def __iter__(self) -> Iterator[Any]:
+        q: queue.SimpleQueue = queue.SimpleQueue()
+        remove = self._add_sink(q.put, lambda: q.put(_STOP))
+        self.start()
+        try:
+            while True:
+                item = q.get()
+                if item is _STOP:
+                    return
+                yield item
+        finally:
+            remove()
+
+    async def stream(self) -> AsyncIterator[Any]:
+        """Asynchronously iterate new items on the running event loop."""
+        loop = asyncio.get_running_loop()
+        q: asyncio.Queue = asyncio.Queue()
+        remove = self._add_sink(
+            lambda item: loop.call_soon_threadsafe(q.put_nowait, item),
+            lambda: loop.call_soon_threadsafe(q.put_nowait, _STOP),
+        )
+        self.start()
+        try:
+            while True:
+                item = await q.get()
+                if item is _STOP:
+                    return
+                yield item
+        finally:
+            remove()
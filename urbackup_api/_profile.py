@@ -0,0 +1,208 @@
+"""Phase-level profiling of API calls."""
+
+from __future__ import annotations
+
+import socket
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+#: Phases in the order they happen during one call.
+PHASES: Tuple[str, ...] = (
+    "connect", "tls", "send", "wait", "read", "decode", "parse", "build",
+)
+
+
+@dataclass
+class CallProfile:
+    """Timings (seconds) of one API call, split into phases.
+
+    *connect* is the TCP connect and *tls* the handshake on top of it,
+    *send* writes the request, *wait* lasts until the response headers
+    arrived (server think time), *read* transfers the body, *decode* and
+    *parse* are the UTF-8 decode and ``json.loads``, *build* the typed
+    ``from_dict`` step.  Phases of retried and hedged requests are
+    summed; *other* is whatever of *elapsed* is not covered by a phase.
+    """
+    action: str
+    sa: str = ""
+    started: float = 0.0
+    attempts: int = 0
+    phases: Dict[str, float] = field(default_factory=dict)
+    elapsed: float = 0.0
+    bytes_in: int = 0
+    error: str = ""
+
+    @property
+    def other(self) -> float:
+        return max(self.elapsed - sum(self.phases.values()), 0.0)
+
+    def add(self, phase: str, seconds: float) -> None:
+        self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+    def lap(self, phase: str, since: float) -> float:
+        """Add the time since *since* to *phase* and return the current time."""
+        now = time.perf_counter()
+        self.add(phase, now - since)
+        return now
+
+
+@dataclass
+class PhaseSummary:
+    """Aggregate of one phase over many calls."""
+    count: int = 0
+    total: float = 0.0
+    max: float = 0.0
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def add(self, seconds: float) -> None:
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+
+ProfileReport = Dict[Tuple[str, str], Dict[str, PhaseSummary]]
+
+
+def format_profile_report(report: ProfileReport) -> str:
+    """Render *report* as a text table, slowest action first.
+
+    Every phase is averaged over all calls of the row, including calls
+    without that phase, so the phases and *other* add up to *elapsed*.
+    """
+    columns = PHASES + ("other", "elapsed")
+    lines = [
+        f"{'action':<24} {'calls':>6} "
+        + " ".join(f"{c:>9}" for c in columns)
+    ]
+    ranked = sorted(
+        report.items(),
+        key=lambda kv: kv[1]["elapsed"].total if "elapsed" in kv[1] else 0.0,
+        reverse=True,
+    )
+    for (action, sa), phases in ranked:
+        name = f"{action}?sa={sa}" if sa else action
+        calls = phases["elapsed"].count if "elapsed" in phases else 0
+        cells = [
+            f"{phases[c].total / calls * 1000:9.2f}"
+            if c in phases and calls else f"{'-':>9}"
+            for c in columns
+        ]
+        lines.append(f"{name:<24} {calls:>6} " + " ".join(cells))
+    lines.append("(mean milliseconds per call)")
+    return "\n".join(lines) + "\n"
+
+
+def _connect(call: CallProfile, h: Any, https: bool) -> None:
+    """Open the socket of *h*, timing the TCP connect and TLS handshake."""
+    start = time.perf_counter()
+    context = getattr(h, "_context", None) if https else None
+    if https and context is None:
+        # Cannot wrap TLS ourselves: time the whole connect as one phase.
+        h.connect()
+        call.lap("connect", start)
+        return
+    sock = socket.create_connection((h.host, h.port), h.timeout, h.source_address)
+    try:
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    except OSError:
+        pass
+    t = call.lap("connect", start)
+    if context is not None:
+        try:
+            sock = context.wrap_socket(sock, server_hostname=h.host)
+        except BaseException:
+            sock.close()
+            raise
+        call.lap("tls", t)
+    h.sock = sock
+
+
+def _profiled_send(
+    call: CallProfile,
+    h: Any,
+    https: bool,
+    method: str,
+    url: str,
+    body: str,
+    headers: Dict[str, str],
+) -> float:
+    """Connect *h* and send one request, timing each phase.
+
+    Returns the time the request was sent, from which the caller times
+    the wait for the response headers.
+    """
+    _connect(call, h, https)
+    t = time.perf_counter()
+    h.request(method, url, body, headers)
+    return call.lap("send", t)
+
+
+class _Profiler:
+    """Collects :class:`CallProfile` records and per-phase aggregates."""
+
+    def __init__(self, keep: int = 1000) -> None:
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.calls: Deque[CallProfile] = deque(maxlen=keep)
+        self._report: ProfileReport = {}
+
+    def current(self) -> Optional[CallProfile]:
+        return getattr(self._local, "current", None)
+
+    def begin(self, action: str, params: Dict[str, Any]) -> CallProfile:
+        call = CallProfile(action, str(params.get("sa", "")), time.time())
+        call.elapsed = time.perf_counter()
+        self._local.current = call
+        self._local.last = None
+        return call
+
+    def end(self, call: CallProfile) -> None:
+        call.elapsed = time.perf_counter() - call.elapsed
+        self._local.current = None
+        self._local.last = call
+        with self._lock:
+            self.calls.append(call)
+            phases = self._report.setdefault((call.action, call.sa), {})
+            for name, seconds in call.phases.items():
+                phases.setdefault(name, PhaseSummary()).add(seconds)
+            phases.setdefault("other", PhaseSummary()).add(call.other)
+            phases.setdefault("elapsed", PhaseSummary()).add(call.elapsed)
+
+    def add_build(self, seconds: float) -> None:
+        """Attach the ``from_dict`` time to this thread's last finished call."""
+        call = getattr(self._local, "last", None)
+        if call is None:
+            return
+        self._local.last = None
+        with self._lock:
+            other = call.other
+            call.add("build", seconds)
+            call.elapsed += seconds
+            phases = self._report.setdefault((call.action, call.sa), {})
+            phases.setdefault("build", PhaseSummary()).add(seconds)
+            phases.setdefault("other", PhaseSummary()).total += call.other - other
+            elapsed = phases.setdefault("elapsed", PhaseSummary())
+            elapsed.total += seconds
+            if call.elapsed > elapsed.max:
+                elapsed.max = call.elapsed
+
+    def report(self) -> ProfileReport:
+        with self._lock:
+            return {
+                key: {
+                    name: PhaseSummary(s.count, s.total, s.max)
+                    for name, s in phases.items()
+                }
+                for key, phases in self._report.items()
+            }
+
+    def recent(self) -> List[CallProfile]:
+        with self._lock:
+            return list(self.calls)
@@ -0,0 +1,173 @@
+"""Typed events derived from successive ``get_progress`` snapshots."""
+
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass
+from enum import Enum
+from typing import Any, Dict, List, Optional, Tuple
+
+from ._common import (
+    ActivityItem,
+    ClientProcessActionTypes,
+    ProcessItem,
+    ProgressResult,
+)
+from ._poll import _PollingPublisher
+
+
+_A = ClientProcessActionTypes
+
+#: ``(restore, image, incremental)`` of the activity each process action
+#: leaves in ``lastacts``; ``None`` for incremental means either.
+_ACTIVITY_KINDS: Dict[int, Tuple[bool, bool, Optional[bool]]] = {
+    _A.INCR_FILE: (False, False, True),
+    _A.RESUME_INCR_FILE: (False, False, True),
+    _A.FULL_FILE: (False, False, False),
+    _A.RESUME_FULL_FILE: (False, False, False),
+    _A.INCR_IMAGE: (False, True, True),
+    _A.FULL_IMAGE: (False, True, False),
+    _A.RESTORE_FILE: (True, False, None),
+    _A.RESTORE_IMAGE: (True, True, None),
+}
+
+
+def _matches(p: ProcessItem, a: ActivityItem) -> bool:
+    kind = _ACTIVITY_KINDS.get(p.action)
+    if kind is None or a.clientid != p.clientid:
+        return False
+    restore, image, incremental = kind
+    return (bool(a.restore) == restore and bool(a.image) == image
+            and (incremental is None or bool(a.incremental) == incremental))
+
+
+class ProgressEventKind(str, Enum):
+    """What happened to a running process."""
+    STARTED = "started"
+    PROGRESS = "progress"
+    PAUSED = "paused"
+    RESUMED = "resumed"
+    FINISHED = "finished"
+    STOPPED = "stopped"
+
+
+@dataclass
+class ProgressEvent:
+    """A change to one running process, identified by ``(clientid, id)``.
+
+    For finished and stopped processes *process* is the last snapshot
+    seen; *activity* is the matching ``lastacts`` entry if one appeared.
+    """
+    kind: ProgressEventKind
+    process: ProcessItem
+    activity: Optional[ActivityItem] = None
+
+    @property
+    def key(self) -> Tuple[int, int]:
+        return self.process.clientid, self.process.id
+
+
+class ProgressWatcher(_PollingPublisher):
+    """Turn ``get_progress`` snapshots into :class:`ProgressEvent` objects.
+
+    Progress events of one process are emitted at most every
+    *progress_interval* seconds.  A backup or restore that disappears is
+    reported as finished if a new ``lastacts`` entry of the same client and
+    kind (file or image, full or incremental, backup or restore) showed up
+    in the same snapshot, and as stopped otherwise; deletions in
+    ``lastacts`` are ignored.  Other processes, and all processes without
+    last activities, are finished only if they had reached 100%.
+
+    :meth:`feed` processes a snapshot the caller already has.  Started,
+    the watcher polls on its own, every *min_interval* seconds while
+    processes run and backing off to *max_interval* when idle; events are
+    delivered to callbacks, iterators and :meth:`stream` like
+    :class:`LiveLogTail` entries.
+    """
+
+    _thread_name = "urbackup-progress"
+
+    def __init__(
+        self,
+        server: Any = None,
+        min_interval: float = 1.0,
+        max_interval: float = 30.0,
+        progress_interval: float = 5.0,
+        with_last_activities: bool = True,
+    ) -> None:
+        super().__init__(min_interval, max_interval)
+        self._server = server
+        self.progress_interval = progress_interval
+        self.with_last_activities = with_last_activities
+        self.running: Dict[Tuple[int, int], ProcessItem] = {}
+        self._reported: Dict[Tuple[int, int], float] = {}
+        self._last_activity: Optional[int] = None
+
+    def poll(self) -> List[ProgressEvent]:
+        snapshot = self._server.get_progress(self.with_last_activities)
+        if snapshot is None:
+            return []
+        return self.feed(snapshot)
+
+    def _is_active(self, items: List[ProgressEvent]) -> bool:
+        return bool(self.running)
+
+    def _new_activities(
+        self,
+        lastacts: Optional[List[ActivityItem]],
+    ) -> List[ActivityItem]:
+        if lastacts is None:
+            return []
+        first = self._last_activity is None
+        mark = self._last_activity or 0
+        self._last_activity = max((a.id for a in lastacts), default=mark)
+        if first:
+            return []
+        return sorted(
+            (a for a in lastacts if a.id > mark and not a.is_delete),
+            key=lambda a: a.id,
+        )
+
+    def feed(
+        self,
+        snapshot: ProgressResult,
+        now: Optional[float] = None,
+    ) -> List[ProgressEvent]:
+        """Compare *snapshot* with the previous one and return the events."""
+        if now is None:
+            now = time.monotonic()
+        events: List[ProgressEvent] = []
+        current = {(p.clientid, p.id): p for p in snapshot.progress}
+        activities = self._new_activities(snapshot.lastacts)
+
+        for key, p in current.items():
+            old = self.running.get(key)
+            if old is None:
+                events.append(ProgressEvent(ProgressEventKind.STARTED, p))
+                self._reported[key] = now
+                continue
+            if p.paused != old.paused:
+                kind = ProgressEventKind.PAUSED if p.paused else ProgressEventKind.RESUMED
+                events.append(ProgressEvent(kind, p))
+            elif ((p.done_bytes != old.done_bytes or p.pcdone != old.pcdone)
+                    and now - self._reported[key] >= self.progress_interval):
+                events.append(ProgressEvent(ProgressEventKind.PROGRESS, p))
+                self._reported[key] = now
+
+        for key in self.running.keys() - current.keys():
+            p = self.running[key]
+            del self._reported[key]
+            activity = next((a for a in activities if _matches(p, a)), None)
+            if activity is not None:
+                activities.remove(activity)
+            if snapshot.lastacts is None or p.action not in _ACTIVITY_KINDS:
+                # Without lastacts, or for processes that never leave an
+                # activity (cleanups, updates, ...), go by the last progress.
+                finished = p.pcdone >= 100
+            else:
+                finished = activity is not None
+            kind = ProgressEventKind.FINISHED if finished else ProgressEventKind.STOPPED
+            events.append(ProgressEvent(kind, p, activity))
+
+        self.running = current
+        return events
@@ -0,0 +1,174 @@
+"""Concurrent, verified download of whole directories from a backup."""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, BinaryIO, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from ._base import logger
+from ._common import BackupFile, _shahash_candidates
+from ._walk import walk_backup
+
+_CHUNK = 1024 * 1024
+
+
+class _HashingWriter:
+    """File-like object that hashes everything written through it."""
+
+    def __init__(self, f: BinaryIO, algos: Iterable[str]) -> None:
+        self._f = f
+        self.hashers = {a: hashlib.new(a) for a in algos}
+        self.size = 0
+
+    def write(self, b: bytes) -> int:
+        for h in self.hashers.values():
+            h.update(b)
+        self.size += len(b)
+        return self._f.write(b)
+
+
+def _digest_matches(
+    hashers: Dict[str, Any],
+    candidates: Sequence[Tuple[str, bytes]],
+) -> bool:
+    return any(hashers[algo].digest() == digest for algo, digest in candidates)
+
+
+def _file_matches(path: str, candidates: Sequence[Tuple[str, bytes]]) -> bool:
+    """Return whether the local file at *path* has one of the expected digests."""
+    hashers = {a: hashlib.new(a) for a, _ in candidates}
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(_CHUNK), b""):
+            for h in hashers.values():
+                h.update(chunk)
+    return _digest_matches(hashers, candidates)
+
+
+@dataclass
+class RestoreResult:
+    """Outcome of :func:`download_tree`, as lists of backup paths."""
+    downloaded: List[str] = field(default_factory=list)
+    skipped: List[str] = field(default_factory=list)
+    unverified: List[str] = field(default_factory=list)
+    failed: List[str] = field(default_factory=list)
+    bytes_downloaded: int = 0
+
+    @property
+    def ok(self) -> bool:
+        return not self.failed
+
+
+def _restore_file(
+    server: Any,
+    clientid: int,
+    backupid: int,
+    remote: str,
+    local: str,
+    entry: BackupFile,
+    verify: bool,
+) -> Tuple[str, int]:
+    candidates = _shahash_candidates(entry.shahash) if verify else []
+
+    if os.path.isfile(local):
+        if candidates:
+            if _file_matches(local, candidates):
+                return "skipped", 0
+        elif (entry.size is not None
+                and os.path.getsize(local) == entry.size
+                and int(os.path.getmtime(local)) == entry.mod):
+            return "skipped", 0
+
+    tmp = local + ".part"
+    with open(tmp, "wb") as f:
+        writer = _HashingWriter(f, {a for a, _ in candidates})
+        ok = server.download_backup_file_to(clientid, backupid, remote, writer)
+    if not ok:
+        os.remove(tmp)
+        logger.error("Downloading %s failed", remote)
+        return "failed", 0
+    if candidates and not _digest_matches(writer.hashers, candidates):
+        os.remove(tmp)
+        logger.error("Hash mismatch for %s", remote)
+        return "failed", writer.size
+
+    os.replace(tmp, local)
+    if entry.mod:
+        os.utime(local, (entry.access or entry.mod, entry.mod))
+    if verify and not candidates:
+        return "unverified", writer.size
+    return "downloaded", writer.size
+
+
+def download_tree(
+    server: Any,
+    clientid: int,
+    backupid: int,
+    path: str,
+    dest: str,
+    max_workers: int = 4,
+    verify: bool = True,
+    source: Any = None,
+) -> RestoreResult:
+    """Download the directory *path* of a file backup into *dest*.
+
+    The tree is walked, files are streamed to disk by up to *max_workers*
+    concurrent downloads, and each file is hashed while it is written and
+    compared with its ``shahash``.  Files are written to ``*.part`` first
+    and only moved into place once verified.  Local files that already
+    match (by hash, or by size and mtime when there is no usable hash) are
+    skipped, so an interrupted restore can simply be run again.
+
+    Listings are read from *source* (default: *server*).  Files whose
+    ``shahash`` is missing or not a plain digest end up in
+    ``RestoreResult.unverified``.  Entries whose name would escape *dest*
+    (``..``, empty or ``.`` components) are not restored and reported in
+    ``RestoreResult.failed``.
+    """
+    base = path.rstrip("/")
+    result = RestoreResult()
+    lock = threading.Lock()
+    # Bounds the number of queued downloads, and with it the memory used.
+    slots = threading.BoundedSemaphore(max_workers * 2)
+
+    def local_path(remote: str) -> Optional[str]:
+        parts = remote[len(base):].lstrip("/").split("/")
+        if any(p in ("", ".", "..") for p in parts):
+            return None
+        return os.path.join(dest, *parts)
+
+    def fetch(remote: str, local: str, entry: BackupFile) -> None:
+        try:
+            status, nbytes = _restore_file(
+                server, clientid, backupid, remote, local, entry, verify,
+            )
+        except Exception:
+            logger.exception("Restoring %s failed", remote)
+            status, nbytes = "failed", 0
+        finally:
+            slots.release()
+        with lock:
+            getattr(result, status).append(remote)
+            result.bytes_downloaded += nbytes
+
+    os.makedirs(dest, exist_ok=True)
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        for remote, entry in walk_backup(
+            source if source is not None else server,
+            clientid, backupid, path or "/", max_workers=max_workers,
+        ):
+            local = local_path(remote)
+            if local is None:
+                logger.error("Refusing to restore unsafe path %r", remote)
+                with lock:
+                    result.failed.append(remote)
+                continue
+            if entry.dir:
+                os.makedirs(local, exist_ok=True)
+                continue
+            slots.acquire()
+            pool.submit(fetch, remote, local, entry)
+    return result
@@ -0,0 +1,215 @@
+"""Client-side retention policies evaluated over the whole fleet."""
+
+from __future__ import annotations
+
+import datetime
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from ._base import logger
+from ._common import Backup, Backups
+from ._crawl import BackupTable
+
+_DELETE = "delete"
+_ARCHIVE = "archive"
+
+
+@dataclass
+class RetentionPolicy:
+    """Which backups to keep, in addition to the server's own rules.
+
+    Each ``keep_*`` rule keeps the newest backup of that many of the most
+    recent days, ISO weeks, months or years that contain a backup;
+    ``keep_last`` keeps the newest N backups outright.  A backup kept by any
+    rule is kept, and the newest backup of each client's file and image
+    series is always kept.  At least one ``keep_*`` rule must be set.
+    Archived backups are always kept when *keep_archived* is set, and
+    backups the server refuses to delete (``disable_delete``) or that are
+    already ``delete_pending`` are never planned.
+
+    With *archive_monthly* the backups kept by the monthly rule are also
+    archived.  Image backups are only considered with *include_images*;
+    file and image backups are evaluated independently.
+    """
+    keep_last: int = 0
+    keep_daily: int = 0
+    keep_weekly: int = 0
+    keep_monthly: int = 0
+    keep_yearly: int = 0
+    keep_archived: bool = True
+    archive_monthly: bool = False
+    include_images: bool = False
+
+
+@dataclass
+class RetentionAction:
+    """One planned change to a backup."""
+    clientid: int
+    backupid: int
+    action: str
+    image: bool = False
+    size_bytes: int = 0
+    backuptime: int = 0
+
+
+@dataclass
+class RetentionPlan:
+    """Dry-run result of :func:`plan_retention`."""
+    actions: List[RetentionAction] = field(default_factory=list)
+
+    @property
+    def bytes_freed(self) -> int:
+        """Total size of all backups the plan would delete."""
+        return sum(a.size_bytes for a in self.actions if a.action == _DELETE)
+
+    def by_client(self) -> Dict[int, List[RetentionAction]]:
+        groups: Dict[int, List[RetentionAction]] = {}
+        for a in self.actions:
+            groups.setdefault(a.clientid, []).append(a)
+        return groups
+
+
+@dataclass
+class RetentionOutcome:
+    """Result of applying one :class:`RetentionAction`."""
+    action: RetentionAction
+    ok: bool
+    error: str = ""
+
+
+def _iso_week(t: time.struct_time) -> Tuple[int, ...]:
+    year, week, _ = datetime.date(t.tm_year, t.tm_mon, t.tm_mday).isocalendar()
+    return year, week
+
+
+_PERIODS: List[Tuple[str, Callable[[time.struct_time], Tuple[int, ...]]]] = [
+    ("keep_daily", lambda t: (t.tm_year, t.tm_yday)),
+    ("keep_weekly", _iso_week),
+    ("keep_monthly", lambda t: (t.tm_year, t.tm_mon)),
+    ("keep_yearly", lambda t: (t.tm_year,)),
+]
+
+
+def _newest_per_period(
+    backups: List[Backup],
+    count: int,
+    key: Callable[[time.struct_time], Tuple[int, ...]],
+) -> Set[int]:
+    kept: Set[int] = set()
+    seen: Set[Tuple[int, ...]] = set()
+    for b in backups:
+        period = key(time.localtime(b.backuptime))
+        if period in seen:
+            continue
+        if len(seen) >= count:
+            break
+        seen.add(period)
+        kept.add(b.id)
+    return kept
+
+
+def _plan_series(
+    policy: RetentionPolicy,
+    clientid: int,
+    image: bool,
+    backups: List[Backup],
+) -> List[RetentionAction]:
+    backups = sorted(backups, key=lambda b: b.backuptime, reverse=True)
+    keep = {b.id for b in backups[:max(policy.keep_last, 1)]}
+    monthly: Set[int] = set()
+    for name, key in _PERIODS:
+        count = getattr(policy, name)
+        if count > 0:
+            kept = _newest_per_period(backups, count, key)
+            keep |= kept
+            if name == "keep_monthly":
+                monthly = kept
+
+    actions = []
+    for b in backups:
+        if b.delete_pending:
+            continue
+        if policy.archive_monthly and b.id in monthly and not b.archived:
+            actions.append(RetentionAction(
+                clientid, b.id, _ARCHIVE, image, b.size_bytes, b.backuptime,
+            ))
+        if (b.id in keep or b.disable_delete
+                or (policy.keep_archived and b.archived)):
+            continue
+        actions.append(RetentionAction(
+            clientid, b.id, _DELETE, image, b.size_bytes, b.backuptime,
+        ))
+    return actions
+
+
+def plan_retention(policy: RetentionPolicy, table: BackupTable) -> RetentionPlan:
+    """Evaluate *policy* over a fleet-wide ``BackupTable`` in one pass.
+
+    Nothing is changed on the server; apply the plan with
+    :func:`apply_retention`.  Raises ``ValueError`` if *policy* has no
+    ``keep_*`` rule, which would otherwise plan to delete everything.
+    """
+    if not any(getattr(policy, name) > 0
+               for name in ["keep_last"] + [name for name, _ in _PERIODS]):
+        raise ValueError("RetentionPolicy needs at least one keep_* rule")
+    series: Dict[Tuple[int, bool], List[Backup]] = {}
+    for image, b in table.rows():
+        if image and not policy.include_images:
+            continue
+        series.setdefault((b.clientid, image), []).append(b)
+    plan = RetentionPlan()
+    for (clientid, image), backups in sorted(series.items()):
+        plan.actions += _plan_series(policy, clientid, image, backups)
+    return plan
+
+
+def _confirmed(action: RetentionAction, result: Optional[Backups]) -> bool:
+    if result is None:
+        return False
+    rows = result.backup_images if action.image else result.backups
+    # The newest backup is never planned, so a real list is never empty;
+    # an empty or missing one means the response did not include it.
+    if not rows:
+        return False
+    for b in rows:
+        if b.id == action.backupid:
+            if action.action == _DELETE:
+                return bool(b.delete_pending)
+            return bool(b.archived)
+    # A deleted backup may already be gone from the list.
+    return action.action == _DELETE
+
+
+def apply_retention(
+    server: Any,
+    plan: RetentionPlan,
+    max_workers: int = 8,
+) -> List[RetentionOutcome]:
+    """Execute *plan* and confirm every action from the returned ``Backups``.
+
+    Clients are processed in parallel by up to *max_workers* threads; the
+    actions of one client run one after another, archives first.
+    """
+
+    def run_client(actions: List[RetentionAction]) -> List[RetentionOutcome]:
+        outcomes = []
+        for a in sorted(actions, key=lambda a: a.action != _ARCHIVE):
+            call = server.archive_backup if a.action == _ARCHIVE else server.delete_backup
+            try:
+                result = call(a.clientid, a.backupid)
+            except Exception as e:
+                logger.warning("Retention %s of backup %s failed: %r",
+                               a.action, a.backupid, e)
+                outcomes.append(RetentionOutcome(a, False, repr(e)))
+                continue
+            ok = _confirmed(a, result)
+            outcomes.append(RetentionOutcome(a, ok, "" if ok else "not confirmed"))
+        return outcomes
+
+    outcomes: List[RetentionOutcome] = []
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        for client_outcomes in pool.map(run_client, plan.by_client().values()):
+            outcomes += client_outcomes
+    return outcomes
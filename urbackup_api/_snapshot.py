@@ -0,0 +1,426 @@
+"""Compact binary snapshots of the typed result dataclasses.
+
+A snapshot is a small, versioned, self-describing binary encoding of any
+dataclass from ``_common`` (or a list of them).  Lists of dataclasses are
+stored column by column; integer and float columns are stored as aligned
+little-endian arrays so they can be read straight out of an ``mmap`` without
+copying.
+
+Decoding is schema-tolerant in the same way as ``_from_dict``: fields that
+are unknown to the current dataclass definition are dropped and missing
+fields keep their defaults.
+"""
+
+from __future__ import annotations
+
+import dataclasses
+import mmap
+import struct
+import sys
+from array import array
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from . import _common
+
+SNAPSHOT_MAGIC = b"UBSN"
+SNAPSHOT_VERSION = 1
+
+BytesLike = Union[bytes, bytearray, memoryview, mmap.mmap]
+
+# Value tags
+_T_NONE = 0x00
+_T_FALSE = 0x01
+_T_TRUE = 0x02
+_T_INT = 0x03
+_T_BIGINT = 0x04
+_T_FLOAT = 0x05
+_T_STR = 0x06
+_T_LIST = 0x07
+_T_DICT = 0x08
+_T_RECORD = 0x09
+_T_TABLE = 0x0A
+
+# Column kinds inside a table
+_C_INT64 = 0x01
+_C_FLOAT64 = 0x02
+_C_BOOL = 0x03
+_C_ANY = 0x04
+_C_STR = 0x05
+_C_NULLS = 0x80  # flag: a per-row null mask precedes the column data
+
+_INT64_MIN = -(1 << 63)
+_INT64_MAX = (1 << 63) - 1
+
+_HEADER = struct.Struct("<4sHH")
+_U8 = struct.Struct("<B")
+_U16 = struct.Struct("<H")
+_U32 = struct.Struct("<I")
+_I64 = struct.Struct("<q")
+_F64 = struct.Struct("<d")
+
+_LITTLE_ENDIAN = sys.byteorder == "little"
+
+_TYPES: Dict[str, type] = {
+    obj.__name__: obj
+    for obj in vars(_common).values()
+    if isinstance(obj, type) and dataclasses.is_dataclass(obj)
+}
+
+
+class SnapshotFormatError(Exception):
+    """Snapshot data is corrupt or was written by an unsupported version."""
+
+
+# ---------------------------------------------------------------------------
+# Encoding
+# ---------------------------------------------------------------------------
+
+
+def _is_record_list(value: List[Any]) -> bool:
+    if not value or not dataclasses.is_dataclass(value[0]):
+        return False
+    cls = type(value[0])
+    return all(type(v) is cls for v in value)
+
+
+def _column_kind(values: List[Any]) -> int:
+    present = [v for v in values if v is not None]
+    nulls = _C_NULLS if len(present) != len(values) else 0
+    if not present:
+        return _C_ANY
+    if all(type(v) is bool for v in present):
+        return _C_BOOL | nulls
+    if all(
+        isinstance(v, int) and not isinstance(v, bool)
+        and _INT64_MIN <= v <= _INT64_MAX
+        for v in present
+    ):
+        return _C_INT64 | nulls
+    if all(type(v) is float for v in present):
+        return _C_FLOAT64 | nulls
+    if all(isinstance(v, str) for v in present):
+        return _C_STR | nulls
+    return _C_ANY
+
+
+class _Writer:
+
+    def __init__(self) -> None:
+        self.buf = bytearray()
+
+    def text(self, s: str) -> None:
+        b = s.encode("utf-8", "surrogatepass")
+        self.buf += _U32.pack(len(b))
+        self.buf += b
+
+    def align(self, n: int = 8) -> None:
+        self.buf += b"\0" * (-len(self.buf) % n)
+
+    def value(self, v: Any) -> None:
+        buf = self.buf
+        if v is None:
+            buf.append(_T_NONE)
+        elif v is True:
+            buf.append(_T_TRUE)
+        elif v is False:
+            buf.append(_T_FALSE)
+        elif isinstance(v, int):
+            if _INT64_MIN <= v <= _INT64_MAX:
+                buf.append(_T_INT)
+                buf += _I64.pack(v)
+            else:
+                buf.append(_T_BIGINT)
+                self.text(str(int(v)))
+        elif isinstance(v, float):
+            buf.append(_T_FLOAT)
+            buf += _F64.pack(v)
+        elif isinstance(v, str):
+            buf.append(_T_STR)
+            self.text(v)
+        elif dataclasses.is_dataclass(v) and not isinstance(v, type):
+            self.record(v)
+        elif isinstance(v, (list, tuple)):
+            if _is_record_list(list(v)):
+                self.table(list(v))
+            else:
+                buf.append(_T_LIST)
+                buf += _U32.pack(len(v))
+                for item in v:
+                    self.value(item)
+        elif isinstance(v, dict):
+            buf.append(_T_DICT)
+            buf += _U32.pack(len(v))
+            for key, item in v.items():
+                self.text(str(key))
+                self.value(item)
+        else:
+            raise TypeError(f"Cannot snapshot value of type {type(v).__name__}")
+
+    def record(self, obj: Any) -> None:
+        fields = dataclasses.fields(obj)
+        self.buf.append(_T_RECORD)
+        self.text(type(obj).__name__)
+        self.buf += _U16.pack(len(fields))
+        for f in fields:
+            self.text(f.name)
+            self.value(getattr(obj, f.name))
+
+    def table(self, rows: List[Any]) -> None:
+        fields = dataclasses.fields(rows[0])
+        self.buf.append(_T_TABLE)
+        self.text(type(rows[0]).__name__)
+        self.buf += _U32.pack(len(rows))
+        self.buf += _U16.pack(len(fields))
+        for f in fields:
+            values = [getattr(r, f.name) for r in rows]
+            kind = _column_kind(values)
+            self.text(f.name)
+            self.buf.append(kind)
+            if kind & _C_NULLS:
+                self.buf += bytes(v is None for v in values)
+                kind &= ~_C_NULLS
+                fill = {_C_BOOL: False, _C_STR: ""}.get(kind, 0)
+                values = [fill if v is None else v for v in values]
+            if kind == _C_INT64 or kind == _C_FLOAT64:
+                self.array("q" if kind == _C_INT64 else "d", values)
+            elif kind == _C_BOOL:
+                self.buf += bytes(values)
+            elif kind == _C_STR:
+                offsets = [0]
+                total = 0
+                for v in values:
+                    total += len(v)
+                    offsets.append(total)
+                self.array("q", offsets)
+                self.text("".join(values))
+            else:
+                for v in values:
+                    self.value(v)
+
+    def array(self, fmt: str, values: List[Any]) -> None:
+        col = array(fmt, values)
+        if not _LITTLE_ENDIAN:
+            col.byteswap()
+        self.align()
+        self.buf += col.tobytes()
+
+
+def to_bytes(obj: Any) -> bytes:
+    """Encode a typed result (or a list of them) as a binary snapshot."""
+    w = _Writer()
+    w.buf += _HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, 0)
+    w.value(obj)
+    return bytes(w.buf)
+
+
+# ---------------------------------------------------------------------------
+# Decoding
+# ---------------------------------------------------------------------------
+
+
+def _build(cls: Optional[type], values: Dict[str, Any]) -> Any:
+    if cls is None:
+        return values
+    known = {f.name for f in dataclasses.fields(cls)}
+    return cls(**{k: v for k, v in values.items() if k in known})
+
+
+def _build_rows(cls: Optional[type], nrows: int, cols: Dict[str, List[Any]]) -> List[Any]:
+    if cls is not None:
+        names = [f.name for f in dataclasses.fields(cls)]
+        cols = {k: v for k, v in cols.items() if k in names}
+    keys = list(cols)
+    if not keys:
+        rows: List[Dict[str, Any]] = [{} for _ in range(nrows)]
+    else:
+        rows = [dict(zip(keys, row)) for row in zip(*cols.values())]
+    if cls is None:
+        return rows
+    if len(keys) != len(names):
+        return [cls(**row) for row in rows]
+    # Every field is present, so ``__init__`` has nothing left to fill in.
+    new = object.__new__
+    out = []
+    for row in rows:
+        obj = new(cls)
+        obj.__dict__ = row
+        out.append(obj)
+    return out
+
+
+class _Reader:
+
+    def __init__(self, data: BytesLike) -> None:
+        self.mv = memoryview(data).cast("B")
+        self.pos = 0
+
+    def take(self, n: int) -> memoryview:
+        start = self.pos
+        end = start + n
+        if end > len(self.mv):
+            raise SnapshotFormatError("Truncated snapshot")
+        self.pos = end
+        return self.mv[start:end]
+
+    def unpack(self, s: struct.Struct) -> Any:
+        return s.unpack(self.take(s.size))[0]
+
+    def text(self) -> str:
+        n = self.unpack(_U32)
+        return str(self.take(n), "utf-8", "surrogatepass")
+
+    def align(self, n: int = 8) -> None:
+        self.pos += -self.pos % n
+
+    def value(self) -> Any:
+        tag = self.unpack(_U8)
+        if tag == _T_NONE:
+            return None
+        if tag == _T_TRUE:
+            return True
+        if tag == _T_FALSE:
+            return False
+        if tag == _T_INT:
+            return self.unpack(_I64)
+        if tag == _T_BIGINT:
+            return int(self.text())
+        if tag == _T_FLOAT:
+            return self.unpack(_F64)
+        if tag == _T_STR:
+            return self.text()
+        if tag == _T_LIST:
+            return [self.value() for _ in range(self.unpack(_U32))]
+        if tag == _T_DICT:
+            n = self.unpack(_U32)
+            d: Dict[str, Any] = {}
+            for _ in range(n):
+                key = self.text()
+                d[key] = self.value()
+            return d
+        if tag == _T_RECORD:
+            name = self.text()
+            values: Dict[str, Any] = {}
+            for _ in range(self.unpack(_U16)):
+                key = self.text()
+                values[key] = self.value()
+            return _build(_TYPES.get(name), values)
+        if tag == _T_TABLE:
+            name, nrows, columns = self.table_columns()
+            return _build_rows(_TYPES.get(name), nrows, {
+                k: (v.tolist() if isinstance(v, memoryview) else v)
+                for k, v in columns.items()
+            })
+        raise SnapshotFormatError(f"Unknown value tag 0x{tag:02x}")
+
+    def array(self, fmt: str, n: int) -> memoryview:
+        self.align()
+        raw = self.take(8 * n)
+        if _LITTLE_ENDIAN:
+            return raw.cast(fmt)
+        col = array(fmt, raw)
+        col.byteswap()
+        return memoryview(col)
+
+    def table_columns(self) -> Tuple[str, int, Dict[str, Any]]:
+        name = self.text()
+        nrows = self.unpack(_U32)
+        ncols = self.unpack(_U16)
+        columns: Dict[str, Any] = {}
+        for _ in range(ncols):
+            key = self.text()
+            kind = self.unpack(_U8)
+            mask = None
+            if kind & _C_NULLS:
+                mask = bytes(self.take(nrows))
+                kind &= ~_C_NULLS
+            col: Any
+            if kind == _C_INT64 or kind == _C_FLOAT64:
+                col = self.array("q" if kind == _C_INT64 else "d", nrows)
+            elif kind == _C_BOOL:
+                col = [b != 0 for b in self.take(nrows)]
+            elif kind == _C_STR:
+                offsets = self.array("q", nrows + 1).tolist()
+                blob = self.text()
+                col = [blob[a:b] for a, b in zip(offsets, offsets[1:])]
+            elif kind == _C_ANY:
+                col = [self.value() for _ in range(nrows)]
+            else:
+                raise SnapshotFormatError(f"Unknown column kind 0x{kind:02x}")
+            if mask is not None:
+                if isinstance(col, memoryview):
+                    col = col.tolist()
+                col = [None if m else v for m, v in zip(mask, col)]
+            columns[key] = col
+        return name, nrows, columns
+
+    def header(self) -> None:
+        magic, version, _flags = _HEADER.unpack(self.take(_HEADER.size))
+        if magic != SNAPSHOT_MAGIC:
+            raise SnapshotFormatError("Not an urbackup_api snapshot")
+        if version > SNAPSHOT_VERSION:
+            raise SnapshotFormatError(
+                f"Snapshot version {version} is newer than supported "
+                f"version {SNAPSHOT_VERSION}"
+            )
+
+
+def from_bytes(data: BytesLike, cls: Optional[type] = None) -> Any:
+    """Decode a snapshot produced by :func:`to_bytes`.
+
+    If *cls* is given, the decoded root object must be an instance of it
+    (or, for list snapshots, a list of it); otherwise ``SnapshotFormatError``
+    is raised.
+    """
+    r = _Reader(data)
+    r.header()
+    obj = r.value()
+    if cls is not None:
+        sample = obj[0] if isinstance(obj, list) and obj else obj
+        if not (isinstance(obj, list) and not obj) and not isinstance(sample, cls):
+            raise SnapshotFormatError(
+                f"Snapshot contains {type(sample).__name__}, expected {cls.__name__}"
+            )
+    return obj
+
+
+def snapshot_columns(data: BytesLike, attribute: Optional[str] = None) -> Dict[str, Any]:
+    """Return the columns of a table section without building any objects.
+
+    *attribute* names the list field of the root record holding the table
+    (e.g. ``"status"`` for a ``StatusResult`` or ``"files"`` for a
+    ``FilesResult``); leave it ``None`` for snapshots of a plain list.
+    Integer and float columns without missing values are returned as
+    ``memoryview`` objects that reference *data* directly, so they are
+    zero-copy when *data* is an ``mmap``; all other columns are lists.
+    """
+    r = _Reader(data)
+    r.header()
+    tag = r.unpack(_U8)
+    if attribute is None:
+        if tag != _T_TABLE:
+            raise SnapshotFormatError("Snapshot root is not a table")
+        return r.table_columns()[2]
+    if tag != _T_RECORD:
+        raise SnapshotFormatError("Snapshot root is not a record")
+    r.text()
+    for _ in range(r.unpack(_U16)):
+        key = r.text()
+        if key == attribute:
+            if r.unpack(_U8) != _T_TABLE:
+                return {}
+            return r.table_columns()[2]
+        r.value()
+    raise KeyError(attribute)
+
+
+def save_snapshot(obj: Any, path: str) -> None:
+    """Write *obj* as a binary snapshot to *path*."""
+    with open(path, "wb") as f:
+        f.write(to_bytes(obj))
+
+
+def load_snapshot(path: str, cls: Optional[type] = None) -> Any:
+    """Load a snapshot file written by :func:`save_snapshot` via ``mmap``."""
+    with open(path, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+            return from_bytes(m, cls)
@@ -0,0 +1,193 @@
+"""Per-action request statistics for the server transport."""
+
+from __future__ import annotations
+
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from ._base import logger
+
+try:
+    from opentelemetry import trace as _otel_trace
+except ImportError:  # pragma: no cover - optional dependency
+    _otel_trace = None
+
+#: Upper bounds (seconds) of the latency histogram buckets.
+LATENCY_BUCKETS: Tuple[float, ...] = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0,
+)
+
+
+class LatencyHistogram:
+    """Cumulative-free latency histogram with fixed bucket bounds."""
+
+    def __init__(self, bounds: Tuple[float, ...] = LATENCY_BUCKETS) -> None:
+        self.bounds = bounds
+        self.counts = array("q", bytes(8 * (len(bounds) + 1)))
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, seconds: float) -> None:
+        self.counts[bisect_left(self.bounds, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Estimate the *q* quantile by interpolating inside its bucket."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if n and seen + n >= rank:
+                lo = self.bounds[i - 1] if i > 0 else 0.0
+                if i == len(self.bounds):
+                    return lo
+                return lo + (self.bounds[i] - lo) * max(rank - seen, 0) / n
+            seen += n
+        return self.bounds[-1]
+
+    def copy(self) -> LatencyHistogram:
+        h = LatencyHistogram(self.bounds)
+        h.counts = array("q", self.counts)
+        h.count = self.count
+        h.sum = self.sum
+        return h
+
+
+@dataclass
+class ActionStats:
+    """Counters of one ``(action, sa)`` pair.
+
+    *requests* counts HTTP requests, *calls* counts API calls (a call
+    retried twice is one call and three requests).
+    """
+    action: str
+    sa: str = ""
+    calls: int = 0
+    requests: int = 0
+    retries: int = 0
+    errors: int = 0
+    status_codes: Dict[int, int] = field(default_factory=dict)
+    bytes_out: int = 0
+    bytes_in: int = 0
+    latency: LatencyHistogram = field(default_factory=LatencyHistogram)
+
+
+@dataclass
+class RequestRecord:
+    """One finished API call, as passed to request hooks."""
+    action: str
+    sa: str
+    attempts: int
+    status: Optional[int]
+    latency: float
+    bytes_in: int
+    error: str = ""
+
+
+RequestHook = Callable[[RequestRecord], None]
+
+
+class _CallTrace:
+    __slots__ = ("action", "sa", "start", "attempts", "status", "bytes_in",
+                 "error", "span")
+
+    def __init__(self, action: str, sa: str, span: Any) -> None:
+        self.action = action
+        self.sa = sa
+        self.start = time.perf_counter()
+        self.attempts = 0
+        self.status: Optional[int] = None
+        self.bytes_in = 0
+        self.error = ""
+        self.span = span
+
+
+class _Instrumentation:
+    """Collects :class:`ActionStats` and feeds hooks and tracing spans."""
+
+    def __init__(self, opentelemetry: bool = False) -> None:
+        self._lock = threading.Lock()
+        self._stats: Dict[Tuple[str, str], ActionStats] = {}
+        self.hooks: List[RequestHook] = []
+        self._tracer = None
+        if opentelemetry:
+            self.enable_tracing()
+
+    def enable_tracing(self) -> None:
+        """Wrap every call in an OpenTelemetry span from now on."""
+        if _otel_trace is None:
+            raise RuntimeError("opentelemetry-api is not installed")
+        if self._tracer is None:
+            self._tracer = _otel_trace.get_tracer("urbackup_api")
+
+    def _entry(self, action: str, sa: str) -> ActionStats:
+        s = self._stats.get((action, sa))
+        if s is None:
+            s = self._stats[action, sa] = ActionStats(action, sa)
+        return s
+
+    def attempt(
+        self,
+        action: str,
+        params: Dict[str, Any],
+        status: Optional[int],
+        bytes_out: int,
+    ) -> None:
+        with self._lock:
+            s = self._entry(action, str(params.get("sa", "")))
+            s.requests += 1
+            s.bytes_out += bytes_out
+            if status is not None:
+                s.status_codes[status] = s.status_codes.get(status, 0) + 1
+
+    def begin(self, action: str, params: Dict[str, Any]) -> _CallTrace:
+        sa = str(params.get("sa", ""))
+        span = None
+        if self._tracer is not None:
+            span = self._tracer.start_span(
+                f"urbackup {action}", attributes={"urbackup.action": action,
+                                                   "urbackup.sa": sa},
+            )
+        return _CallTrace(action, sa, span)
+
+    def end(self, t: _CallTrace) -> None:
+        latency = time.perf_counter() - t.start
+        failed = bool(t.error) or t.status != 200
+        with self._lock:
+            s = self._entry(t.action, t.sa)
+            s.calls += 1
+            s.retries += max(t.attempts - 1, 0)
+            s.errors += failed
+            s.bytes_in += t.bytes_in
+            s.latency.observe(latency)
+        if t.span is not None:
+            t.span.set_attribute("urbackup.attempts", t.attempts)
+            if t.status is not None:
+                t.span.set_attribute("http.status_code", t.status)
+            if t.error:
+                t.span.set_attribute("error", t.error)
+            t.span.end()
+        if self.hooks:
+            record = RequestRecord(t.action, t.sa, t.attempts, t.status, latency,
+                                   t.bytes_in, t.error)
+            for hook in list(self.hooks):
+                try:
+                    hook(record)
+                except Exception:
+                    logger.exception("Request hook failed")
+
+    def snapshot(self) -> Dict[Tuple[str, str], ActionStats]:
+        with self._lock:
+            return {
+                k: ActionStats(
+                    s.action, s.sa, s.calls, s.requests, s.retries, s.errors,
+                    dict(s.status_codes), s.bytes_out, s.bytes_in, s.latency.copy(),
+                )
+                for k, s in self._stats.items()
+            }
@@ -0,0 +1,118 @@
+"""Field-level change events between successive status snapshots."""
+
+from __future__ import annotations
+
+import dataclasses
+from dataclasses import dataclass
+from operator import attrgetter
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from ._common import StatusClientItem, StatusResult
+from ._diff import ChangeType
+from ._poll import _PollingPublisher
+
+_DEFAULT_IGNORE = ("lastseen",)
+
+
+@dataclass
+class StatusChange:
+    """One change between two status snapshots.
+
+    ``ADDED`` and ``REMOVED`` carry the whole client row in *new* or
+    *old*; ``MODIFIED`` is reported once per changed *field*.
+    """
+    change: ChangeType
+    clientid: int
+    name: str
+    field: Optional[str] = None
+    old: Any = None
+    new: Any = None
+
+
+class StatusDiffer(_PollingPublisher):
+    """Compute :class:`StatusChange` events between ``StatusResult`` snapshots.
+
+    The previous snapshot is kept as ``{client id: (values, row)}``, where
+    *values* is the tuple of compared scalar fields; a client whose tuple
+    compares equal is skipped field by field.  Only *fields* are compared
+    (default: every field except those in *ignore*, which defaults to the
+    constantly changing ``lastseen``).
+
+    Call :meth:`diff` with snapshots you fetch yourself, or pass a
+    *server* and start the differ to poll ``get_status_result`` every
+    *min_interval* to *max_interval* seconds and deliver the changes to
+    subscribers, iterators and streams.
+    """
+
+    _thread_name = "urbackup-status"
+
+    def __init__(
+        self,
+        server: Any = None,
+        fields: Optional[Iterable[str]] = None,
+        ignore: Iterable[str] = _DEFAULT_IGNORE,
+        min_interval: float = 10.0,
+        max_interval: float = 60.0,
+    ) -> None:
+        super().__init__(min_interval, max_interval)
+        self._server = server
+        if fields is None:
+            skip = set(ignore)
+            fields = [f.name for f in dataclasses.fields(StatusClientItem)
+                      if f.name not in skip]
+        self.fields: Tuple[str, ...] = tuple(fields)
+        if "id" not in self.fields:
+            raise ValueError("'id' must be one of the compared fields")
+        # ``processes`` is a list of dataclasses; it is compared on its own.
+        self._compare_processes = "processes" in self.fields
+        self._scalar_fields = tuple(f for f in self.fields if f != "processes")
+        if len(self._scalar_fields) == 1:
+            name = self._scalar_fields[0]
+            self._values: Callable[[StatusClientItem], Tuple[Any, ...]] = (
+                lambda c: (getattr(c, name),)
+            )
+        else:
+            self._values = attrgetter(*self._scalar_fields)
+        self._rows: Dict[int, Tuple[Tuple[Any, ...], StatusClientItem]] = {}
+
+    def poll(self) -> List[StatusChange]:
+        snapshot = self._server.get_status_result()
+        if snapshot is None:
+            return []
+        return self.diff(snapshot)
+
+    def prime(self, snapshot: StatusResult) -> None:
+        """Remember *snapshot* as the baseline without reporting changes."""
+        self.diff(snapshot)
+
+    def diff(self, snapshot: StatusResult) -> List[StatusChange]:
+        """Return the changes since the previous snapshot and remember this one."""
+        fields = self._scalar_fields
+        compare_processes = self._compare_processes
+        previous = self._rows
+        rows: Dict[int, Tuple[Tuple[Any, ...], StatusClientItem]] = {}
+        changes: List[StatusChange] = []
+        for c, values in zip(snapshot.status, map(self._values, snapshot.status)):
+            rows[c.id] = (values, c)
+            old = previous.get(c.id)
+            if old is None:
+                changes.append(StatusChange(ChangeType.ADDED, c.id, c.name, new=c))
+                continue
+            if old[0] != values:
+                for name, a, b in zip(fields, old[0], values):
+                    if a != b:
+                        changes.append(StatusChange(
+                            ChangeType.MODIFIED, c.id, c.name, name, a, b,
+                        ))
+            if compare_processes and old[1].processes != c.processes:
+                changes.append(StatusChange(
+                    ChangeType.MODIFIED, c.id, c.name, "processes",
+                    old[1].processes, c.processes,
+                ))
+        for clientid in previous.keys() - rows.keys():
+            item = previous[clientid][1]
+            changes.append(StatusChange(
+                ChangeType.REMOVED, clientid, item.name, old=item,
+            ))
+        self._rows = rows
+        return changes
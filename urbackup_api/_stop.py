@@ -0,0 +1,117 @@
+"""Stopping many running processes at once."""
+
+from __future__ import annotations
+
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Collection, List, Optional, Tuple
+
+from ._base import logger
+from ._common import ProcessItem
+
+ProcessPredicate = Callable[[ProcessItem], bool]
+
+
+@dataclass
+class StopProcessesResult:
+    """Outcome of :func:`stop_processes`.
+
+    *stopped* were acknowledged by the server, *failed* pairs each process
+    with an error message.  With confirmation, *still_running* lists
+    targets that are still in the progress list afterwards.
+    """
+    stopped: List[ProcessItem] = field(default_factory=list)
+    failed: List[Tuple[ProcessItem, str]] = field(default_factory=list)
+    still_running: List[ProcessItem] = field(default_factory=list)
+
+    @property
+    def ok(self) -> bool:
+        return not self.failed and not self.still_running
+
+
+def _stop_one(server: Any, p: ProcessItem) -> Optional[str]:
+    """Send one stop request without decoding the response body."""
+    try:
+        response = server._get_response("progress", {
+            "with_lastacts": "0",
+            "stop_clientid": str(p.clientid),
+            "stop_id": str(p.id),
+        })
+    except Exception as e:
+        return repr(e)
+    try:
+        status = response.status
+        response.read()
+    finally:
+        response.close()
+    return None if status == 200 else f"HTTP {status}"
+
+
+def stop_processes(
+    server: Any,
+    predicate: Optional[ProcessPredicate] = None,
+    actions: Optional[Collection[int]] = None,
+    clientids: Optional[Collection[int]] = None,
+    groups: Optional[Collection[str]] = None,
+    max_workers: int = 8,
+    confirm: bool = False,
+    all: bool = False,
+) -> Optional[StopProcessesResult]:
+    """Stop every running process matching all given filters.
+
+    Targets are selected from a single ``get_progress`` snapshot by
+    ``ClientProcessActionTypes`` value (*actions*), client ID, client group
+    name (this reads the status once) and an arbitrary *predicate*.  Stop
+    requests are sent concurrently by up to *max_workers* threads and their
+    progress responses are discarded unread.  With *confirm* one more
+    ``get_progress`` call checks which targets are still running.
+
+    At least one filter is required; stopping every running process on the
+    server needs an explicit ``all=True``, otherwise ``ValueError`` is
+    raised.  Returns ``None`` if the progress or status could not be read.
+    """
+    if (predicate is None and actions is None and clientids is None
+            and groups is None and not all):
+        raise ValueError("No filter given; pass all=True to stop every process")
+    if not server.login():
+        return None
+    snapshot = server.get_progress()
+    if snapshot is None:
+        return None
+
+    group_clients = None
+    if groups is not None:
+        status = server.get_status_result()
+        if status is None:
+            return None
+        group_clients = {c.id for c in status.status if c.groupname in groups}
+
+    targets = [
+        p for p in snapshot.progress
+        if (actions is None or p.action in actions)
+        and (clientids is None or p.clientid in clientids)
+        and (group_clients is None or p.clientid in group_clients)
+        and (predicate is None or predicate(p))
+    ]
+
+    result = StopProcessesResult()
+    if not targets:
+        return result
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        errors = list(pool.map(lambda p: _stop_one(server, p), targets))
+    for p, error in zip(targets, errors):
+        if error is None:
+            result.stopped.append(p)
+        else:
+            logger.warning("Stopping process %s of client %s failed: %s",
+                           p.id, p.clientid, error)
+            result.failed.append((p, error))
+
+    if confirm:
+        after = server.get_progress()
+        if after is not None:
+            running = {(p.clientid, p.id) for p in after.progress}
+            result.still_running = [
+                p for p in result.stopped if (p.clientid, p.id) in running
+            ]
+    return result
@@ -0,0 +1,159 @@
+"""Throughput, ETA and stall analytics over ``get_progress`` samples."""
+
+from __future__ import annotations
+
+import time
+from array import array
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from ._common import ProcessItem, ProgressResult
+
+_Key = Tuple[int, int]
+
+
+class _Ring:
+    """Fixed-size ring buffer of ``(time, done_bytes)`` samples."""
+
+    __slots__ = ("times", "done", "head", "count", "last_growth")
+
+    def __init__(self, capacity: int, now: float, done: int) -> None:
+        self.times = array("d", bytes(8 * capacity))
+        self.done = array("q", bytes(8 * capacity))
+        self.head = 0
+        self.count = 0
+        self.last_growth = now
+        self.append(now, done)
+
+    def append(self, now: float, done: int) -> None:
+        if self.count and done > self.done[(self.head - 1) % len(self.done)]:
+            self.last_growth = now
+        self.times[self.head] = now
+        self.done[self.head] = done
+        self.head = (self.head + 1) % len(self.times)
+        self.count = min(self.count + 1, len(self.times))
+
+    def rate(self, since: float) -> Optional[float]:
+        """Bytes per second between the oldest sample after *since* and the newest."""
+        n = len(self.times)
+        newest = (self.head - 1) % n
+        oldest = (self.head - self.count) % n
+        i = oldest
+        while i != newest and self.times[i] < since:
+            i = (i + 1) % n
+        dt = self.times[newest] - self.times[i]
+        if dt <= 0:
+            return None
+        return max(self.done[newest] - self.done[i], 0) / dt
+
+
+@dataclass
+class ProcessStats:
+    """Derived statistics of one running process."""
+    clientid: int
+    id: int
+    name: str
+    action: int
+    done_bytes: int
+    total_bytes: int
+    bytes_per_second: float
+    eta_seconds: Optional[float]
+    stalled: bool
+
+
+def _percentile(sorted_values: List[float], p: float) -> float:
+    k = (len(sorted_values) - 1) * p / 100
+    lo = int(k)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+
+class ProgressAnalytics:
+    """Accumulate progress samples and derive throughput and ETAs.
+
+    Every :meth:`record` call appends ``(time, done_bytes)`` of each
+    running process to a ring buffer of *capacity* samples; processes
+    that are no longer running are dropped.  Throughput is measured over
+    the last *window* seconds, falling back to the server's
+    ``speed_bpms`` until two samples exist.  A process whose
+    ``done_bytes`` has not grown for *stall_after* seconds is stalled.
+    """
+
+    def __init__(
+        self,
+        window: float = 60.0,
+        stall_after: float = 120.0,
+        capacity: int = 64,
+    ) -> None:
+        self.window = window
+        self.stall_after = stall_after
+        self.capacity = capacity
+        self._rings: Dict[_Key, _Ring] = {}
+        self._processes: Dict[_Key, ProcessItem] = {}
+        self._now = 0.0
+
+    def record(self, snapshot: ProgressResult, now: Optional[float] = None) -> None:
+        """Add one ``get_progress`` snapshot."""
+        if now is None:
+            now = time.monotonic()
+        self._now = now
+        current: Dict[_Key, ProcessItem] = {}
+        for p in snapshot.progress:
+            key = (p.clientid, p.id)
+            current[key] = p
+            ring = self._rings.get(key)
+            if ring is None:
+                self._rings[key] = _Ring(self.capacity, now, p.done_bytes)
+            else:
+                ring.append(now, p.done_bytes)
+        for key in self._rings.keys() - current.keys():
+            del self._rings[key]
+        self._processes = current
+
+    def throughput(self, key: _Key) -> float:
+        """Bytes per second of process *key* over the window."""
+        rate = self._rings[key].rate(self._now - self.window)
+        if rate is None:
+            return self._processes[key].speed_bpms * 1000
+        return rate
+
+    def eta(self, key: _Key) -> Optional[float]:
+        """Seconds until process *key* is done, or ``None`` if unknown."""
+        p = self._processes[key]
+        remaining = p.total_bytes - p.done_bytes
+        if p.total_bytes <= 0 or remaining < 0:
+            return None
+        rate = self.throughput(key)
+        if rate <= 0:
+            return None
+        return remaining / rate
+
+    def stalled(self) -> List[_Key]:
+        """Keys of processes without ``done_bytes`` growth for *stall_after* s."""
+        limit = self._now - self.stall_after
+        return [k for k, r in self._rings.items() if r.last_growth <= limit]
+
+    def fleet_bandwidth(self) -> float:
+        """Summed throughput of all running processes, in bytes per second."""
+        return sum(self.throughput(k) for k in self._rings)
+
+    def eta_percentiles(
+        self,
+        percentiles: Iterable[float] = (50, 90, 99),
+    ) -> Dict[float, float]:
+        """ETA percentiles (in seconds) over all processes with a known ETA."""
+        etas = sorted(e for e in map(self.eta, self._rings) if e is not None)
+        if not etas:
+            return {}
+        return {p: _percentile(etas, p) for p in percentiles}
+
+    def summary(self) -> List[ProcessStats]:
+        """One :class:`ProcessStats` per running process."""
+        stalled = set(self.stalled())
+        return [
+            ProcessStats(
+                p.clientid, p.id, p.name, p.action, p.done_bytes, p.total_bytes,
+                self.throughput(key), self.eta(key), key in stalled,
+            )
+            for key, p in self._processes.items()
+        ]
@@ -3,14 +3,27 @@
 from __future__ import annotations
 
 import hashlib
-from typing import Any, Dict, List, Optional, Sequence
+import shutil
+from typing import (
+    Any,
+    BinaryIO,
+    Collection,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+)
 
 from ._base import _UrbackupServerBase
 from ._common import (
+    BackupFile,
     BackupType,
     Backups,
     ClientInfo,
     FilesResult,
+    LiveLogEntry,
     LogDataRow,
     LogInfo,
     LogLevel,
@@ -31,6 +44,18 @@ from ._common import (
     _handle_backups_err,
     _random_string,
 )
+from ._cache import LogCache, get_log_many as _get_log_many
+from ._crawl import BackupTable, crawl_backups as _crawl_backups
+from ._diff import BackupDiffEntry, diff_backups as _diff_backups
+from ._livelog import LiveLogTail
+from ._progress import ProgressWatcher
+from ._restore import RestoreResult, download_tree as _download_tree
+from ._stop import (
+    ProcessPredicate,
+    StopProcessesResult,
+    stop_processes as _stop_processes,
+)
+from ._walk import PrunePredicate, walk_backup as _walk_backup
 
 
 class urbackup_server_typed(_UrbackupServerBase):
@@ -45,7 +70,7 @@ class urbackup_server_typed(_UrbackupServerBase):
         data = self._get_json("status")
         if not data:
             return None
-        return StatusResult.from_dict(data)
+        return self._build(StatusResult.from_dict, data)
 
     # --- Start backup (typed, by ID) -----------------------------------
 
@@ -63,7 +88,7 @@ class urbackup_server_typed(_UrbackupServerBase):
         })
         if not ret or "result" not in ret:
             return []
-        return [StartBackupResultItem.from_dict(r) for r in ret["result"]]
+        return self._build_list(StartBackupResultItem, ret["result"])
 
     # --- Remove / stop-remove clients ----------------------------------
 
@@ -76,7 +101,7 @@ class urbackup_server_typed(_UrbackupServerBase):
         })
         if not ret:
             return None
-        return StatusResult.from_dict(ret)
+        return self._build(StatusResult.from_dict, ret)
 
     def remove_client(self, client_id: int) -> Optional[StatusResult]:
         """Mark a single client for removal."""
@@ -95,7 +120,7 @@ class urbackup_server_typed(_UrbackupServerBase):
         })
         if not ret:
             return None
-        return StatusResult.from_dict(ret)
+        return self._build(StatusResult.from_dict, ret)
 
     def stop_remove_client(self, client_id: int) -> Optional[StatusResult]:
         """Unmark a single client so it is no longer pending removal."""
@@ -115,7 +140,19 @@ class urbackup_server_typed(_UrbackupServerBase):
         })
         if not ret:
             return None
-        return ProgressResult.from_dict(ret)
+        return self._build(ProgressResult.from_dict, ret)
+
+    def watch_progress(
+        self,
+        min_interval: float = 1.0,
+        max_interval: float = 30.0,
+        progress_interval: float = 5.0,
+    ) -> ProgressWatcher:
+        """Return a :class:`ProgressWatcher` polling this server.
+
+        Iterate it to receive ``ProgressEvent`` objects.
+        """
+        return ProgressWatcher(self, min_interval, max_interval, progress_interval)
 
     def stop_process(
         self,
@@ -133,7 +170,26 @@ class urbackup_server_typed(_UrbackupServerBase):
         })
         if not ret:
             return None
-        return ProgressResult.from_dict(ret)
+        return self._build(ProgressResult.from_dict, ret)
+
+    def stop_processes(
+        self,
+        predicate: Optional[ProcessPredicate] = None,
+        actions: Optional[Collection[int]] = None,
+        clientids: Optional[Collection[int]] = None,
+        groups: Optional[Collection[str]] = None,
+        max_workers: int = 8,
+        confirm: bool = False,
+        all: bool = False,
+    ) -> Optional[StopProcessesResult]:
+        """Stop all running processes matching the filters concurrently.
+
+        See :func:`stop_processes`.
+        """
+        return _stop_processes(
+            self, predicate, actions, clientids, groups, max_workers, confirm,
+            all,
+        )
 
     # --- Backups (typed) -----------------------------------------------
 
@@ -149,7 +205,22 @@ class urbackup_server_typed(_UrbackupServerBase):
             return None
         if "err" in ret:
             _handle_backups_err(ret)
-        return Backups.from_dict(ret)
+        return self._build(Backups.from_dict, ret)
+
+    def crawl_backups(
+        self,
+        client_ids: Optional[Sequence[int]] = None,
+        max_workers: int = 16,
+    ) -> BackupTable:
+        """Fetch the file and image backups of many clients concurrently.
+
+        *client_ids* defaults to every client in the status.  Clients that
+        fail are listed in ``BackupTable.errors`` instead of aborting.
+        """
+        if client_ids is None:
+            status = self.get_status_result()
+            client_ids = [c.id for c in status.status] if status else []
+        return _crawl_backups(self, client_ids, max_workers)
 
     def get_files(
         self,
@@ -172,7 +243,96 @@ class urbackup_server_typed(_UrbackupServerBase):
             return None
         if "err" in ret:
             _handle_backups_err(ret)
-        return FilesResult.from_dict(ret)
+        return self._build(FilesResult.from_dict, ret)
+
+    def walk_backup(
+        self,
+        clientid: int,
+        backupid: int,
+        root: str = "/",
+        max_workers: int = 4,
+        max_depth: Optional[int] = None,
+        prune: Optional[PrunePredicate] = None,
+        ordered: bool = True,
+    ) -> Iterator[Tuple[str, BackupFile]]:
+        """Recursively list a file backup, yielding ``(path, BackupFile)``.
+
+        Subdirectories are fetched concurrently by up to *max_workers*
+        threads.  *max_depth* limits recursion (``0`` lists only *root*)
+        and directories for which ``prune(path, entry)`` returns true are
+        skipped.  With *ordered* the output order is deterministic,
+        otherwise listings are yielded as they arrive.
+        """
+        return _walk_backup(
+            self, clientid, backupid, root,
+            max_workers=max_workers, max_depth=max_depth,
+            prune=prune, ordered=ordered,
+        )
+
+    def diff_backups(
+        self,
+        clientid: int,
+        old_backupid: int,
+        new_backupid: int,
+        root: str = "/",
+        new_clientid: Optional[int] = None,
+        skip_unchanged_dirs: bool = False,
+    ) -> Iterator[BackupDiffEntry]:
+        """Yield added, removed and modified entries between two backups.
+
+        See ``urbackup_api.diff_backups`` for details.
+        """
+        return _diff_backups(
+            self, clientid, old_backupid, new_backupid, root,
+            new_clientid=new_clientid,
+            skip_unchanged_dirs=skip_unchanged_dirs,
+        )
+
+    def download_backup_file_to(
+        self,
+        clientid: int,
+        backupid: int,
+        path: str,
+        outputf: BinaryIO,
+    ) -> bool:
+        """Stream one file from a backup into the writable *outputf*.
+
+        Unlike ``download_backup_file`` the content is never held in memory
+        as a whole.
+        """
+        if not self.login():
+            return False
+        response = self._get_response("backups", {
+            "sa": "filesdl",
+            "clientid": str(clientid),
+            "backupid": str(backupid),
+            "path": path,
+        }, "GET")
+        try:
+            if response.status != 200:
+                return False
+            shutil.copyfileobj(response, outputf, 1024 * 1024)
+        finally:
+            response.close()
+        return True
+
+    def download_tree(
+        self,
+        clientid: int,
+        backupid: int,
+        path: str,
+        dest: str,
+        max_workers: int = 4,
+        verify: bool = True,
+    ) -> RestoreResult:
+        """Download a directory of a file backup into *dest*, verifying hashes.
+
+        See ``urbackup_api.download_tree`` for details.
+        """
+        return _download_tree(
+            self, clientid, backupid, path, dest,
+            max_workers=max_workers, verify=verify,
+        )
 
     def archive_backup(self, clientid: int, backupid: int) -> Optional[Backups]:
         """Archive a backup so it won't be cleaned up."""
@@ -187,7 +347,7 @@ class urbackup_server_typed(_UrbackupServerBase):
             return None
         if "err" in ret:
             _handle_backups_err(ret)
-        return Backups.from_dict(ret)
+        return self._build(Backups.from_dict, ret)
 
     def unarchive_backup(self, clientid: int, backupid: int) -> Optional[Backups]:
         """Unarchive a previously archived backup."""
@@ -202,7 +362,7 @@ class urbackup_server_typed(_UrbackupServerBase):
             return None
         if "err" in ret:
             _handle_backups_err(ret)
-        return Backups.from_dict(ret)
+        return self._build(Backups.from_dict, ret)
 
     def delete_backup(self, clientid: int, backupid: int) -> Optional[Backups]:
         """Mark a backup for deletion."""
@@ -217,7 +377,7 @@ class urbackup_server_typed(_UrbackupServerBase):
             return None
         if "err" in ret:
             _handle_backups_err(ret)
-        return Backups.from_dict(ret)
+        return self._build(Backups.from_dict, ret)
 
     def stop_delete_backup(self, clientid: int, backupid: int) -> Optional[Backups]:
         """Cancel a pending backup deletion."""
@@ -232,7 +392,7 @@ class urbackup_server_typed(_UrbackupServerBase):
             return None
         if "err" in ret:
             _handle_backups_err(ret)
-        return Backups.from_dict(ret)
+        return self._build(Backups.from_dict, ret)
 
     def delete_backup_now(self, clientid: int, backupid: int) -> Optional[Backups]:
         """Delete a backup immediately."""
@@ -247,7 +407,7 @@ class urbackup_server_typed(_UrbackupServerBase):
             return None
         if "err" in ret:
             _handle_backups_err(ret)
-        return Backups.from_dict(ret)
+        return self._build(Backups.from_dict, ret)
 
     # --- Usage (typed) -------------------------------------------------
 
@@ -258,7 +418,7 @@ class urbackup_server_typed(_UrbackupServerBase):
         ret = self._get_json("usage")
         if not ret or "usage" not in ret:
             return None
-        return [UsageClientStat.from_dict(u) for u in ret["usage"]]
+        return self._build_list(UsageClientStat, ret["usage"])
 
     def get_piegraph_data(self) -> Optional[List[PieGraphData]]:
         """Get data for a pie chart of storage usage by client."""
@@ -267,7 +427,7 @@ class urbackup_server_typed(_UrbackupServerBase):
         ret = self._get_json("piegraph")
         if not ret or "data" not in ret:
             return None
-        return [PieGraphData.from_dict(d) for d in ret["data"]]
+        return self._build_list(PieGraphData, ret["data"])
 
     def get_usage_graph_data(
         self,
@@ -286,7 +446,7 @@ class urbackup_server_typed(_UrbackupServerBase):
         ret = self._get_json("usagegraph", params)
         if not ret or "data" not in ret:
             return None
-        return [UsageGraphData.from_dict(d) for d in ret["data"]]
+        return self._build_list(UsageGraphData, ret["data"])
 
     def recalculate_stats(self) -> bool:
         """Trigger recalculation of all statistics."""
@@ -316,7 +476,7 @@ class urbackup_server_typed(_UrbackupServerBase):
         })
         if not ret or "logs" not in ret:
             return None
-        return [LogInfo.from_dict(entry) for entry in ret["logs"]]
+        return self._build_list(LogInfo, ret["logs"])
 
     def get_log(self, logid: int) -> Optional[List[LogDataRow]]:
         """Get the detailed entries for one log."""
@@ -328,26 +488,111 @@ class urbackup_server_typed(_UrbackupServerBase):
         log = ret["log"]
         if isinstance(log.get("data"), str):
             return self._parse_log(log["data"])
-        return [LogDataRow.from_dict(r) for r in log.get("data", [])]
+        return self._build_list(LogDataRow, log.get("data", []))
+
+    def get_log_many(
+        self,
+        logids: Sequence[int],
+        max_workers: int = 8,
+        cache: Optional[LogCache] = None,
+    ) -> Dict[int, Optional[List[LogDataRow]]]:
+        """Fetch several logs concurrently, through *cache* if given.
+
+        Logs that could not be fetched map to ``None``.
+        """
+        return _get_log_many(cache if cache is not None else self, logids, max_workers)
+
+    def iter_log(
+        self,
+        logid: int,
+        min_level: Optional[LogLevel] = None,
+    ) -> Optional[Iterator[LogDataRow]]:
+        """Like ``get_log`` but parse the entries lazily.
+
+        Entries below *min_level* are skipped before any object is built.
+        """
+        if not self.login():
+            return None
+        ret = self._get_json("logs", {"logid": str(logid)})
+        if not ret or "log" not in ret:
+            return None
+        log = ret["log"]
+        if isinstance(log.get("data"), str):
+            return self._iter_log(log["data"], min_level)
+        return (
+            row for row in (LogDataRow.from_dict(r) for r in log.get("data", []))
+            if min_level is None or row.level >= min_level
+        )
+
+    def get_livelog_since(
+        self,
+        clientid: int = 0,
+        lastid: int = 0,
+    ) -> Optional[List[LiveLogEntry]]:
+        """Get live log entries of one client newer than *lastid*.
+
+        Unlike the legacy ``get_livelog`` this keeps no cursor on the
+        server object; client ``0`` is the server's own log.
+        """
+        if not self.login():
+            return None
+        ret = self._get_json("livelog", {"clientid": clientid, "lastid": lastid})
+        if not ret or "logdata" not in ret:
+            return None
+        return self._build_list(LiveLogEntry, ret["logdata"])
+
+    def tail_livelog(
+        self,
+        clientids: Optional[Sequence[int]] = None,
+        min_interval: float = 0.5,
+        max_interval: float = 10.0,
+    ) -> LiveLogTail:
+        """Follow the live log of *clientids* (default: the server log).
+
+        See :class:`LiveLogTail`; iterate the result to receive
+        ``(clientid, LiveLogEntry)`` pairs.
+        """
+        return LiveLogTail(
+            self, clientids if clientids is not None else [0],
+            min_interval, max_interval,
+        )
 
     @staticmethod
     def _parse_log(d: str) -> List[LogDataRow]:
         """Parse a raw log string into ``LogDataRow`` objects."""
-        rows: List[LogDataRow] = []
-        for msg in d.split("\n"):
-            if not msg:
-                continue
-            level = int(msg[0]) if msg[0].isdigit() else 0
-            idx = msg.find("-", 2)
-            if idx != -1:
-                time_str = msg[2:idx]
-                time_val = int(time_str) if time_str.isdigit() else 0
-                message = msg[idx + 1:]
-            else:
-                time_val = 0
-                message = msg[2:]
-            rows.append(LogDataRow(level=level, message=message, time=time_val))
-        return rows
+        return list(urbackup_server_typed._iter_log(d))
+
+    @staticmethod
+    def _iter_log(
+        d: str,
+        min_level: Optional[int] = None,
+    ) -> Iterator[LogDataRow]:
+        """Lazily parse a raw log string into ``LogDataRow`` objects.
+
+        The string is scanned by offsets instead of being split, so no list
+        of lines is built and the first row is available immediately.
+        """
+        find = d.find
+        n = len(d)
+        pos = 0
+        while pos < n:
+            end = find("\n", pos)
+            if end == -1:
+                end = n
+            if end > pos:
+                c = d[pos]
+                level = int(c) if c.isdigit() else 0
+                if min_level is None or level >= min_level:
+                    idx = find("-", pos + 2, end)
+                    if idx != -1:
+                        time_str = d[pos + 2:idx]
+                        time_val = int(time_str) if time_str.isdigit() else 0
+                        message = d[idx + 1:end]
+                    else:
+                        time_val = 0
+                        message = d[pos + 2:end]
+                    yield LogDataRow(level=level, message=message, time=time_val)
+            pos = end + 1
 
     def save_log_reporting(
         self,
@@ -475,7 +720,7 @@ class urbackup_server_typed(_UrbackupServerBase):
         ret = self._get_json("settings", {"sa": "listusers"})
         if not ret or "users" not in ret:
             return None
-        return [UserListItem.from_dict(u) for u in ret["users"]]
+        return self._build_list(UserListItem, ret["users"])
 
     def create_user(self, name: str, password: str, rights: str = "") -> None:
         """Create a new user.
@@ -562,7 +807,7 @@ class urbackup_server_typed(_UrbackupServerBase):
         ret = self._get_json("users")
         if not ret or "users" not in ret:
             return None
-        return [ClientInfo.from_dict(u) for u in ret["users"]]
+        return self._build_list(ClientInfo, ret["users"])
 
     # --- Settings lists (from TypeScript client) -----------------------
 
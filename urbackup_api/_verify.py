@@ -0,0 +1,248 @@
+"""Sampled integrity verification of file backups."""
+
+from __future__ import annotations
+
+import hashlib
+import heapq
+import os
+import random
+import tempfile
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Any, BinaryIO, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from ._base import logger
+from ._common import (
+    BackupFile,
+    _load_json_state,
+    _save_json_state,
+    _shahash_candidates,
+)
+from ._walk import walk_backup
+
+_CHUNK = 1024 * 1024
+
+
+def _hash_file(path: str, algos: Sequence[str]) -> Dict[str, bytes]:
+    """Hash *path* with every algorithm in *algos* (runs in a worker process)."""
+    hashers = {a: hashlib.new(a) for a in algos}
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(_CHUNK), b""):
+            for h in hashers.values():
+                h.update(chunk)
+    return {a: h.digest() for a, h in hashers.items()}
+
+
+class _Throttle:
+    """Token bucket limiting the byte rate to *rate* per second.
+
+    Idle time earns at most *burst* seconds worth of bytes, so a pause
+    (walking listings, hashing, a reused job) never lifts the cap for long.
+    """
+
+    def __init__(self, rate: Optional[float], burst: float = 1.0) -> None:
+        self.rate = rate
+        self.burst = burst
+        self._due = time.monotonic()
+        self._lock = threading.Lock()
+
+    def consume(self, n: int) -> None:
+        if not self.rate:
+            return
+        with self._lock:
+            now = time.monotonic()
+            self._due = max(self._due, now - self.burst) + n / self.rate
+            ahead = self._due - now
+        if ahead > 0:
+            time.sleep(ahead)
+
+
+class _ThrottledWriter:
+
+    def __init__(self, f: BinaryIO, throttle: _Throttle) -> None:
+        self._f = f
+        self._throttle = throttle
+
+    def write(self, b: bytes) -> int:
+        self._throttle.consume(len(b))
+        return self._f.write(b)
+
+
+@dataclass
+class VerificationRecord:
+    """Result of verifying one sampled file."""
+    clientid: int
+    backupid: int
+    path: str
+    ok: Optional[bool]
+    error: str = ""
+
+
+class VerificationJob:
+    """Verify backups by downloading a weighted random sample of their files.
+
+    For each backup, *samples_per_backup* files are picked from the
+    ``get_files`` listings with weighted reservoir sampling (*weight* is
+    ``"size"``, ``"recency"`` or ``None`` for uniform).  They are streamed
+    through ``filesdl`` at no more than *max_bytes_per_second*, hashed in a
+    pool of *processes* worker processes and compared with
+    ``BackupFile.shahash``.
+
+    Per-backup totals are kept in a JSON ledger at *ledger_path*, keyed by
+    client and backup ID.
+    """
+
+    def __init__(
+        self,
+        server: Any,
+        ledger_path: str,
+        samples_per_backup: int = 10,
+        weight: Optional[str] = "size",
+        max_bytes_per_second: Optional[float] = None,
+        processes: int = 2,
+        source: Any = None,
+        seed: Optional[int] = None,
+    ) -> None:
+        if weight not in ("size", "recency", None):
+            raise ValueError(f"Unknown weight {weight!r}")
+        self._server = server
+        self._source = source if source is not None else server
+        self.ledger_path = ledger_path
+        self.samples_per_backup = samples_per_backup
+        self.weight = weight
+        self.processes = processes
+        self._throttle = _Throttle(max_bytes_per_second)
+        self._random = random.Random(seed)
+        self.ledger: Dict[str, Dict[str, Dict[str, Any]]] = _load_json_state(
+            ledger_path, {},
+        )
+
+    def _weight(self, entry: BackupFile, now: float) -> float:
+        if self.weight == "size":
+            return float(max(entry.size or 0, 1))
+        if self.weight == "recency":
+            age_days = max(now - entry.mod, 0) / 86400
+            return 1.0 / (1.0 + age_days)
+        return 1.0
+
+    def sample(self, clientid: int, backupid: int) -> List[Tuple[str, BackupFile]]:
+        """Pick files of one backup (A-Res weighted reservoir sampling)."""
+        now = time.time()
+        heap: List[Tuple[float, int, str, BackupFile]] = []
+        for n, (path, entry) in enumerate(walk_backup(self._source, clientid, backupid)):
+            if entry.dir:
+                continue
+            key = self._random.random() ** (1.0 / self._weight(entry, now))
+            item = (key, n, path, entry)
+            if len(heap) < self.samples_per_backup:
+                heapq.heappush(heap, item)
+            elif key > heap[0][0]:
+                heapq.heapreplace(heap, item)
+        return [(path, entry) for _, _, path, entry in sorted(heap, key=lambda i: i[1])]
+
+    def _download(self, clientid: int, backupid: int, path: str) -> Optional[str]:
+        fd, tmp = tempfile.mkstemp(prefix="urbackup-verify-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                ok = self._server.download_backup_file_to(
+                    clientid, backupid, path, _ThrottledWriter(f, self._throttle),
+                )
+        except BaseException:
+            os.remove(tmp)
+            raise
+        if not ok:
+            os.remove(tmp)
+            return None
+        return tmp
+
+    def verify_backup(
+        self,
+        clientid: int,
+        backupid: int,
+        pool: ProcessPoolExecutor,
+    ) -> List[VerificationRecord]:
+        """Verify a sample of one backup and record it in the ledger."""
+        pending: List[Tuple[str, List[Tuple[str, bytes]], str, Future]] = []
+        records: List[VerificationRecord] = []
+        for path, entry in self.sample(clientid, backupid):
+            candidates = _shahash_candidates(entry.shahash)
+            tmp = self._download(clientid, backupid, path)
+            if tmp is None:
+                records.append(VerificationRecord(
+                    clientid, backupid, path, False, "download failed",
+                ))
+                continue
+            if not candidates:
+                os.remove(tmp)
+                records.append(VerificationRecord(
+                    clientid, backupid, path, None, "no usable shahash",
+                ))
+                continue
+            algos = sorted({a for a, _ in candidates})
+            pending.append((path, candidates, tmp, pool.submit(_hash_file, tmp, algos)))
+
+        for path, candidates, tmp, fut in pending:
+            try:
+                digests = fut.result()
+            finally:
+                os.remove(tmp)
+            ok = any(digests[a] == d for a, d in candidates)
+            records.append(VerificationRecord(
+                clientid, backupid, path, ok, "" if ok else "hash mismatch",
+            ))
+
+        self._record(clientid, backupid, records)
+        return records
+
+    def _record(
+        self,
+        clientid: int,
+        backupid: int,
+        records: List[VerificationRecord],
+    ) -> None:
+        entry = self.ledger.setdefault(str(clientid), {}).setdefault(
+            str(backupid),
+            {"verified": 0, "failed": 0, "unverifiable": 0, "failures": []},
+        )
+        for r in records:
+            if r.ok:
+                entry["verified"] += 1
+            elif r.ok is None:
+                entry["unverifiable"] += 1
+            else:
+                entry["failed"] += 1
+                entry["failures"].append([r.path, r.error])
+        entry["last_run"] = int(time.time())
+        _save_json_state(self.ledger_path, self.ledger)
+
+    def run(
+        self,
+        client_ids: Optional[Iterable[int]] = None,
+        max_backups_per_client: Optional[int] = None,
+    ) -> List[VerificationRecord]:
+        """Verify backups of *client_ids* (default: all clients).
+
+        With *max_backups_per_client* only the newest backups are checked.
+        """
+        if client_ids is None:
+            status = self._server.get_status_result()
+            if status is None:
+                return []
+            client_ids = [c.id for c in status.status]
+
+        records: List[VerificationRecord] = []
+        with ProcessPoolExecutor(max_workers=self.processes) as pool:
+            for clientid in client_ids:
+                backups = self._server.get_backups(clientid)
+                if backups is None:
+                    continue
+                live = sorted(
+                    (b for b in backups.backups if not b.delete_pending),
+                    key=lambda b: b.backuptime, reverse=True,
+                )
+                for b in live[:max_backups_per_client]:
+                    logger.debug("Verifying backup %s of client %s", b.id, clientid)
+                    records.extend(self.verify_backup(clientid, b.id, pool))
+        return records
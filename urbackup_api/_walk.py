@@ -0,0 +1,106 @@
+"""Concurrent recursive traversal of file backups."""
+
+from __future__ import annotations
+
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Deque, Iterator, List, Optional, Tuple
+
+from ._base import logger
+from ._common import BackupFile, FilesResult
+
+PrunePredicate = Callable[[str, BackupFile], bool]
+
+
+def _join(dirpath: str, name: str) -> str:
+    return dirpath.rstrip("/") + "/" + name
+
+
+def iter_backup_listings(
+    source: Any,
+    clientid: int,
+    backupid: int,
+    root: str = "/",
+    max_workers: int = 4,
+    max_depth: Optional[int] = None,
+    prune: Optional[PrunePredicate] = None,
+    ordered: bool = True,
+) -> Iterator[Tuple[str, FilesResult]]:
+    """Yield ``(dirpath, FilesResult)`` for *root* and every directory below.
+
+    *source* is anything with a ``get_files(clientid, backupid, path)``
+    method, usually a server object.  Up to *max_workers* listings are
+    fetched concurrently.  Directories still to be visited are kept on a
+    depth-first frontier, so memory grows with the depth of the tree rather
+    than its size.
+
+    With *ordered* (the default) listings are yielded in a deterministic
+    depth-first order; otherwise they are yielded as soon as they arrive.
+    *max_depth* limits recursion (``0`` lists only *root*), and directories
+    for which ``prune(path, entry)`` returns true are not descended into.
+    Directories that cannot be listed are logged and skipped.
+    """
+    frontier: List[Tuple[str, int]] = [(root, 0)]
+    inflight: Deque[Tuple[str, int, Future]] = deque()
+
+    pool = ThreadPoolExecutor(max_workers=max(1, max_workers))
+    try:
+        while frontier or inflight:
+            while frontier and len(inflight) < max_workers:
+                path, depth = frontier.pop()
+                fut = pool.submit(source.get_files, clientid, backupid, path)
+                inflight.append((path, depth, fut))
+
+            if ordered:
+                path, depth, fut = inflight.popleft()
+            else:
+                done, _ = wait([f for _, _, f in inflight], return_when=FIRST_COMPLETED)
+                entry = next(e for e in inflight if e[2] in done)
+                inflight.remove(entry)
+                path, depth, fut = entry
+
+            listing = fut.result()
+            if listing is None:
+                logger.warning("Could not list %s in backup %s of client %s",
+                               path, backupid, clientid)
+                continue
+
+            if max_depth is None or depth < max_depth:
+                children = []
+                for f in listing.files:
+                    if not f.dir:
+                        continue
+                    child = _join(path, f.name)
+                    if prune is not None and prune(child, f):
+                        continue
+                    children.append((child, depth + 1))
+                frontier.extend(reversed(children))
+
+            yield path, listing
+    finally:
+        for _, _, fut in inflight:
+            fut.cancel()
+        pool.shutdown(wait=False)
+
+
+def walk_backup(
+    source: Any,
+    clientid: int,
+    backupid: int,
+    root: str = "/",
+    max_workers: int = 4,
+    max_depth: Optional[int] = None,
+    prune: Optional[PrunePredicate] = None,
+    ordered: bool = True,
+) -> Iterator[Tuple[str, BackupFile]]:
+    """Yield ``(path, BackupFile)`` for every entry below *root*.
+
+    See :func:`iter_backup_listings` for the meaning of the arguments.
+    """
+    for dirpath, listing in iter_backup_listings(
+        source, clientid, backupid, root,
+        max_workers=max_workers, max_depth=max_depth,
+        prune=prune, ordered=ordered,
+    ):
+        for f in listing.files:
+            yield _join(dirpath, f.name), f